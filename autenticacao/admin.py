@@ -23,3 +23,20 @@ class UsuarioAdmin(UserAdmin):
             'fields': ('nome', 'email')
         }),
     )
+    
+    def get_deleted_objects(self, objs, request):
+        # A confirmação padrão coletaria cada operação do histórico; elas são
+        # apagadas depois, em segundo plano (calculadora.expurgo).
+        usuarios = [str(obj) for obj in objs]
+        return usuarios, {Usuario._meta.verbose_name_plural: len(usuarios)}, set(), []
+    
+    def delete_model(self, request, obj):
+        from calculadora.expurgo import excluir_usuario
+        
+        excluir_usuario(obj)
+    
+    def delete_queryset(self, request, queryset):
+        from calculadora.expurgo import excluir_usuario
+        
+        for usuario in queryset:
+            excluir_usuario(usuario)
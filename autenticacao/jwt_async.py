@@ -0,0 +1,86 @@
+"""
+Autenticação JWT para views ``async def``.
+
+As views do DRF são síncronas; sob ASGI cada uma passa por ``sync_to_async``.
+``JWTAuthenticationAsync`` reaproveita a validação do token do simplejwt (que
+só usa CPU) e busca o usuário com o ORM assíncrono. O decorador ``jwt_async``
+aplica isso a uma view assíncrona comum do Django.
+"""
+from functools import wraps
+
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class JWTAuthenticationAsync(JWTAuthentication):
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        """Mesmas verificações de ``JWTAuthentication.get_user``, com ``aget``."""
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken('Token sem identificação de usuário') from e
+
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed('Usuário não encontrado', code='user_not_found') from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('Usuário inativo', code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed('A senha do usuário foi alterada.', code='password_changed')
+
+        return user
+
+
+def _nao_autenticado(autenticador, detalhe):
+    corpo = detalhe if isinstance(detalhe, dict) else {'detail': detalhe}
+    resposta = JsonResponse(corpo, status=status.HTTP_401_UNAUTHORIZED)
+    resposta['WWW-Authenticate'] = autenticador.authenticate_header(None)
+    return resposta
+
+
+def jwt_async(view):
+    """
+    Exige um access token válido antes de chamar a view assíncrona.
+
+    Define ``request.user`` com o usuário do token e responde 401 no mesmo
+    formato do DRF quando o token falta ou é inválido. Como nas views do DRF,
+    a proteção CSRF não se aplica (a autenticação não usa cookies).
+    """
+    autenticador = JWTAuthenticationAsync()
+
+    @csrf_exempt
+    @wraps(view)
+    async def view_autenticada(request, *args, **kwargs):
+        try:
+            autenticado = await autenticador.aauthenticate(request)
+        except AuthenticationFailed as e:
+            return _nao_autenticado(autenticador, e.detail)
+        if autenticado is None:
+            return _nao_autenticado(autenticador, 'As credenciais de autenticação não foram fornecidas.')
+        request.user, request.auth = autenticado
+        return await view(request, *args, **kwargs)
+
+    return view_autenticada
@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from kogui_portal.etag import calcular_etag, marcar, nao_modificado
 from .serializers import UsuarioSerializer, LoginSerializer, RegistroSerializer
 
 @swagger_auto_schema(
@@ -197,6 +198,7 @@ def logout_api(request):
     operation_description="Retorna os dados do usuário autenticado",
     responses={
         200: UsuarioSerializer,
+        304: openapi.Response(description="Perfil inalterado desde a ETag enviada em If-None-Match"),
         401: openapi.Response(
             description="Token inválido ou ausente",
             examples={
@@ -210,5 +212,13 @@ def logout_api(request):
 )
 @api_view(['GET'])
 def perfil_api(request):
-    serializer = UsuarioSerializer(request.user)
-    return Response(serializer.data)
+    usuario = request.user
+    etag = calcular_etag(
+        'perfil', usuario.pk, usuario.username, usuario.nome, usuario.email,
+        usuario.dt_inclusao.isoformat(), request.accepted_media_type
+    )
+    resposta = nao_modificado(request, etag)
+    if resposta is not None:
+        return resposta
+    serializer = UsuarioSerializer(usuario)
+    return marcar(Response(serializer.data), etag)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Operacao
+from .models import LimpezaHistorico, Operacao
 
 
 @admin.register(Operacao)
@@ -14,3 +14,14 @@ class OperacaoAdmin(admin.ModelAdmin):
         """Exibe os parâmetros formatados no admin"""
         return obj.get_parametros_display()
     get_parametros_display.short_description = 'Parâmetros'
+
+
+@admin.register(LimpezaHistorico)
+class LimpezaHistoricoAdmin(admin.ModelAdmin):
+    list_display = ['id', 'usuario', 'estado', 'removidas', 'total', 'excluir_usuario', 'data_criacao', 'data_conclusao']
+    list_filter = ['estado', 'excluir_usuario']
+    readonly_fields = [campo.name for campo in LimpezaHistorico._meta.fields]
+    ordering = ['-id']
+    
+    def has_add_permission(self, request):
+        return False
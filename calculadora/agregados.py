@@ -0,0 +1,283 @@
+"""
+Agregados das operações por minuto, hora e dia (``analise/``).
+
+``AgregadoOperacoes`` guarda, por intervalo, tipo e faixa do resultado, a
+quantidade de operações, a soma e o menor e o maior resultado. Ele é
+preenchido aos poucos: ``agregar`` lê só as operações com id acima da marca
+(``MarcaAgregacao``), em lotes de ``CALCULADORA_AGREGADOS_LOTE`` pela chave
+primária, soma cada lote em memória e o grava junto com a nova marca na
+mesma transação. Nenhuma consulta agrupa ``calculadora_operacao``, e o custo
+de cada execução é o das operações novas, seja qual for o tamanho da tabela.
+``manage.py agregar_operacoes`` (em um cron, a cada minuto) faz esse
+trabalho, e ``manage.py preencher_agregados`` recalcula tudo desde a primeira
+operação.
+
+Cada lote começa gravando a marca, o que trava a marca nos outros bancos e o
+banco no SQLite. Assim, duas execuções simultâneas não contam a mesma
+operação. Os agregados contam as operações realizadas: remoções e limpezas
+do histórico não os alteram, mas operações apagadas antes de serem agregadas
+ficam de fora. Como em ``historico/?since=``, os ids são a ordem de criação;
+em bancos com commits concorrentes, uma transação longa pode gravar um id
+menor que a marca e não ser contada.
+
+Os intervalos por minuto de mais de ``CALCULADORA_AGREGADOS_MINUTOS_DIAS``
+dias atrás não são gravados e são apagados por ``agregar_operacoes``; os por
+hora e por dia ficam.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import TAMANHO_LOTE_IDS, AgregadoOperacoes, MarcaAgregacao, Operacao, _centavos
+
+MARCA = 'operacoes'
+LOTE_PADRAO = 2000
+PAUSA_PADRAO = 0.05
+MINUTOS_PADRAO_DIAS = 7
+MAXIMO_INTERVALOS = 1500
+
+MINUTO, HORA, DIA = AgregadoOperacoes.MINUTO, AgregadoOperacoes.HORA, AgregadoOperacoes.DIA
+DURACOES = {
+    MINUTO: timedelta(minutes=1),
+    HORA: timedelta(hours=1),
+    DIA: timedelta(days=1),
+}
+# Período de analise/ sem desde
+PERIODOS_PADRAO = {
+    MINUTO: timedelta(hours=1),
+    HORA: timedelta(days=2),
+    DIA: timedelta(days=30),
+}
+
+
+def retencao_minutos():
+    return timedelta(days=getattr(settings, 'CALCULADORA_AGREGADOS_MINUTOS_DIAS', MINUTOS_PADRAO_DIAS))
+
+
+def faixa(centavos):
+    """Ordem de grandeza de um resultado em centavos, com sinal (0 para zero)."""
+    if not centavos:
+        return 0
+    return len(str(abs(centavos))) * (1 if centavos > 0 else -1)
+
+
+def limites_faixa(faixa):
+    """``(de, ate)`` dos resultados da ``faixa``: ``de`` <= módulo < ``ate``, com o sinal da faixa."""
+    if faixa == 0:
+        return 0.0, 0.0
+    de, ate = 10.0 ** (abs(faixa) - 3), 10.0 ** (abs(faixa) - 2)
+    return (de, ate) if faixa > 0 else (-de, -ate)
+
+
+def inicio_intervalo(data, granularidade, fuso=None):
+    """Início do intervalo de ``granularidade`` que contém ``data``, no fuso de ``TIME_ZONE``."""
+    if timezone.is_aware(data):
+        data = data.astimezone(fuso or timezone.get_current_timezone())
+    if granularidade == DIA:
+        return data.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularidade == HORA:
+        return data.replace(minute=0, second=0, microsecond=0)
+    return data.replace(second=0, microsecond=0)
+
+
+def _somar(acumulados, chave, quantidade, centavos, minimo, maximo):
+    atual = acumulados.get(chave)
+    if atual is None:
+        acumulados[chave] = [quantidade, centavos, minimo, maximo]
+    else:
+        atual[0] += quantidade
+        atual[1] += centavos
+        atual[2] = min(atual[2], minimo)
+        atual[3] = max(atual[3], maximo)
+
+
+def _acumular(operacoes, limite_minutos):
+    """
+    ``{(granularidade, inicio, tipo, faixa): [quantidade, centavos, minimo,
+    maximo]}`` das ``operacoes`` ``(id, tipo_operacao, resultado, data_criacao)``.
+    Soma por minuto e depois junta os minutos em horas e dias.
+    """
+    fuso = timezone.get_current_timezone()
+    por_minuto = {}
+    for _, tipo, resultado, data in operacoes:
+        centavos = _centavos(resultado)
+        _somar(por_minuto, (inicio_intervalo(data, MINUTO, fuso), tipo, faixa(centavos)), 1, centavos, centavos, centavos)
+
+    acumulados = {}
+    for (minuto, tipo, faixa_resultado), valores in por_minuto.items():
+        if minuto >= limite_minutos:
+            acumulados[(MINUTO, minuto, tipo, faixa_resultado)] = valores
+        for granularidade in (HORA, DIA):
+            _somar(acumulados, (granularidade, inicio_intervalo(minuto, granularidade), tipo, faixa_resultado), *valores)
+    return acumulados
+
+
+def _gravar(acumulados):
+    """Soma ``acumulados`` aos agregados gravados (dentro da transação da marca)."""
+    inicios = {}
+    for granularidade, inicio, _, _ in acumulados:
+        inicios.setdefault(granularidade, set()).add(inicio)
+    for granularidade, datas in inicios.items():
+        datas = list(datas)
+        for i in range(0, len(datas), TAMANHO_LOTE_IDS):
+            gravados = AgregadoOperacoes.objects.filter(
+                granularidade=granularidade, inicio__in=datas[i:i + TAMANHO_LOTE_IDS]
+            ).values_list('inicio', 'tipo_operacao', 'faixa', 'quantidade', 'centavos', 'minimo_centavos', 'maximo_centavos')
+            for inicio, tipo, faixa_resultado, quantidade, centavos, minimo, maximo in gravados:
+                chave = (granularidade, inicio, tipo, faixa_resultado)
+                if chave in acumulados:
+                    _somar(acumulados, chave, quantidade, centavos, minimo, maximo)
+
+    AgregadoOperacoes.objects.bulk_create(
+        [
+            AgregadoOperacoes(
+                granularidade=granularidade, inicio=inicio, tipo_operacao=tipo, faixa=faixa_resultado,
+                quantidade=quantidade, centavos=centavos, minimo_centavos=minimo, maximo_centavos=maximo,
+            )
+            for (granularidade, inicio, tipo, faixa_resultado), (quantidade, centavos, minimo, maximo)
+            in acumulados.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['granularidade', 'inicio', 'tipo_operacao', 'faixa'],
+        update_fields=['quantidade', 'centavos', 'minimo_centavos', 'maximo_centavos'],
+    )
+
+
+def agregar_lote(tamanho):
+    """Agrega as próximas ``tamanho`` operações depois da marca; retorna quantas."""
+    agora = timezone.now()
+    with transaction.atomic():
+        # Grava antes de ler, como EstatisticaUsuario.reconstruir
+        if not MarcaAgregacao.objects.filter(nome=MARCA).update(data_atualizacao=agora):
+            MarcaAgregacao.objects.create(nome=MARCA, data_atualizacao=agora)
+        ultimo_id = MarcaAgregacao.objects.values_list('ultimo_id', flat=True).get(nome=MARCA)
+        operacoes = list(Operacao.objects.filter(id__gt=ultimo_id).order_by('id').values_list(
+            'id', 'tipo_operacao', 'resultado', 'data_criacao'
+        )[:tamanho])
+        if not operacoes:
+            return 0
+        _gravar(_acumular(operacoes, agora - retencao_minutos()))
+        MarcaAgregacao.objects.filter(nome=MARCA).update(ultimo_id=operacoes[-1][0])
+    return len(operacoes)
+
+
+def agregar(tamanho=None, pausa=None, progresso=None):
+    """
+    Agrega as operações novas, lote a lote, com ``pausa`` segundos entre os
+    lotes; ``progresso`` recebe o total depois de cada um. Retorna o total.
+    """
+    tamanho = tamanho or getattr(settings, 'CALCULADORA_AGREGADOS_LOTE', LOTE_PADRAO)
+    pausa = getattr(settings, 'CALCULADORA_AGREGADOS_PAUSA', PAUSA_PADRAO) if pausa is None else pausa
+    total = 0
+    while agregadas := agregar_lote(tamanho):
+        total += agregadas
+        if progresso is not None:
+            progresso(total)
+        if agregadas < tamanho:
+            break
+        time.sleep(pausa)
+    return total
+
+
+def podar_minutos(tamanho=10000):
+    """Apaga os intervalos por minuto mais antigos que a retenção; retorna quantos."""
+    antigos = AgregadoOperacoes.objects.filter(
+        granularidade=MINUTO, inicio__lt=timezone.now() - retencao_minutos()
+    ).order_by('pk')
+    total = 0
+    while ids := list(antigos.values_list('pk', flat=True)[:tamanho]):
+        total += AgregadoOperacoes.objects.filter(pk__in=ids).delete()[0]
+    return total
+
+
+def reiniciar():
+    """Apaga os agregados e volta a marca para antes da primeira operação."""
+    with transaction.atomic():
+        MarcaAgregacao.objects.update_or_create(
+            nome=MARCA, defaults={'ultimo_id': 0, 'data_atualizacao': timezone.now()}
+        )
+        AgregadoOperacoes.objects.all().delete()
+
+
+def periodo(parametros):
+    """
+    ``(granularidade, desde, ate, tipo_operacao)`` a partir dos parâmetros de
+    ``analise/``; levanta ValueError se forem inválidos.
+    """
+    granularidade = parametros.get('granularidade', HORA)
+    if granularidade not in DURACOES:
+        raise ValueError(f"Granularidade inválida. Use {', '.join(DURACOES)}.")
+    tipo_operacao = parametros.get('tipo_operacao') or None
+    if tipo_operacao is not None and tipo_operacao not in dict(Operacao.TIPOS_OPERACAO):
+        raise ValueError('Tipo de operação inválido')
+
+    datas = {}
+    for nome in ('desde', 'ate'):
+        valor = parametros.get(nome)
+        if not valor:
+            continue
+        data = parse_datetime(valor)
+        if data is None:
+            raise ValueError(f'{nome} deve ser uma data ISO 8601.')
+        datas[nome] = timezone.make_aware(data) if timezone.is_naive(data) else data
+    ate = datas.get('ate', timezone.now())
+    desde = inicio_intervalo(datas.get('desde', ate - PERIODOS_PADRAO[granularidade]), granularidade)
+    if desde >= ate:
+        raise ValueError('desde deve ser anterior a ate.')
+    if (ate - desde) / DURACOES[granularidade] > MAXIMO_INTERVALOS:
+        raise ValueError(f'O período aceita no máximo {MAXIMO_INTERVALOS} intervalos de 1 {granularidade}.')
+    return granularidade, desde, ate, tipo_operacao
+
+
+def consultar(granularidade, desde, ate, tipo_operacao=None):
+    """Resposta de ``analise/``: só lê ``AgregadoOperacoes`` e ``MarcaAgregacao``."""
+    agregados = AgregadoOperacoes.objects.filter(granularidade=granularidade, inicio__gte=desde, inicio__lt=ate)
+    if tipo_operacao is not None:
+        agregados = agregados.filter(tipo_operacao=tipo_operacao)
+
+    intervalos = {}
+    por_tipo = {}
+    por_intervalo_e_tipo = agregados.order_by().values_list('inicio', 'tipo_operacao').annotate(
+        soma_quantidade=Sum('quantidade'), soma_centavos=Sum('centavos'),
+        minimo=Min('minimo_centavos'), maximo=Max('maximo_centavos'),
+    ).order_by('inicio')
+    for inicio, tipo, quantidade, centavos, minimo, maximo in por_intervalo_e_tipo:
+        intervalo = intervalos.setdefault(inicio, {
+            'inicio': inicio, 'quantidade': 0, 'soma_resultados': 0, 'minimo': minimo, 'maximo': maximo, 'por_tipo': {},
+        })
+        intervalo['quantidade'] += quantidade
+        intervalo['soma_resultados'] += centavos
+        intervalo['minimo'] = min(intervalo['minimo'], minimo)
+        intervalo['maximo'] = max(intervalo['maximo'], maximo)
+        intervalo['por_tipo'][tipo] = quantidade
+        por_tipo[tipo] = por_tipo.get(tipo, 0) + quantidade
+    for intervalo in intervalos.values():
+        intervalo['soma_resultados'] /= 100
+        intervalo['minimo'] /= 100
+        intervalo['maximo'] /= 100
+
+    distribuicao = []
+    for faixa_resultado, quantidade in agregados.order_by().values_list('faixa').annotate(
+        soma_quantidade=Sum('quantidade')
+    ).order_by('faixa'):
+        de, ate_faixa = limites_faixa(faixa_resultado)
+        distribuicao.append({'faixa': faixa_resultado, 'de': de, 'ate': ate_faixa, 'quantidade': quantidade})
+
+    marca = MarcaAgregacao.objects.filter(nome=MARCA).values('ultimo_id', 'data_atualizacao').first() or {}
+    return {
+        'granularidade': granularidade,
+        'desde': desde,
+        'ate': ate,
+        'tipo_operacao': tipo_operacao,
+        'agregado_ate_id': marca.get('ultimo_id', 0),
+        'agregado_em': marca.get('data_atualizacao'),
+        'total': sum(por_tipo.values()),
+        'por_tipo': por_tipo,
+        'intervalos': list(intervalos.values()),
+        'distribuicao': distribuicao,
+    }
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
 
 
 class CalculadoraConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'calculadora'
+
+    def ready(self):
+        from . import eventos, expurgo, persistencia, sinais
+
+        sinais.operacoes_criadas.connect(eventos.ao_criar_operacoes, dispatch_uid='calculadora.eventos.criadas')
+        sinais.operacoes_removidas.connect(eventos.ao_remover_operacoes, dispatch_uid='calculadora.eventos.removidas')
+        sinais.historico_limpo.connect(eventos.ao_limpar_historico, dispatch_uid='calculadora.eventos.limpo')
+        request_started.connect(persistencia.recuperar_ao_iniciar, dispatch_uid='calculadora.recuperar_journals')
+        request_started.connect(expurgo.iniciar_na_primeira_requisicao, dispatch_uid='calculadora.expurgo')
@@ -0,0 +1,121 @@
+"""
+Backend de cache em memória (por processo) com despejo LRU limitado em bytes.
+
+Funciona como o ``LocMemCache`` do Django, mas o limite é o tamanho total dos
+valores serializados (``OPTIONS['MAX_BYTES']``) em vez da quantidade de
+entradas. Configure em ``CACHES``::
+
+    'resultados': {
+        'BACKEND': 'calculadora.cache_backends.LRUBytesCache',
+        'OPTIONS': {'MAX_BYTES': 4 * 1024 * 1024},
+    }
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MAX_BYTES_PADRAO = 1024 * 1024
+# Custo aproximado de uma entrada além de chave e valor (nó do OrderedDict, tupla...)
+CUSTO_ENTRADA = 100
+
+
+class LRUBytesCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.max_bytes = int(options.get('MAX_BYTES', MAX_BYTES_PADRAO))
+        self._entradas = OrderedDict()  # chave -> (valor serializado, expira_em)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def bytes_usados(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def _tamanho(self, chave, valor_serializado):
+        return len(chave) + len(valor_serializado) + CUSTO_ENTRADA
+
+    def _remover(self, chave):
+        valor_serializado, _ = self._entradas.pop(chave)
+        self._bytes -= self._tamanho(chave, valor_serializado)
+
+    def _expirada(self, chave):
+        _, expira_em = self._entradas[chave]
+        return expira_em is not None and expira_em <= time.time()
+
+    def _gravar(self, chave, valor, timeout):
+        valor_serializado = pickle.dumps(valor, self.pickle_protocol)
+        tamanho = self._tamanho(chave, valor_serializado)
+        if tamanho > self.max_bytes:
+            return False
+        if chave in self._entradas:
+            self._remover(chave)
+        self._entradas[chave] = (valor_serializado, self.get_backend_timeout(timeout))
+        self._bytes += tamanho
+        while self._bytes > self.max_bytes:
+            self._remover(next(iter(self._entradas)))
+        return True
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if chave in self._entradas and not self._expirada(chave):
+                return False
+            return self._gravar(chave, value, timeout)
+
+    def get(self, key, default=None, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if chave not in self._entradas:
+                return default
+            if self._expirada(chave):
+                self._remover(chave)
+                return default
+            self._entradas.move_to_end(chave)
+            valor_serializado, _ = self._entradas[chave]
+        return pickle.loads(valor_serializado)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            self._gravar(chave, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if chave not in self._entradas or self._expirada(chave):
+                return False
+            valor_serializado, _ = self._entradas[chave]
+            self._entradas[chave] = (valor_serializado, self.get_backend_timeout(timeout))
+            return True
+
+    def delete(self, key, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if chave not in self._entradas:
+                return False
+            self._remover(chave)
+            return True
+
+    def has_key(self, key, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if chave not in self._entradas:
+                return False
+            if self._expirada(chave):
+                self._remover(chave)
+                return False
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
@@ -0,0 +1,81 @@
+"""
+Cache das páginas do histórico.
+
+Cada página serializada de ``historico/`` fica no cache
+``settings.CALCULADORA_CACHE_HISTORICO`` (um alias de ``CACHES``) sob a chave
+``usuário + versão + URL``. A versão vem de ``VersaoHistorico``, lida pela view
+antes de consultar o histórico (e usada também na ETag). Ela é incrementada
+na mesma transação de toda gravação ou remoção de operações, então invalidar
+o histórico de um usuário é um único ``UPDATE``: as páginas das versões
+antigas deixam de ser lidas e expiram sozinhas.
+
+Como a versão fica no banco, o cache pode ser local a cada processo (o padrão,
+``LocMemCache``) sem servir páginas desatualizadas quando outro worker grava;
+um backend compartilhado só faz os workers aproveitarem as páginas uns dos
+outros. A versão é lida antes da consulta, então uma página nunca é guardada
+sob uma versão mais nova que os dados dela.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .contadores import ContadorAcertos
+
+PREFIXO_CHAVE = 'calculadora:historico:'
+
+_contador = ContadorAcertos()
+
+
+def _cache():
+    alias = getattr(settings, 'CALCULADORA_CACHE_HISTORICO', None)
+    return caches[alias] if alias else None
+
+
+def _montar_chave(usuario_id, versao, url):
+    return f'{PREFIXO_CHAVE}{usuario_id}:{versao}:{hashlib.sha256(url.encode()).hexdigest()}'
+
+
+def chave_pagina(request, versao):
+    """
+    Chave da página pedida em ``request`` com a ``VersaoHistorico`` já lida
+    (``None`` com o cache desativado).
+    """
+    if _cache() is None:
+        return None
+    return _montar_chave(request.user.pk, versao, request.build_absolute_uri())
+
+
+def obter(chave):
+    if chave is None:
+        return None
+    dados = _cache().get(chave)
+    _contador.contar(dados is not None)
+    return dados
+
+
+async def aobter(chave):
+    if chave is None:
+        return None
+    dados = await _cache().aget(chave)
+    _contador.contar(dados is not None)
+    return dados
+
+
+def guardar(chave, dados):
+    if chave is not None:
+        _cache().set(chave, dados)
+
+
+async def aguardar(chave, dados):
+    if chave is not None:
+        await _cache().aset(chave, dados)
+
+
+def estatisticas():
+    """Acertos e falhas deste processo."""
+    return _contador.dados()
+
+
+def zerar_estatisticas():
+    _contador.zerar()
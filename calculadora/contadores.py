@@ -0,0 +1,31 @@
+"""Contadores de acertos e falhas dos caches, por processo."""
+import threading
+
+
+class ContadorAcertos:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._acertos = 0
+        self._falhas = 0
+
+    def contar(self, acerto):
+        with self._lock:
+            if acerto:
+                self._acertos += 1
+            else:
+                self._falhas += 1
+
+    def dados(self):
+        with self._lock:
+            acertos, falhas = self._acertos, self._falhas
+        total = acertos + falhas
+        return {
+            'acertos': acertos,
+            'falhas': falhas,
+            'taxa_acerto': round(acertos / total, 4) if total else None,
+        }
+
+    def zerar(self):
+        with self._lock:
+            self._acertos = self._falhas = 0
@@ -0,0 +1,118 @@
+"""
+Modo incremental do histórico (``historico/?since=<cursor>``).
+
+Um cliente que guarda o histórico localmente pede só o que mudou desde o
+último cursor recebido: as operações criadas depois dele (``novas``, em ordem
+de criação), os ids apagados (``removidas``) e ``limpo`` quando o histórico
+inteiro foi limpo. Para aplicar: se ``limpo``, descarte tudo; remova os ids de
+``removidas``; acrescente ``novas``. Com ``mais`` verdadeiro ainda há mudanças
+além dos limites da resposta; repita com o novo ``since``.
+
+O cursor guarda o último ``id`` de ``Operacao`` e de ``OperacaoRemovida``
+vistos e o momento em que foi emitido. ``?since=`` vazio devolve só o cursor
+do estado atual; peça-o antes de carregar a primeira página, e as operações
+gravadas entre as duas chamadas virão repetidas (mesmo ``id``) no delta
+seguinte. Os ids são a ordem de criação: no SQLite as gravações são
+serializadas; em bancos com commits concorrentes, uma transação longa pode
+gravar um id menor que outro já visto.
+"""
+import base64
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+
+from .models import Operacao, OperacaoRemovida
+from .paginacao import OperacaoPagination
+
+RETENCAO_PADRAO_DIAS = 30
+MENSAGEM_CURSOR_EXPIRADO = 'Cursor expirado; recarregue o histórico.'
+
+
+class CursorExpirado(Exception):
+    pass
+
+
+def usar_delta(parametros):
+    return DeltaHistorico.since_query_param in parametros
+
+
+def retencao():
+    return timedelta(days=getattr(settings, 'CALCULADORA_REMOCOES_RETENCAO_DIAS', RETENCAO_PADRAO_DIAS))
+
+
+def _codificar_since(ultima_operacao, ultima_remocao):
+    texto = f'{ultima_operacao}|{ultima_remocao}|{int(timezone.now().timestamp())}'
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def _decodificar_since(cursor):
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        ultima_operacao, ultima_remocao, emitido = map(int, texto.split('|'))
+    except ValueError:  # inclui UnicodeDecodeError e binascii.Error
+        raise NotFound('Cursor inválido.')
+    if timezone.now().timestamp() - emitido > retencao().total_seconds():
+        raise CursorExpirado
+    return ultima_operacao, ultima_remocao
+
+
+class DeltaHistorico:
+    """
+    Como ``OperacaoCursorPagination``: ``consultas`` devolve as consultas a
+    executar e ``montar`` a resposta a partir das linhas lidas, para que as
+    views assíncronas leiam com ``async for``.
+    """
+    since_query_param = 'since'
+    limite_novas = OperacaoPagination.max_page_size
+    limite_removidas = 1000
+
+    def __init__(self, request):
+        cursor = request.GET.get(self.since_query_param, '')
+        self.inicial = not cursor
+        self.ultima_operacao, self.ultima_remocao = (0, 0) if self.inicial else _decodificar_since(cursor)
+
+    def consultas(self, operacoes, usuario):
+        """
+        ``(novas, removidas)`` a partir das operações (já filtradas) do usuário.
+        No cursor inicial são os maiores ids atuais, sem linhas.
+        """
+        if self.inicial:
+            return (
+                Operacao.objects.order_by('-id').values_list('id', flat=True)[:1],
+                OperacaoRemovida.objects.order_by('-id').values_list('id', flat=True)[:1],
+            )
+        return (
+            operacoes.filter(id__gt=self.ultima_operacao).order_by('id')[:self.limite_novas + 1],
+            OperacaoRemovida.objects.filter(
+                usuario=usuario, id__gt=self.ultima_remocao
+            ).order_by('id').values_list('id', 'operacao_id')[:self.limite_removidas + 1],
+        )
+
+    def montar(self, novas, removidas, serializar):
+        """
+        Resposta a partir das linhas lidas das duas ``consultas``; ``serializar``
+        recebe a lista de novas operações.
+        """
+        novas, removidas = list(novas), list(removidas)
+        if self.inicial:
+            return {
+                'since': _codificar_since(novas[0] if novas else 0, removidas[0] if removidas else 0),
+                'novas': [],
+                'removidas': [],
+                'limpo': False,
+                'mais': False,
+            }
+
+        mais = len(novas) > self.limite_novas or len(removidas) > self.limite_removidas
+        novas, removidas = novas[:self.limite_novas], removidas[:self.limite_removidas]
+        ultima_operacao = novas[-1].id if novas else self.ultima_operacao
+        ultima_remocao = removidas[-1][0] if removidas else self.ultima_remocao
+        return {
+            'since': _codificar_since(ultima_operacao, ultima_remocao),
+            'novas': serializar(novas),
+            'removidas': [operacao_id for _, operacao_id in removidas if operacao_id is not None],
+            'limpo': any(operacao_id is None for _, operacao_id in removidas),
+            'mais': mais,
+        }
@@ -0,0 +1,296 @@
+"""
+Motor de cálculo da calculadora.
+
+Cada tipo de operação é registrado em ``OPERACOES`` como um único redutor que
+percorre os números uma só vez, sem cópias intermediárias da lista. As views,
+os serializers e qualquer endpoint novo devem chamar ``calcular`` em vez de
+reimplementar a lógica das operações.
+
+Quando o NumPy está instalado, listas com pelo menos
+``settings.CALCULADORA_NUMPY_LIMIAR`` números são convertidas uma única vez
+para um array float64 e reduzidas pelas versões vetorizadas registradas em
+``OPERACOES_NUMPY``. Abaixo do limiar o caminho em Python puro é mantido.
+"""
+import hashlib
+import math
+import sys
+from array import array
+from itertools import chain
+
+from django.conf import settings
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional
+    np = None
+
+
+class ErroCalculo(ValueError):
+    """Erro de validação ou de execução de uma operação."""
+
+
+class OperacaoInvalida(ErroCalculo):
+    pass
+
+
+class DivisaoPorZero(ErroCalculo):
+    pass
+
+
+OPERACOES = {}
+OPERACOES_NUMPY = {}
+
+# Para reduzir em trechos independentes, cada operação é vista como
+# ``primeiro ⊕ cauda``: os trechos seguintes ao primeiro são reduzidos pela
+# operação de JUNCAO e os parciais são unidos, em ordem, pela própria operação.
+JUNCAO = {
+    'soma': 'soma',
+    'subtracao': 'soma',
+    'multiplicacao': 'multiplicacao',
+    'divisao': 'multiplicacao',
+}
+# Operações em que um zero fora do primeiro número é erro (checado por trecho).
+CAUDA_SEM_ZERO = {'divisao'}
+# Operações que o Acumulador reduz pela soma exata (somar_exato) entre blocos.
+SOMAS_EXATAS = {'soma', 'subtracao'}
+
+LIMIAR_NUMPY_PADRAO = 1_000
+LIMIAR_PARALELO_PADRAO = 2_000_000
+
+
+def registrar_operacao(tipo_operacao, registro=OPERACOES):
+    """Decorador que registra o redutor de um tipo de operação."""
+    def decorator(redutor):
+        registro[tipo_operacao] = redutor
+        return redutor
+    return decorator
+
+
+def registrar_operacao_numpy(tipo_operacao):
+    """Registra a versão vetorizada (recebe um array float64) de uma operação."""
+    return registrar_operacao(tipo_operacao, OPERACOES_NUMPY)
+
+
+def limiar_numpy():
+    """Quantidade mínima de números para usar o caminho vetorizado (None se indisponível)."""
+    if np is None:
+        return None
+    return getattr(settings, 'CALCULADORA_NUMPY_LIMIAR', LIMIAR_NUMPY_PADRAO)
+
+
+# Formatos aceitos como lista de números: JSON (list) e binário (memoryview/ndarray).
+TIPOS_SEQUENCIA = (list, memoryview) if np is None else (list, memoryview, np.ndarray)
+
+
+def processos_paralelos(quantidade):
+    """Número de processos para reduzir ``quantidade`` números (0 = sem paralelismo)."""
+    processos = getattr(settings, 'CALCULADORA_PARALELO_PROCESSOS', 0)
+    limiar = getattr(settings, 'CALCULADORA_PARALELO_LIMIAR', LIMIAR_PARALELO_PADRAO)
+    if processos < 2 or quantidade < limiar:
+        return 0
+    return processos
+
+
+def normalizar_numeros(numeros):
+    """
+    Converte os números recebidos (int, float ou texto) para float uma única vez.
+
+    Retorna um array NumPy float64 acima do limiar configurado e uma lista de
+    floats abaixo dele. Buffers float64 vindos do formato binário são usados
+    sem cópia acima do limiar. Levanta ``ErroCalculo`` para valores não
+    numéricos.
+    """
+    limiar = limiar_numpy()
+    try:
+        if limiar is not None and len(numeros) >= limiar:
+            return np.asarray(numeros, dtype=np.float64)
+        if isinstance(numeros, memoryview):
+            return numeros
+        if np is not None and isinstance(numeros, np.ndarray):
+            return numeros.tolist()
+        return [float(n) for n in numeros]
+    except (TypeError, ValueError):
+        raise ErroCalculo('Todos os números devem ser valores numéricos válidos.')
+
+
+def como_lista(numeros):
+    """Retorna os números como ``list`` de floats (para serialização em JSON)."""
+    if isinstance(numeros, list):
+        return numeros
+    return numeros.tolist()
+
+
+@registrar_operacao('soma')
+def soma(numeros):
+    return math.fsum(numeros)
+
+
+@registrar_operacao('subtracao')
+def subtracao(numeros):
+    iterador = iter(numeros)
+    primeiro = next(iterador)
+    return primeiro - math.fsum(iterador)
+
+
+@registrar_operacao('multiplicacao')
+def multiplicacao(numeros):
+    return math.prod(numeros)
+
+
+@registrar_operacao('divisao')
+def divisao(numeros):
+    # Verificação do divisor e divisão no mesmo laço: uma única passada.
+    iterador = iter(numeros)
+    resultado = next(iterador)
+    for divisor in iterador:
+        if divisor == 0:
+            raise DivisaoPorZero('Divisão por zero não é permitida')
+        resultado /= divisor
+    return resultado
+
+
+# Soma e subtração usam math.fsum, como abaixo do limiar: ndarray.sum (soma
+# em pares) daria outro arredondamento, e o resultado de uma mesma lista
+# mudaria conforme CALCULADORA_NUMPY_LIMIAR. O memoryview evita criar um
+# float do NumPy por elemento.
+@registrar_operacao_numpy('soma')
+def soma_numpy(numeros):
+    return math.fsum(memoryview(numeros))
+
+
+@registrar_operacao_numpy('subtracao')
+def subtracao_numpy(numeros):
+    return float(numeros[0]) - math.fsum(memoryview(numeros[1:]))
+
+
+@registrar_operacao_numpy('multiplicacao')
+def multiplicacao_numpy(numeros):
+    return float(numeros.prod())
+
+
+@registrar_operacao_numpy('divisao')
+def divisao_numpy(numeros):
+    if not numeros[1:].all():
+        raise DivisaoPorZero('Divisão por zero não é permitida')
+    return float(np.divide.reduce(numeros))
+
+
+def calcular(tipo_operacao, numeros):
+    """
+    Executa ``tipo_operacao`` sobre ``numeros`` e retorna o resultado (float).
+
+    Arrays NumPy usam o redutor vetorizado; qualquer outra sequência de floats
+    usa o redutor em Python puro. Use ``normalizar_numeros`` para escolher o
+    formato adequado a partir dos dados da requisição. Com
+    ``CALCULADORA_PARALELO_PROCESSOS`` >= 2, listas a partir de
+    ``CALCULADORA_PARALELO_LIMIAR`` números são divididas entre processos.
+    """
+    if tipo_operacao not in OPERACOES:
+        raise OperacaoInvalida('Tipo de operação inválido')
+    if len(numeros) == 0:
+        raise ErroCalculo('Envie pelo menos um número.')
+    processos = processos_paralelos(len(numeros))
+    if processos:
+        from .paralelo import calcular_paralelo
+        return calcular_paralelo(tipo_operacao, numeros, processos)
+    return reduzir(tipo_operacao, numeros)
+
+
+def reduzir(tipo_operacao, numeros):
+    """Aplica o redutor registrado adequado ao formato de ``numeros``, sem validações."""
+    if np is not None and isinstance(numeros, np.ndarray):
+        # Overflow vira inf em silêncio, como no caminho em Python puro.
+        with np.errstate(over='ignore', under='ignore'):
+            return OPERACOES_NUMPY[tipo_operacao](numeros)
+    return OPERACOES[tipo_operacao](numeros)
+
+
+def atualizar_digest(digest, numeros):
+    """Acrescenta ``numeros`` (como float64 little-endian) a um hash do ``hashlib``."""
+    if np is not None and isinstance(numeros, np.ndarray):
+        digest.update(np.ascontiguousarray(numeros, dtype='<f8'))
+        return digest
+    if isinstance(numeros, memoryview) and sys.byteorder == 'little':
+        digest.update(numeros)
+        return digest
+    valores = array('d', numeros)
+    if sys.byteorder != 'little':
+        valores.byteswap()
+    digest.update(valores)
+    return digest
+
+
+def somar_exato(parcelas, numeros):
+    """
+    Soma exata de ``parcelas`` e ``numeros`` como uma lista de floats sem
+    sobreposição, da maior para a menor; ``math.fsum`` da lista é a soma
+    arredondada uma única vez. Cada parcela é o arredondamento do que falta
+    somar, então a lista tem poucas parcelas (no máximo algumas dezenas).
+    """
+    if np is not None and isinstance(numeros, np.ndarray):
+        numeros = memoryview(np.ascontiguousarray(numeros))
+    novas = []
+    while True:
+        parcela = math.fsum(chain(parcelas, numeros, (-n for n in novas)))
+        if parcela == 0:
+            return novas
+        novas.append(parcela)
+        if not math.isfinite(parcela):
+            return novas
+
+
+class Acumulador:
+    """
+    Redução incremental de uma operação: os números chegam em blocos e só o
+    resultado parcial, a contagem e o digest SHA-256 dos números ficam em
+    memória, qualquer que seja o total recebido.
+
+    Soma e subtração guardam a soma exata dos números recebidos como parcelas
+    (``somar_exato``) e só arredondam no ``resultado``, como ``math.fsum``
+    sobre a lista inteira. Multiplicação e divisão são dobras da esquerda
+    para a direita: continuar a partir do parcial equivale a reduzir
+    ``[parcial, *bloco]``.
+    """
+
+    def __init__(self, tipo_operacao):
+        if tipo_operacao not in OPERACOES:
+            raise OperacaoInvalida('Tipo de operação inválido')
+        self.tipo_operacao = tipo_operacao
+        self.quantidade = 0
+        self.parcial = None
+        self._parcelas = []
+        self._digest = hashlib.sha256()
+
+    def adicionar(self, numeros):
+        numeros = normalizar_numeros(numeros)
+        if len(numeros) == 0:
+            return
+        atualizar_digest(self._digest, numeros)
+        self.quantidade += len(numeros)
+        if self.tipo_operacao in SOMAS_EXATAS:
+            if self.parcial is None:
+                # Soma: parcial é o total; subtração: o primeiro número, do
+                # qual a soma dos demais (as parcelas) é descontada no fim.
+                self.parcial = 0.0 if self.tipo_operacao == 'soma' else float(numeros[0])
+                if self.tipo_operacao == 'subtracao':
+                    numeros = numeros[1:]
+            self._parcelas = somar_exato(self._parcelas, numeros)
+        elif self.parcial is None:
+            self.parcial = calcular(self.tipo_operacao, numeros)
+        elif np is not None and isinstance(numeros, np.ndarray):
+            self.parcial = calcular(self.tipo_operacao, np.concatenate(([self.parcial], numeros)))
+        else:
+            self.parcial = OPERACOES[self.tipo_operacao](chain((self.parcial,), numeros))
+
+    @property
+    def digest(self):
+        return self._digest.hexdigest()
+
+    def resultado(self):
+        if self.parcial is None:
+            raise ErroCalculo('Envie pelo menos um número.')
+        if self.tipo_operacao == 'soma':
+            return math.fsum(self._parcelas)
+        if self.tipo_operacao == 'subtracao':
+            return self.parcial - math.fsum(self._parcelas)
+        return self.parcial
@@ -0,0 +1,250 @@
+"""
+Eventos de mudança do histórico para ``api/calc/async/eventos/`` (SSE).
+
+Os receptores ``ao_criar_operacoes``, ``ao_remover_operacoes`` e
+``ao_limpar_historico`` (dos sinais de ``sinais.py``) chamam ``publicar``
+depois do commit de cada gravação ou remoção de operações. O broker configurado em
+``CALCULADORA_EVENTOS_BROKER`` entrega a mensagem ao ``Difusor`` de cada
+processo, que a repassa às conexões SSE abertas do usuário:
+
+* ``BrokerLocal`` (padrão) entrega direto ao difusor deste processo. Basta
+  quando o mesmo processo ASGI recebe as gravações e as conexões SSE (e é o
+  broker dos testes).
+* ``BrokerRedis`` publica em um canal do Redis (pacote ``redis``,
+  ``CALCULADORA_EVENTOS_REDIS_URL``); cada processo assina o canal e entrega
+  ao próprio difusor, inclusive as mensagens que ele mesmo publicou.
+
+Cada conexão tem uma fila limitada (``CALCULADORA_EVENTOS_BUFFER``). Um
+cliente lento que deixa a fila encher não segura os demais nem acumula
+memória: a fila é descartada e o próximo evento enviado é ``recarregar``,
+para o cliente se atualizar com ``historico/?since=``. Sem eventos, a conexão
+recebe um comentário a cada ``CALCULADORA_EVENTOS_HEARTBEAT`` segundos.
+"""
+import asyncio
+import json
+import logging
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+CRIADAS = 'criadas'
+REMOVIDAS = 'removidas'
+LIMPO = 'limpo'
+RECARREGAR = 'recarregar'
+
+BUFFER_PADRAO = 100
+HEARTBEAT_PADRAO = 15
+RECONEXAO_MS = 5000
+
+
+class Assinatura:
+    """Uma conexão SSE: fila limitada no event loop da conexão."""
+
+    def __init__(self, difusor, usuario_id, tamanho_buffer):
+        self.difusor = difusor
+        self.usuario_id = usuario_id
+        self.loop = asyncio.get_running_loop()
+        self.fila = asyncio.Queue(maxsize=tamanho_buffer)
+        self.atrasada = False
+
+    def colocar(self, evento):
+        """Chamado de qualquer thread."""
+        try:
+            self.loop.call_soon_threadsafe(self._colocar, evento)
+        except RuntimeError:  # event loop já encerrado
+            self.cancelar()
+
+    def _colocar(self, evento):
+        if self.atrasada:
+            return
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            self.atrasada = True
+            self.difusor.contar_descarte()
+
+    async def proximo(self, espera):
+        """Próximo evento, ou ``None`` se nada chegou em ``espera`` segundos."""
+        if self.atrasada:
+            self.atrasada = False
+            return {'tipo': RECARREGAR}
+        try:
+            return await asyncio.wait_for(self.fila.get(), espera)
+        except asyncio.TimeoutError:
+            return None
+
+    def cancelar(self):
+        self.difusor.remover(self)
+
+
+class Difusor:
+    """Conexões SSE abertas neste processo, por usuário."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._assinaturas = {}
+        self.entregues = 0
+        self.descartes = 0
+
+    def assinar(self, usuario_id, tamanho_buffer):
+        assinatura = Assinatura(self, usuario_id, tamanho_buffer)
+        with self._lock:
+            self._assinaturas.setdefault(usuario_id, set()).add(assinatura)
+        return assinatura
+
+    def remover(self, assinatura):
+        with self._lock:
+            assinaturas = self._assinaturas.get(assinatura.usuario_id)
+            if assinaturas is not None:
+                assinaturas.discard(assinatura)
+                if not assinaturas:
+                    del self._assinaturas[assinatura.usuario_id]
+
+    def entregar(self, mensagem):
+        with self._lock:
+            assinaturas = list(self._assinaturas.get(mensagem['usuario'], ()))
+            self.entregues += len(assinaturas)
+        evento = {'tipo': mensagem['tipo'], 'ids': mensagem.get('ids', [])}
+        for assinatura in assinaturas:
+            assinatura.colocar(evento)
+
+    def contar_descarte(self):
+        with self._lock:
+            self.descartes += 1
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'usuarios': len(self._assinaturas),
+                'conexoes': sum(len(a) for a in self._assinaturas.values()),
+                'eventos_entregues': self.entregues,
+                'filas_descartadas': self.descartes,
+            }
+
+
+class Broker:
+    """Transporte das mensagens entre processos."""
+
+    def publicar(self, mensagem):
+        raise NotImplementedError
+
+    def iniciar(self, difusor):
+        """Passa a entregar a ``difusor`` as mensagens publicadas (chamado uma vez por processo)."""
+
+
+class BrokerLocal(Broker):
+
+    def __init__(self):
+        self.difusor = None
+
+    def publicar(self, mensagem):
+        if self.difusor is not None:
+            self.difusor.entregar(mensagem)
+
+    def iniciar(self, difusor):
+        self.difusor = difusor
+
+
+class BrokerRedis(Broker):
+    canal = 'calculadora:eventos'
+
+    def __init__(self):
+        import redis  # opcional, só para este broker
+
+        self.cliente = redis.Redis.from_url(settings.CALCULADORA_EVENTOS_REDIS_URL)
+
+    def publicar(self, mensagem):
+        self.cliente.publish(self.canal, json.dumps(mensagem))
+
+    def iniciar(self, difusor):
+        threading.Thread(target=self._ouvir, args=(difusor,), name='eventos-redis', daemon=True).start()
+
+    def _ouvir(self, difusor):
+        pubsub = self.cliente.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.canal)
+        for mensagem in pubsub.listen():
+            try:
+                difusor.entregar(json.loads(mensagem['data']))
+            except (ValueError, KeyError):
+                logger.warning('Mensagem de evento inválida: %r', mensagem)
+
+
+_difusor = Difusor()
+_iniciado = False
+_lock_inicio = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def obter_broker():
+    caminho = getattr(settings, 'CALCULADORA_EVENTOS_BROKER', 'calculadora.eventos.BrokerLocal')
+    return import_string(caminho)()
+
+
+def publicar(usuario_id, tipo, ids=()):
+    """Publica um evento do histórico de ``usuario_id``; falhas do broker só são registradas."""
+    try:
+        obter_broker().publicar({'usuario': usuario_id, 'tipo': tipo, 'ids': list(ids)})
+    except Exception:
+        logger.exception('Falha ao publicar evento do histórico')
+
+
+def _publicar_por_usuario(tipo, pares, using):
+    """Publica, depois do commit, um evento por usuário dos pares ``(usuario_id, operacao_id)``."""
+    por_usuario = {}
+    for usuario_id, operacao_id in pares:
+        por_usuario.setdefault(usuario_id, []).append(operacao_id)
+    if por_usuario:
+        transaction.on_commit(
+            lambda: [publicar(usuario_id, tipo, ids) for usuario_id, ids in por_usuario.items()],
+            using=using
+        )
+
+
+def ao_criar_operacoes(sender, pares, using=None, **kwargs):
+    _publicar_por_usuario(CRIADAS, pares, using)
+
+
+def ao_remover_operacoes(sender, pares, using=None, **kwargs):
+    _publicar_por_usuario(REMOVIDAS, pares, using)
+
+
+def ao_limpar_historico(sender, usuario_id, using=None, **kwargs):
+    transaction.on_commit(lambda: publicar(usuario_id, LIMPO), using=using)
+
+
+def assinar(usuario_id):
+    """Abre uma ``Assinatura`` no event loop atual."""
+    global _iniciado
+    with _lock_inicio:
+        if not _iniciado:
+            obter_broker().iniciar(_difusor)
+            _iniciado = True
+    return _difusor.assinar(usuario_id, getattr(settings, 'CALCULADORA_EVENTOS_BUFFER', BUFFER_PADRAO))
+
+
+def formatar(evento):
+    """Evento no formato ``text/event-stream``."""
+    return f"event: {evento['tipo']}\ndata: {json.dumps({'ids': evento.get('ids', [])})}\n\n"
+
+
+async def fluxo(assinatura):
+    """Corpo da resposta SSE; encerra a assinatura quando o cliente desconecta."""
+    heartbeat = getattr(settings, 'CALCULADORA_EVENTOS_HEARTBEAT', HEARTBEAT_PADRAO)
+    try:
+        yield f'retry: {RECONEXAO_MS}\n\n'
+        while True:
+            evento = await assinatura.proximo(heartbeat)
+            yield ': keepalive\n\n' if evento is None else formatar(evento)
+    finally:
+        assinatura.cancelar()
+
+
+def estatisticas():
+    return _difusor.estatisticas()
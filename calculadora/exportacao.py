@@ -0,0 +1,85 @@
+"""
+Exportação do histórico completo (``historico/exportar/``).
+
+As linhas são lidas com ``iterator(chunk_size=...)``, ou seja, com um cursor
+do banco e sem cache do queryset, e serializadas em blocos de
+``CALCULADORA_EXPORTACAO_LOTE`` linhas. Cada bloco vira um pedaço da
+resposta (CSV ou NDJSON) e, se o cliente aceita, passa pelo gzip ao ser
+enviado. A memória usada é a de um bloco, tenha o usuário 10 ou 10 milhões
+de operações, e não há ``COUNT(*)``.
+"""
+import csv
+import io
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+
+from kogui_portal.compressao import aceita_gzip
+from kogui_portal.renderers import dumps
+
+from .serializers import OperacaoListaSerializer
+
+LOTE_PADRAO = 2000
+
+COLUNAS_CSV = (
+    'id', 'tipo_operacao', 'simbolo_operacao', 'parametros', 'parametros_display',
+    'resultado_serializado', 'data_criacao',
+)
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def _blocos(linhas, usuario, tamanho):
+    """Dicionários de ``OperacaoListaSerializer``, ``tamanho`` linhas por vez."""
+    linhas = linhas.iterator(chunk_size=tamanho)
+    while True:
+        bloco = list(islice(linhas, tamanho))
+        if not bloco:
+            return
+        yield OperacaoListaSerializer(bloco, usuario).data
+
+
+def _csv(blocos):
+    saida = io.StringIO()
+    escritor = csv.DictWriter(saida, COLUNAS_CSV, extrasaction='ignore')
+    escritor.writeheader()
+    for bloco in blocos:
+        escritor.writerows(bloco)
+        yield saida.getvalue().encode()
+        saida.seek(0)
+        saida.truncate()
+    resto = saida.getvalue()
+    if resto:
+        yield resto.encode()
+
+
+def _ndjson(blocos):
+    for bloco in blocos:
+        yield b''.join(dumps(item) + b'\n' for item in bloco)
+
+
+def exportar(request, operacoes, formato):
+    """
+    ``StreamingHttpResponse`` com as ``operacoes`` (já filtradas e ordenadas)
+    de ``request.user`` em ``formato`` (uma chave de ``FORMATOS``).
+    """
+    tipo_conteudo, extensao = FORMATOS[formato]
+    tamanho = getattr(settings, 'CALCULADORA_EXPORTACAO_LOTE', LOTE_PADRAO)
+    blocos = _blocos(OperacaoListaSerializer.consulta(operacoes), request.user, tamanho)
+    conteudo = _csv(blocos) if formato == 'csv' else _ndjson(blocos)
+
+    gzip = aceita_gzip(request)
+    resposta = StreamingHttpResponse(compress_sequence(conteudo) if gzip else conteudo, content_type=tipo_conteudo)
+    if gzip:
+        # Já comprimida: o GZipMiddleware não comprime de novo
+        resposta['Content-Encoding'] = 'gzip'
+    patch_vary_headers(resposta, ('Accept-Encoding',))
+    resposta['Content-Disposition'] = f'attachment; filename="historico.{extensao}"'
+    resposta['Cache-Control'] = 'private, no-store'
+    return resposta
@@ -0,0 +1,129 @@
+"""
+Avaliação segura de expressões infixas (``2 + 3 × (4 - 1)``), sem ``eval``.
+
+A expressão é separada em *forma* e *literais*: ``2 + 3 * 4`` vira a forma
+``n+n*n`` e os literais ``[2.0, 3.0, 4.0]``. Cada forma é compilada uma única
+vez (shunting-yard) para um pequeno programa de pilha em notação pós-fixa,
+guardado em um cache LRU; expressões repetidas com outros números reutilizam
+o plano e pulam a análise sintática.
+"""
+import operator
+import re
+from functools import lru_cache
+
+from .engine import DivisaoPorZero, ErroCalculo
+
+TAMANHO_MAXIMO = 10_000
+TAMANHO_CACHE_PLANOS = 1024
+
+TOKEN = re.compile(r'\s*(?:(\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)|(.))')
+NORMALIZAR_OPERADOR = {'+': '+', '-': '-', '*': '*', '/': '/', '×': '*', '÷': '/', 'x': '*'}
+
+# Instruções do programa de pilha
+EMPILHAR, NEGAR, BINARIA = 0, 1, 2
+
+PRECEDENCIA = {'+': 1, '-': 1, '*': 2, '/': 2, 'neg': 3}
+BINARIOS = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv}
+
+
+class ExpressaoInvalida(ErroCalculo):
+    pass
+
+
+def separar(expressao):
+    """Retorna ``(forma, literais)`` de uma expressão em texto."""
+    if len(expressao) > TAMANHO_MAXIMO:
+        raise ExpressaoInvalida(f'A expressão deve ter no máximo {TAMANHO_MAXIMO} caracteres.')
+    forma = []
+    literais = []
+    for numero, simbolo in TOKEN.findall(expressao.rstrip()):
+        if numero:
+            forma.append('n')
+            literais.append(float(numero))
+        elif simbolo in '()':
+            forma.append(simbolo)
+        elif simbolo in NORMALIZAR_OPERADOR:
+            forma.append(NORMALIZAR_OPERADOR[simbolo])
+        else:
+            raise ExpressaoInvalida(f'Símbolo inválido na expressão: {simbolo!r}')
+    return ''.join(forma), literais
+
+
+def _desempilhar_operador(operadores, programa):
+    operador = operadores.pop()
+    programa.append((NEGAR, None) if operador == 'neg' else (BINARIA, BINARIOS[operador]))
+
+
+@lru_cache(maxsize=TAMANHO_CACHE_PLANOS)
+def compilar(forma):
+    """Compila uma forma (``n+n*(n-n)``) para uma tupla de instruções pós-fixas."""
+    programa = []
+    operadores = []
+    literal = 0
+    espera_operando = True
+    for simbolo in forma:
+        if espera_operando:
+            if simbolo == 'n':
+                programa.append((EMPILHAR, literal))
+                literal += 1
+                espera_operando = False
+            elif simbolo == '(':
+                operadores.append(simbolo)
+            elif simbolo == '-':
+                operadores.append('neg')
+            elif simbolo != '+':
+                raise ExpressaoInvalida('Expressão malformada: operando esperado.')
+        elif simbolo == ')':
+            while operadores and operadores[-1] != '(':
+                _desempilhar_operador(operadores, programa)
+            if not operadores:
+                raise ExpressaoInvalida('Parênteses não balanceados.')
+            operadores.pop()
+        elif simbolo in BINARIOS:
+            while (operadores and operadores[-1] != '('
+                   and PRECEDENCIA[operadores[-1]] >= PRECEDENCIA[simbolo]):
+                _desempilhar_operador(operadores, programa)
+            operadores.append(simbolo)
+            espera_operando = True
+        else:
+            raise ExpressaoInvalida('Expressão malformada: operador esperado.')
+    if espera_operando:
+        raise ExpressaoInvalida('Expressão incompleta.')
+    while operadores:
+        if operadores[-1] == '(':
+            raise ExpressaoInvalida('Parênteses não balanceados.')
+        _desempilhar_operador(operadores, programa)
+    return tuple(programa)
+
+
+def executar(programa, literais):
+    pilha = []
+    for instrucao, argumento in programa:
+        if instrucao == EMPILHAR:
+            pilha.append(literais[argumento])
+        elif instrucao == NEGAR:
+            pilha[-1] = -pilha[-1]
+        else:
+            direita = pilha.pop()
+            if argumento is operator.truediv and direita == 0:
+                raise DivisaoPorZero('Divisão por zero não é permitida')
+            pilha[-1] = argumento(pilha[-1], direita)
+    return pilha[0]
+
+
+def avaliar(expressao):
+    """Avalia ``expressao`` respeitando precedência e parênteses."""
+    forma, literais = separar(expressao)
+    if not forma:
+        raise ExpressaoInvalida('Expressão vazia.')
+    return executar(compilar(forma), literais)
+
+
+def estatisticas():
+    info = compilar.cache_info()
+    return {
+        'acertos': info.hits,
+        'falhas': info.misses,
+        'planos': info.currsize,
+        'limite': info.maxsize,
+    }
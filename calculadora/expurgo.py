@@ -0,0 +1,220 @@
+"""
+Remoção física das operações de históricos limpos.
+
+``limpar_historico/`` só esconde as operações (``VersaoHistorico.limpo_ate``)
+e cria uma ``LimpezaHistorico``; nada de ``COUNT(*)`` ou ``DELETE`` grande
+dentro da requisição. As linhas são apagadas aqui, por uma thread de cada
+processo, em lotes de ``CALCULADORA_EXPURGO_LOTE`` operações, cada um na sua
+transação curta e seguido de ``CALCULADORA_EXPURGO_PAUSA`` segundos de
+pausa, para que as outras gravações (que no SQLite esperam pelo mesmo lock)
+passem entre um lote e outro.
+
+A thread de cada processo começa na primeira requisição que ele atende
+(``iniciar_na_primeira_requisicao``) já acordada, e retoma as limpezas
+pendentes ou paradas; cada nova limpeza a acorda depois do commit
+(``agendar``). Consultar o andamento não agenda nada.
+
+A limpeza é reivindicada com um ``UPDATE`` condicional, então vários
+processos podem rodar a thread sem apagar a mesma limpeza. Uma limpeza
+``executando`` sem progresso há ``CALCULADORA_EXPURGO_PARADA`` segundos (o
+processo morreu) é retomada por outro; como os lotes são pelos ids da faixa,
+retomar só apaga o que faltou. Limpezas com ``erro`` ficam para
+``manage.py expurgar_historicos``.
+
+Com ``CALCULADORA_EXPURGO_SEGUNDO_PLANO`` desativado, a limpeza é feita na
+própria requisição, depois do commit (útil em testes e instalações simples).
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import LimpezaHistorico, Operacao
+
+logger = logging.getLogger(__name__)
+
+LOTE_PADRAO = 1000
+PAUSA_PADRAO = 0.05
+PARADA_PADRAO = 300
+
+
+class Expurgo:
+
+    def __init__(self, tamanho_lote=LOTE_PADRAO, pausa=PAUSA_PADRAO, parada=PARADA_PADRAO):
+        self.tamanho_lote = tamanho_lote
+        self.pausa = pausa
+        self.parada = parada
+        self._condicao = threading.Condition()
+        self._thread = None
+        self._acordada = False
+        self._em_andamento = None
+        self._concluidas = 0
+        self._removidas = 0
+        self._erros = 0
+
+    # Thread --------------------------------------------------------------
+
+    def iniciar(self):
+        with self._condicao:
+            if self._thread is None:
+                # Começa acordada: retoma as limpezas deixadas por processos anteriores
+                self._acordada = True
+                self._thread = threading.Thread(target=self._executar, name='calculadora-expurgo', daemon=True)
+                self._thread.start()
+
+    def acordar(self):
+        with self._condicao:
+            self._acordada = True
+            self._condicao.notify()
+
+    def _executar(self):
+        while True:
+            with self._condicao:
+                self._condicao.wait_for(lambda: self._acordada, timeout=self.parada)
+                self._acordada = False
+            close_old_connections()
+            try:
+                self.processar()
+            except Exception:
+                logger.exception('Falha ao buscar limpezas do histórico pendentes')
+
+    # Limpezas ------------------------------------------------------------
+
+    def reivindicar(self, estados=(LimpezaHistorico.PENDENTE,)):
+        """
+        Próxima limpeza em ``estados`` (ou ``executando`` e parada), já
+        marcada como ``executando`` por este processo; ``None`` se não há.
+        """
+        agora = timezone.now()
+        candidatas = LimpezaHistorico.objects.filter(
+            Q(estado__in=estados)
+            | Q(estado=LimpezaHistorico.EXECUTANDO, data_atualizacao__lt=agora - timedelta(seconds=self.parada))
+        ).order_by('id')
+        for limpeza in candidatas[:10]:
+            reivindicada = LimpezaHistorico.objects.filter(
+                pk=limpeza.pk, estado=limpeza.estado, data_atualizacao=limpeza.data_atualizacao
+            ).update(estado=LimpezaHistorico.EXECUTANDO, data_atualizacao=agora)
+            if reivindicada:
+                limpeza.estado, limpeza.data_atualizacao = LimpezaHistorico.EXECUTANDO, agora
+                return limpeza
+        return None
+
+    def processar(self, estados=(LimpezaHistorico.PENDENTE,)):
+        """Executa as limpezas até não sobrar nenhuma; retorna quantas foram concluídas."""
+        concluidas = 0
+        while (limpeza := self.reivindicar(estados)) is not None:
+            concluidas += self.executar(limpeza)
+        return concluidas
+
+    def executar(self, limpeza):
+        """Apaga as operações de uma limpeza já reivindicada, lote a lote."""
+        with self._condicao:
+            self._em_andamento = limpeza.pk
+        try:
+            while apagadas := limpeza.apagar_lote(self.tamanho_lote):
+                with self._condicao:
+                    self._removidas += apagadas
+                time.sleep(self.pausa)
+            limpeza.concluir()
+        except Exception as e:
+            logger.exception('Falha na limpeza do histórico %s', limpeza.pk)
+            LimpezaHistorico.objects.filter(pk=limpeza.pk).update(
+                estado=LimpezaHistorico.ERRO, erro=str(e), data_atualizacao=timezone.now()
+            )
+            with self._condicao:
+                self._erros += 1
+            return False
+        finally:
+            with self._condicao:
+                self._em_andamento = None
+        with self._condicao:
+            self._concluidas += 1
+        return True
+
+    def estatisticas(self):
+        with self._condicao:
+            return {
+                'ativa': self._thread is not None,
+                'em_andamento': self._em_andamento,
+                'limpezas_concluidas': self._concluidas,
+                'operacoes_removidas': self._removidas,
+                'erros': self._erros,
+            }
+
+
+_expurgo = None
+_expurgo_lock = threading.Lock()
+_iniciado = False
+
+
+def segundo_plano_ativo():
+    return getattr(settings, 'CALCULADORA_EXPURGO_SEGUNDO_PLANO', True)
+
+
+def obter_expurgo():
+    global _expurgo
+    with _expurgo_lock:
+        if _expurgo is None:
+            _expurgo = Expurgo(
+                tamanho_lote=getattr(settings, 'CALCULADORA_EXPURGO_LOTE', LOTE_PADRAO),
+                pausa=getattr(settings, 'CALCULADORA_EXPURGO_PAUSA', PAUSA_PADRAO),
+                parada=getattr(settings, 'CALCULADORA_EXPURGO_PARADA', PARADA_PADRAO),
+            )
+        return _expurgo
+
+
+def iniciar_na_primeira_requisicao(**kwargs):
+    """
+    Receptor de ``request_started`` ligado em ``CalculadoraConfig.ready``:
+    inicia a thread deste processo, que começa acordada e retoma as limpezas
+    pendentes. Não roda no ``ready`` em si para não acessar o banco em
+    ``migrate`` e nos testes.
+    """
+    global _iniciado
+    if _iniciado or not segundo_plano_ativo():
+        return
+    _iniciado = True
+    obter_expurgo().iniciar()
+
+
+def agendar():
+    """
+    Faz a limpeza andar: acorda a thread deste processo (iniciando-a se
+    preciso) ou, sem segundo plano, executa as pendentes depois do commit.
+    """
+    expurgo = obter_expurgo()
+    if segundo_plano_ativo():
+        expurgo.iniciar()
+        transaction.on_commit(expurgo.acordar)
+    else:
+        transaction.on_commit(expurgo.processar)
+
+
+def limpar_historico(usuario):
+    """Limpa o histórico de ``usuario``; retorna a ``LimpezaHistorico`` ou ``None``."""
+    limpeza = Operacao.objects.limpar_historico(usuario)
+    if limpeza is not None:
+        agendar()
+    return limpeza
+
+
+def excluir_usuario(usuario):
+    """
+    Exclui a conta de ``usuario`` sem um ``DELETE`` em cascata de todo o
+    histórico: a conta é desativada e o histórico limpo na hora, e ela é
+    apagada quando a ``LimpezaHistorico`` terminar.
+    """
+    limpeza = Operacao.objects.limpar_historico(usuario, excluir_usuario=True)
+    agendar()
+    return limpeza
+
+
+def estatisticas():
+    if _expurgo is None:
+        return {'ativa': False}
+    return _expurgo.estatisticas()
@@ -0,0 +1,170 @@
+"""
+Campo de modelo para listas de números guardadas em binário compacto.
+
+O valor no banco é um byte de formato seguido do corpo. Quando todos os
+números têm poucas casas decimais (o caso comum na calculadora: ``12``,
+``10.5``, ``3.75``), o corpo é ``int32`` little-endian com os números
+multiplicados por ``10 ** escala``; os demais ficam em float64 little-endian.
+A conversão só é usada quando a volta é exata. Acima de
+``CALCULADORA_PARAMETROS_COMPRIMIR_ACIMA`` bytes o corpo é comprimido com
+zlib quando isso de fato reduz o tamanho.
+
+Lido do banco, o valor fica em bytes na instância e só é decodificado no
+primeiro acesso ao atributo; a lista decodificada fica guardada na própria
+instância.
+"""
+import json
+import sys
+import zlib
+from array import array
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+from .engine import np
+
+# Byte de formato: bit 0 = zlib, bit 1 = int32, bits 2-4 = escala decimal
+FORMATO_ZLIB = 0b1
+FORMATO_INT32 = 0b10
+ESCALA_MAXIMA = 4
+LIMITE_INT32 = 2 ** 31
+COMPRIMIR_ACIMA_PADRAO = 1024
+
+TIPOS_BINARIOS = (bytes, bytearray, memoryview)
+
+
+def _escala_numpy(valores):
+    with np.errstate(invalid='ignore', over='ignore'):
+        for escala in range(ESCALA_MAXIMA + 1):
+            fator = 10 ** escala
+            inteiros = np.rint(valores * fator)
+            if np.array_equal(inteiros / fator, valores) and np.all(np.abs(inteiros) < LIMITE_INT32):
+                return escala, inteiros.astype('<i4')
+    return None, None
+
+
+def _escala_python(valores):
+    for escala in range(ESCALA_MAXIMA + 1):
+        fator = 10 ** escala
+        try:
+            if all(round(n * fator) / fator == n and abs(n * fator) < LIMITE_INT32 for n in valores):
+                return escala, array('i', [round(n * fator) for n in valores])
+        except (OverflowError, ValueError):  # inf ou nan
+            return None, None
+    return None, None
+
+
+def _corpo(numeros):
+    """Retorna ``(formato, corpo)`` sem compressão."""
+    if np is not None and isinstance(numeros, np.ndarray):
+        valores = np.ascontiguousarray(numeros, dtype='<f8')
+        escala, inteiros = _escala_numpy(valores)
+        if escala is None:
+            return 0, valores.tobytes()
+        return FORMATO_INT32 | escala << 2, inteiros.tobytes()
+
+    valores = array('d', numeros)
+    escala, inteiros = _escala_python(valores)
+    formato = 0
+    if escala is not None:
+        valores = inteiros
+        formato = FORMATO_INT32 | escala << 2
+    if sys.byteorder != 'little':
+        valores.byteswap()
+    return formato, valores.tobytes()
+
+
+def codificar_float64(numeros, comprimir_acima=None):
+    """Empacota ``numeros`` no formato do campo (byte de formato + corpo)."""
+    formato, corpo = _corpo(numeros)
+
+    if comprimir_acima is None:
+        comprimir_acima = getattr(settings, 'CALCULADORA_PARAMETROS_COMPRIMIR_ACIMA', COMPRIMIR_ACIMA_PADRAO)
+    if comprimir_acima and len(corpo) > comprimir_acima:
+        comprimido = zlib.compress(corpo)
+        if len(comprimido) < len(corpo):
+            return bytes([formato | FORMATO_ZLIB]) + comprimido
+    return bytes([formato]) + corpo
+
+
+def decodificar_float64(dados):
+    """Lista de floats a partir do formato gravado por ``codificar_float64``."""
+    dados = bytes(dados)
+    if not dados:
+        return []
+    formato, corpo = dados[0], dados[1:]
+    escala = formato >> 2
+    if escala > ESCALA_MAXIMA or (escala and not formato & FORMATO_INT32):
+        raise ValueError(f'Formato de parâmetros desconhecido: {formato}')
+    if formato & FORMATO_ZLIB:
+        corpo = zlib.decompress(corpo)
+
+    if not formato & FORMATO_INT32:
+        valores = array('d', corpo)
+        if sys.byteorder != 'little':
+            valores.byteswap()
+        return valores.tolist()
+
+    inteiros = array('i', corpo)
+    if sys.byteorder != 'little':
+        inteiros.byteswap()
+    if escala:
+        fator = 10 ** escala
+        return [i / fator for i in inteiros]
+    return array('d', inteiros).tolist()
+
+
+class Float64ArrayDescriptor(DeferredAttribute):
+    """Decodifica o valor do banco no primeiro acesso e guarda a lista na instância."""
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        valor = super().__get__(instance, cls)
+        if isinstance(valor, TIPOS_BINARIOS):
+            valor = decodificar_float64(valor)
+            instance.__dict__[self.field.attname] = valor
+        return valor
+
+    def __set__(self, instance, valor):
+        instance.__dict__[self.field.attname] = valor
+
+
+class Float64ArrayField(models.BinaryField):
+    """
+    Lista de números em float64, como ``BinaryField``.
+
+    Aceita listas, tuplas, arrays do NumPy ou ``memoryview`` de floats na
+    atribuição; na leitura devolve sempre uma lista de ``float``.
+    """
+    descriptor_class = Float64ArrayDescriptor
+
+    def pre_save(self, model_instance, add):
+        # Sem passar pelo descriptor: um valor lido do banco e não acessado é
+        # gravado de volta sem ser decodificado.
+        return model_instance.__dict__.get(self.attname)
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, TIPOS_BINARIOS):
+            return value
+        return codificar_float64(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, list):
+            return value
+        if isinstance(value, TIPOS_BINARIOS):
+            return decodificar_float64(value)
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise ValidationError('Os parâmetros devem ser uma lista JSON de números.')
+        try:
+            return [float(n) for n in value]
+        except (TypeError, ValueError):
+            raise ValidationError('Os parâmetros devem ser uma lista de números.')
+
+    def value_to_string(self, obj):
+        return json.dumps(self.value_from_object(obj))
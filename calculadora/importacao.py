@@ -0,0 +1,304 @@
+"""
+Importação de históricos em massa (``importar/`` e ``manage.py importar_operacoes``).
+
+A entrada é CSV (com cabeçalho) ou NDJSON, um registro por linha, com
+``tipo_operacao``, os números em ``numeros`` ou ``parametros`` (lista ou texto
+JSON, como na exportação) e, opcionalmente, ``data_criacao`` em ISO 8601. As
+demais colunas são ignoradas, então um arquivo de ``historico/exportar/`` pode
+ser importado de volta.
+
+A entrada é lida aos poucos e processada em blocos de
+``CALCULADORA_IMPORTACAO_LOTE`` registros: cada bloco é validado, calculado
+e gravado por ``OperacaoQuerySet.inserir_linhas`` (operandos, versão do
+histórico e eventos incluídos, como no ``bulk_create``) na sua própria
+transação. Registros inválidos não impedem a
+gravação dos demais e são informados com o número do registro (contado a
+partir de 1, sem o cabeçalho e sem linhas vazias).
+
+Depois de cada bloco ``Importacao.executar`` produz o progresso. Nele,
+``registros`` é quantos registros já foram processados e gravados. Uma
+importação interrompida é retomada enviando a mesma entrada com
+``pular=registros``. Com ``simular`` tudo é validado e calculado, mas nada é
+gravado.
+"""
+import csv
+import io
+import logging
+import zlib
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_datetime
+
+from kogui_portal.compressao import aceita_gzip
+from kogui_portal.parsers import loads
+from kogui_portal.renderers import dumps
+
+from .engine import OPERACOES, ErroCalculo, calcular, como_lista, normalizar_numeros
+from .models import Operacao, verificar_resultado
+
+logger = logging.getLogger(__name__)
+
+LOTE_PADRAO = 5000
+TAMANHO_BLOCO_LEITURA = 64 * 1024
+
+FORMATOS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class ErroImportacao(ValueError):
+    """Entrada que não pode ser importada (formato ou cabeçalho inválido)."""
+
+
+def formato_do_arquivo(nome, tipo_conteudo=''):
+    """Formato pela extensão de ``nome`` ou pelo ``tipo_conteudo``; ``None`` se nenhum bate."""
+    nome = (nome or '').lower().removesuffix('.gz')
+    for formato, tipo in FORMATOS.items():
+        if nome.endswith(f'.{formato}') or tipo_conteudo.startswith(tipo):
+            return formato
+    return None
+
+
+def _linhas(stream):
+    """
+    Linhas não vazias (bytes) de ``stream``, lido em blocos. Só para NDJSON:
+    no CSV um valor entre aspas pode conter quebras de linha.
+    """
+    resto = b''
+    while True:
+        bloco = stream.read(TAMANHO_BLOCO_LEITURA)
+        if not bloco:
+            break
+        linhas = (resto + bloco).split(b'\n')
+        resto = linhas.pop()
+        for linha in linhas:
+            if linha.strip():
+                yield linha
+    if resto.strip():
+        yield resto
+
+
+class _Bytes(io.RawIOBase):
+    """
+    Qualquer objeto com ``read`` (corpo da requisição, ``wsgi.input``, arquivo)
+    como ``io.RawIOBase``, para ser lido por um ``io.TextIOWrapper``. Fechar o
+    adaptador não fecha o ``stream``.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        dados = self.stream.read(len(buffer))
+        buffer[:len(dados)] = dados
+        return len(dados)
+
+
+def _texto(stream):
+    """``stream`` (bytes UTF-8, com ou sem BOM) como texto, lido em blocos, para o ``csv``."""
+    return io.TextIOWrapper(
+        io.BufferedReader(_Bytes(stream), TAMANHO_BLOCO_LEITURA),
+        encoding='utf-8-sig', errors='replace', newline=''
+    )
+
+
+class LeitorNDJSON:
+
+    def __init__(self, stream):
+        self.linhas = _linhas(stream)
+
+    def registro(self, linha):
+        try:
+            registro = loads(linha)
+        except ValueError:
+            raise ValueError('Linha NDJSON inválida.')
+        if not isinstance(registro, dict):
+            raise ValueError('Cada linha deve ser um objeto JSON.')
+        return registro
+
+
+class LeitorCSV:
+    COLUNAS_NUMEROS = ('numeros', 'parametros')
+
+    def __init__(self, stream):
+        self.linhas = self._linhas(csv.reader(_texto(stream)))
+        try:
+            self.colunas = self._valores(next(self.linhas))
+        except (StopIteration, ValueError):
+            raise ErroImportacao('CSV sem cabeçalho.')
+        if 'tipo_operacao' not in self.colunas or not set(self.COLUNAS_NUMEROS) & set(self.colunas):
+            raise ErroImportacao('O cabeçalho do CSV precisa de tipo_operacao e numeros ou parametros.')
+
+    @staticmethod
+    def _linhas(leitor):
+        """
+        Registros não vazios (listas de valores) de um ``csv.reader``, lido aos
+        poucos. Um registro que o ``csv`` recusa vira um ``ValueError`` no lugar
+        dele, e a leitura continua no seguinte.
+        """
+        while True:
+            try:
+                valores = next(leitor)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield ValueError(f'Linha CSV inválida: {e}')
+                continue
+            if len(valores) > 1 or (valores and valores[0].strip()):
+                yield valores
+
+    @staticmethod
+    def _valores(linha):
+        if isinstance(linha, ValueError):
+            raise linha
+        return linha
+
+    def registro(self, linha):
+        valores = self._valores(linha)
+        if len(valores) != len(self.colunas):
+            raise ValueError(f'Esperadas {len(self.colunas)} colunas, encontradas {len(valores)}.')
+        return {coluna: valor for coluna, valor in zip(self.colunas, valores) if valor != ''}
+
+
+def abrir(stream, formato):
+    """Leitor de ``stream``; levanta ``ErroImportacao`` se o cabeçalho for inválido."""
+    if formato not in FORMATOS:
+        raise ErroImportacao(f"Formato inválido. Use {' ou '.join(FORMATOS)}.")
+    return LeitorCSV(stream) if formato == 'csv' else LeitorNDJSON(stream)
+
+
+def _data_criacao(valor, agora):
+    if valor is None:
+        return agora
+    data = parse_datetime(valor) if isinstance(valor, str) else None
+    if data is None:
+        raise ValueError('data_criacao deve ser uma data ISO 8601.')
+    if timezone.is_naive(data):
+        data = timezone.make_aware(data)
+    return data
+
+
+class Importacao:
+
+    def __init__(self, usuario, lote=None, simular=False, pular=0):
+        self.usuario = usuario
+        self.lote = lote or getattr(settings, 'CALCULADORA_IMPORTACAO_LOTE', LOTE_PADRAO)
+        self.simular = simular
+        self.pular = pular
+        self.registros = 0
+        self.importadas = 0
+        self.erros = 0
+
+    def linha(self, registro, agora):
+        """
+        Valores de ``Operacao.CAMPOS_INSERCAO`` a partir de um registro;
+        levanta ValueError se ele for inválido.
+        """
+        tipo_operacao = registro.get('tipo_operacao')
+        if not isinstance(tipo_operacao, str) or tipo_operacao not in OPERACOES:
+            raise ErroCalculo('Tipo de operação inválido')
+        numeros = registro.get('numeros', registro.get('parametros'))
+        if isinstance(numeros, str):
+            try:
+                numeros = loads(numeros)
+            except ValueError:
+                raise ErroCalculo('Os números devem ser uma lista JSON.')
+        if not isinstance(numeros, list) or len(numeros) < 2:
+            raise ErroCalculo('Envie uma lista de números válida com pelo menos 2 valores.')
+        numeros = normalizar_numeros(numeros)
+        resultado = calcular(tipo_operacao, numeros)
+        verificar_resultado(resultado)
+        return (
+            self.usuario.pk, tipo_operacao, como_lista(numeros), len(numeros), '', resultado,
+            _data_criacao(registro.get('data_criacao'), agora),
+        )
+
+    def executar(self, leitor):
+        """
+        Processa o ``leitor`` bloco a bloco e, depois de gravar cada bloco,
+        gera o progresso: ``registros``, ``importadas`` e ``erros`` (totais) e
+        ``erros_bloco`` (``{'registro': n, 'error': ...}`` do bloco).
+        """
+        while True:
+            bloco = list(islice(leitor.linhas, self.lote))
+            if not bloco:
+                return
+            inicio = self.registros
+            self.registros += len(bloco)
+            if self.registros <= self.pular:
+                continue
+
+            agora = timezone.now()
+            linhas, erros = [], []
+            for numero, texto in enumerate(bloco, inicio + 1):
+                if numero <= self.pular:
+                    continue
+                try:
+                    linhas.append(self.linha(leitor.registro(texto), agora))
+                except ValueError as e:
+                    erros.append({'registro': numero, 'error': str(e)})
+
+            if linhas and not self.simular:
+                Operacao.objects.inserir_linhas(linhas)
+            self.importadas += len(linhas)
+            self.erros += len(erros)
+            yield {
+                'registros': self.registros,
+                'importadas': self.importadas,
+                'erros': self.erros,
+                'erros_bloco': erros,
+            }
+
+    def resumo(self):
+        return {
+            'registros': self.registros,
+            'importadas': self.importadas,
+            'erros': self.erros,
+            'simulacao': self.simular,
+        }
+
+
+def _progresso(importacao, leitor):
+    """Uma linha NDJSON por bloco gravado e uma final (``concluido`` ou ``error``)."""
+    gravados = importacao.pular
+    try:
+        for progresso in importacao.executar(leitor):
+            gravados = progresso['registros']
+            yield dumps(progresso) + b'\n'
+    except Exception as e:
+        logger.exception('Falha na importação de operações')
+        yield dumps({'error': f'Erro inesperado: {e}', 'registros': gravados}) + b'\n'
+        return
+    yield dumps({'concluido': True, **importacao.resumo()}) + b'\n'
+
+
+def _gzip_por_linha(conteudo):
+    """gzip que envia cada pedaço assim que ele é gerado (``Z_SYNC_FLUSH``)."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for pedaco in conteudo:
+        yield compressor.compress(pedaco) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def resposta_progresso(request, importacao, leitor):
+    """
+    ``StreamingHttpResponse`` que executa a importação enquanto envia o
+    progresso. Comprimida aqui, linha a linha, quando o cliente aceita gzip:
+    o ``GZipMiddleware`` seguraria as linhas até juntar um bloco.
+    """
+    conteudo = _progresso(importacao, leitor)
+    gzip = aceita_gzip(request)
+    resposta = StreamingHttpResponse(_gzip_por_linha(conteudo) if gzip else conteudo, content_type='application/x-ndjson')
+    if gzip:
+        resposta['Content-Encoding'] = 'gzip'
+    patch_vary_headers(resposta, ('Accept-Encoding',))
+    resposta['Cache-Control'] = 'no-store'
+    return resposta
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from calculadora import agregados
+
+
+class Command(BaseCommand):
+    help = (
+        'Agrega em AgregadoOperacoes as operações gravadas desde a última execução '
+        'e apaga os intervalos por minuto mais antigos que CALCULADORA_AGREGADOS_MINUTOS_DIAS '
+        '(para rodar periodicamente, por exemplo a cada minuto)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            help='Operações agregadas por transação (padrão: CALCULADORA_AGREGADOS_LOTE)'
+        )
+        parser.add_argument(
+            '--pausa',
+            type=float,
+            help='Segundos de pausa entre os lotes (padrão: CALCULADORA_AGREGADOS_PAUSA)'
+        )
+
+    def handle(self, *args, **options):
+        total = agregados.agregar(options['lote'], options['pausa'])
+        podados = agregados.podar_minutos()
+        self.stdout.write(self.style.SUCCESS(
+            f'Concluído: {total} operação(ões) agregada(s), {podados} intervalo(s) por minuto apagado(s).'
+        ))
@@ -0,0 +1,592 @@
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from calculadora import engine
+from calculadora.parsers import codificar_operacoes, decodificar_operacoes
+
+
+def _medir(funcao, repeticoes=5):
+    """Retorna o melhor tempo (em segundos) de uma chamada de ``funcao``."""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def _formatar_tempo(segundos):
+    if segundos < 1e-3:
+        return f'{segundos * 1e6:9.1f} µs'
+    if segundos < 1:
+        return f'{segundos * 1e3:9.2f} ms'
+    return f'{segundos:9.3f} s '
+
+
+def _calcular_legado(tipo_operacao, numeros):
+    """Implementação antiga (if/elif + laços em Python), mantida só para comparação."""
+    if tipo_operacao == 'soma':
+        resultado = sum(numeros)
+    elif tipo_operacao == 'subtracao':
+        resultado = numeros[0]
+        for num in numeros[1:]:
+            resultado -= num
+    elif tipo_operacao == 'multiplicacao':
+        resultado = 1
+        for num in numeros:
+            resultado *= num
+    elif tipo_operacao == 'divisao':
+        if 0 in numeros[1:]:
+            raise ZeroDivisionError
+        resultado = numeros[0]
+        for num in numeros[1:]:
+            resultado /= num
+    return resultado
+
+
+# Uma requisição sem resposta nesse prazo conta como erro (servidor saturado).
+TIMEOUT_HTTP = 30
+
+
+async def _cliente_http(porta, requisicao, fim, latencias, erros):
+    """Uma conexão keep-alive repetindo ``requisicao`` até ``fim``."""
+    escritor = None
+    try:
+        while time.perf_counter() < fim:
+            if escritor is None:
+                leitor, escritor = await asyncio.open_connection('127.0.0.1', porta)
+            inicio = time.perf_counter()
+            escritor.write(requisicao)
+            await escritor.drain()
+            cabecalho = await asyncio.wait_for(leitor.readuntil(b'\r\n\r\n'), TIMEOUT_HTTP)
+            tamanho = re.search(rb'content-length:\s*(\d+)', cabecalho, re.I)
+            await asyncio.wait_for(leitor.readexactly(int(tamanho.group(1)) if tamanho else 0), TIMEOUT_HTTP)
+            if int(cabecalho.split(b' ', 2)[1]) < 400:
+                latencias.append(time.perf_counter() - inicio)
+            else:
+                erros.append(cabecalho.split(b'\r\n', 1)[0])
+            if re.search(rb'connection:\s*close', cabecalho, re.I):
+                escritor.close()
+                escritor = None
+    except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+        erros.append(e)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+async def _carga_http(porta, requisicao, conexoes, duracao):
+    latencias, erros = [], []
+    inicio = time.perf_counter()
+    await asyncio.gather(*[
+        _cliente_http(porta, requisicao, inicio + duracao, latencias, erros) for _ in range(conexoes)
+    ])
+    # Requisições em andamento no fim do prazo também contam no tempo total.
+    return sorted(latencias), erros, time.perf_counter() - inicio
+
+
+def _aguardar_porta(porta, processo, limite=30):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if processo.poll() is not None:
+            return False
+        try:
+            socket.create_connection(('127.0.0.1', porta), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+class Command(BaseCommand):
+    help = 'Executa micro-benchmarks do motor de cálculo da calculadora'
+
+    TAMANHOS = [10, 10_000, 1_000_000]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'suite',
+            nargs='?',
+            default='motor',
+            choices=['motor', 'numpy', 'binario', 'paralelo', 'servidor', 'armazenamento', 'historico', 'json'],
+            help='Conjunto de benchmarks a executar'
+        )
+        parser.add_argument(
+            '--tamanhos',
+            type=int,
+            nargs='+',
+            default=self.TAMANHOS,
+            help='Quantidades de operandos a medir'
+        )
+        parser.add_argument(
+            '--processos',
+            type=int,
+            nargs='+',
+            default=[1, 2, 4, 8],
+            help='Quantidades de processos da suite paralelo'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Processos de servidor da suite servidor (iguais para WSGI e ASGI)'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Threads por processo do gunicorn gthread (suite servidor)'
+        )
+        parser.add_argument(
+            '--conexoes',
+            type=int,
+            nargs='+',
+            default=[10, 100, 1000],
+            help='Conexões simultâneas da suite servidor'
+        )
+        parser.add_argument(
+            '--duracao',
+            type=float,
+            default=5.0,
+            help='Segundos de carga por medição da suite servidor'
+        )
+        parser.add_argument(
+            '--porta',
+            type=int,
+            default=8765,
+            help='Porta local usada pelos servidores da suite servidor'
+        )
+        parser.add_argument(
+            '--linhas',
+            type=int,
+            default=200_000,
+            help='Operações do usuário de benchmark na suite historico'
+        )
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            default=5,
+            help='Repetições por medição (vale o melhor tempo)'
+        )
+
+    def handle(self, *args, **options):
+        getattr(self, f"suite_{options['suite']}")(options)
+
+    def _operandos(self, tamanho):
+        # Valores próximos de 1 mantêm multiplicação e divisão longe de overflow.
+        gerador = random.Random(tamanho)
+        return [gerador.uniform(0.5, 1.5) for _ in range(tamanho)]
+
+    def suite_motor(self, options):
+        self.stdout.write(f"{'operação':<15}{'operandos':>12}{'legado':>14}{'motor':>14}{'ganho':>9}")
+        for tamanho in options['tamanhos']:
+            numeros = self._operandos(tamanho)
+            for tipo_operacao in engine.OPERACOES:
+                legado = _medir(lambda: _calcular_legado(tipo_operacao, numeros), options['repeticoes'])
+                motor = _medir(lambda: engine.calcular(tipo_operacao, numeros), options['repeticoes'])
+                self.stdout.write(
+                    f'{tipo_operacao:<15}{tamanho:>12}{_formatar_tempo(legado):>14}'
+                    f'{_formatar_tempo(motor):>14}{legado / motor:>8.1f}x'
+                )
+
+    def suite_numpy(self, options):
+        """Localiza, por operação, o menor tamanho em que o caminho NumPy vence o Python puro."""
+        if engine.np is None:
+            self.stderr.write('NumPy não está instalado.')
+            return
+        tamanhos = options['tamanhos']
+        if tamanhos == self.TAMANHOS:
+            tamanhos = [100, 1_000, 2_000, 5_000, 10_000, 20_000, 50_000, 100_000, 1_000_000]
+
+        self.stdout.write(f"{'operação':<15}{'operandos':>12}{'python':>14}{'numpy':>14}{'ganho':>9}")
+        cruzamentos = {}
+        for tamanho in tamanhos:
+            # Simula o que chega de request.data: uma lista de números do JSON.
+            recebidos = self._operandos(tamanho)
+            for tipo_operacao in engine.OPERACOES:
+                python = _medir(
+                    lambda: engine.calcular(tipo_operacao, [float(n) for n in recebidos]),
+                    options['repeticoes']
+                )
+                numpy = _medir(
+                    lambda: engine.calcular(tipo_operacao, engine.np.asarray(recebidos, dtype=engine.np.float64)),
+                    options['repeticoes']
+                )
+                if numpy < python:
+                    cruzamentos.setdefault(tipo_operacao, tamanho)
+                self.stdout.write(
+                    f'{tipo_operacao:<15}{tamanho:>12}{_formatar_tempo(python):>14}'
+                    f'{_formatar_tempo(numpy):>14}{python / numpy:>8.1f}x'
+                )
+
+        self.stdout.write('')
+        for tipo_operacao in engine.OPERACOES:
+            tamanho = cruzamentos.get(tipo_operacao)
+            self.stdout.write(f'{tipo_operacao}: NumPy mais rápido a partir de {tamanho or "—"} operandos')
+        self.stdout.write(f'Limiar configurado (CALCULADORA_NUMPY_LIMIAR): {engine.limiar_numpy()}')
+
+    def suite_binario(self, options):
+        """Compara a leitura de um corpo JSON com a do formato binário float64."""
+        self.stdout.write(f"{'operandos':>12}{'bytes json':>14}{'bytes bin':>14}{'json':>14}{'binário':>14}{'ganho':>9}")
+        for tamanho in options['tamanhos']:
+            numeros = self._operandos(tamanho)
+            corpo_json = json.dumps({'numeros': numeros, 'tipo_operacao': 'soma'}).encode()
+            corpo_binario = codificar_operacoes([('soma', numeros)])
+
+            def via_json():
+                dados = json.loads(corpo_json)
+                engine.calcular('soma', engine.normalizar_numeros(dados['numeros']))
+
+            def via_binario():
+                dados = decodificar_operacoes(corpo_binario)[0]
+                engine.calcular('soma', engine.normalizar_numeros(dados['numeros']))
+
+            tempo_json = _medir(via_json, options['repeticoes'])
+            tempo_binario = _medir(via_binario, options['repeticoes'])
+            self.stdout.write(
+                f'{tamanho:>12}{len(corpo_json):>14}{len(corpo_binario):>14}'
+                f'{_formatar_tempo(tempo_json):>14}{_formatar_tempo(tempo_binario):>14}'
+                f'{tempo_json / tempo_binario:>8.1f}x'
+            )
+
+    def suite_armazenamento(self, options):
+        """Tamanho e custo de leitura de ``parametros``: texto JSON x float64 compactado."""
+        from calculadora.fields import codificar_float64, decodificar_float64
+
+        tamanhos = options['tamanhos']
+        if tamanhos == self.TAMANHOS:
+            tamanhos = [2, 10, 100, 1_000, 10_000]
+
+        self.stdout.write(
+            f"{'operandos':>10}{'bytes json':>12}{'bytes bin':>11}"
+            f"{'json.loads':>14}{'decodificar':>14}{'ganho':>9}"
+        )
+        for tamanho in tamanhos:
+            # Valores como os digitados na calculadora: poucos dígitos decimais.
+            gerador = random.Random(tamanho)
+            numeros = [round(gerador.uniform(-1000, 1000), 2) for _ in range(tamanho)]
+            texto = json.dumps(numeros)
+            binario = codificar_float64(numeros)
+            tempo_json = _medir(lambda: json.loads(texto), options['repeticoes'])
+            tempo_binario = _medir(lambda: decodificar_float64(binario), options['repeticoes'])
+            self.stdout.write(
+                f'{tamanho:>10}{len(texto.encode()):>12}{len(binario):>11}'
+                f'{_formatar_tempo(tempo_json):>14}{_formatar_tempo(tempo_binario):>14}'
+                f'{tempo_json / tempo_binario:>8.1f}x'
+            )
+
+    def suite_paralelo(self, options):
+        """Escalabilidade da redução em vários processos (1 = redução serial)."""
+        from calculadora.paralelo import calcular_paralelo, obter_pool
+
+        tamanhos = options['tamanhos']
+        if tamanhos == self.TAMANHOS:
+            tamanhos = [10_000_000]
+
+        self.stdout.write(f"{'operação':<15}{'operandos':>12}{'processos':>11}{'tempo':>14}{'speedup':>9}")
+        for tamanho in tamanhos:
+            numeros = engine.normalizar_numeros(self._operandos(tamanho))
+            for tipo_operacao in engine.OPERACOES:
+                serial = None
+                for processos in options['processos']:
+                    if processos < 2:
+                        tempo = _medir(lambda: engine.reduzir(tipo_operacao, numeros), options['repeticoes'])
+                    else:
+                        obter_pool(processos).submit(int).result()  # aquece o pool
+                        tempo = _medir(
+                            lambda: calcular_paralelo(tipo_operacao, numeros, processos),
+                            options['repeticoes']
+                        )
+                    serial = serial or tempo
+                    self.stdout.write(
+                        f'{tipo_operacao:<15}{tamanho:>12}{processos:>11}'
+                        f'{_formatar_tempo(tempo):>14}{serial / tempo:>8.2f}x'
+                    )
+
+    def _usuario_benchmark(self, linhas=50):
+        """Usuário ``benchmark@kogui.local`` com pelo menos ``linhas`` operações."""
+        from django.contrib.auth import get_user_model
+        from django.test import override_settings
+
+        from calculadora.models import Operacao
+
+        usuario, _ = get_user_model().objects.get_or_create(
+            email='benchmark@kogui.local',
+            defaults={'username': 'benchmark', 'nome': 'Benchmark'}
+        )
+        faltam = linhas - Operacao.objects.do_usuario(usuario).count()
+        if faltam > 0:
+            self.stdout.write(f'Criando {faltam} operações para o usuário de benchmark...')
+            with override_settings(CALCULADORA_INDICE_OPERANDOS=False):
+                Operacao.objects.bulk_create((
+                    Operacao(usuario=usuario, tipo_operacao='soma', parametros=[float(i), 2.0],
+                             quantidade_parametros=2, resultado=i + 2)
+                    for i in range(faltam)
+                ), batch_size=5000)
+        return usuario
+
+    def _token_benchmark(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        return str(AccessToken.for_user(self._usuario_benchmark()))
+
+    def suite_servidor(self, options):
+        """
+        Vazão de ``historico/`` servido por gunicorn gthread (WSGI, views do DRF)
+        e por uvicorn (ASGI, views de ``api/calc/async/``), com o mesmo número de
+        processos. O gerador de carga roda neste processo: em máquinas com
+        poucos núcleos ele disputa CPU com o servidor.
+        """
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            self.stderr.write('A suite servidor precisa do uvicorn (pip install uvicorn).')
+            return
+
+        token = self._token_benchmark()
+        workers, porta = options['workers'], options['porta']
+        servidores = [
+            ('wsgi gthread', '/api/calc/historico/', [
+                sys.executable, '-m', 'gunicorn', 'kogui_portal.wsgi:application',
+                '-k', 'gthread', '--threads', str(options['threads']), '-w', str(workers),
+                '-b', f'127.0.0.1:{porta}', '--backlog', '4096', '--log-level', 'warning',
+            ]),
+            ('asgi uvicorn', '/api/calc/async/historico/', [
+                sys.executable, '-m', 'uvicorn', 'kogui_portal.asgi:application',
+                '--workers', str(workers), '--port', str(porta), '--backlog', '4096',
+                '--log-level', 'warning', '--no-access-log',
+            ]),
+        ]
+
+        self.stdout.write(f'{workers} processo(s) por servidor, {options["duracao"]:.0f}s por medição')
+        self.stdout.write(f"{'servidor':<15}{'conexões':>10}{'req/s':>10}{'p50':>14}{'p99':>14}{'erros':>8}")
+        for nome, rota, comando in servidores:
+            requisicao = (
+                f'GET {rota} HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+                f'Authorization: Bearer {token}\r\n\r\n'
+            ).encode()
+            processo = subprocess.Popen(comando, env={**os.environ, 'DEBUG': 'False'})
+            try:
+                if not _aguardar_porta(porta, processo):
+                    self.stderr.write(f'{nome}: o servidor não iniciou.')
+                    continue
+                asyncio.run(_carga_http(porta, requisicao, 1, 1.0))  # aquecimento
+                for conexoes in options['conexoes']:
+                    latencias, erros, decorrido = asyncio.run(
+                        _carga_http(porta, requisicao, conexoes, options['duracao'])
+                    )
+                    if not latencias:
+                        self.stdout.write(f'{nome:<15}{conexoes:>10}{"—":>10}{"—":>14}{"—":>14}{len(erros):>8}')
+                        continue
+                    p50 = latencias[len(latencias) // 2]
+                    p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]
+                    self.stdout.write(
+                        f'{nome:<15}{conexoes:>10}{len(latencias) / decorrido:>10.0f}'
+                        f'{_formatar_tempo(p50):>14}{_formatar_tempo(p99):>14}{len(erros):>8}'
+                    )
+            finally:
+                processo.terminate()
+                processo.wait()
+
+    def suite_historico(self, options):
+        """Latência de historico/ por profundidade: paginação numerada x cursor."""
+        from rest_framework.test import APIRequestFactory, force_authenticate
+
+        from calculadora.models import Operacao
+        from calculadora.paginacao import ORDENACAO_HISTORICO, _codificar_cursor
+        from calculadora.views import historico_api
+
+        usuario = self._usuario_benchmark(options['linhas'])
+        total = Operacao.objects.do_usuario(usuario).count()
+        tamanho = 100
+        fabrica = APIRequestFactory()
+
+        def chamar(parametros, esperado=200, **cabecalhos):
+            requisicao = fabrica.get('/api/calc/historico/', parametros, HTTP_HOST='localhost', **cabecalhos)
+            force_authenticate(requisicao, user=usuario)
+            resposta = historico_api(requisicao)
+            assert resposta.status_code == esperado, resposta.status_code
+            return resposta
+
+        self.stdout.write(f'{total} operações, páginas de {tamanho}')
+        self.stdout.write(f"{'profundidade':>14}{'page':>14}{'cursor':>14}{'cursor+total':>14}")
+        sem_cache = override_settings(CALCULADORA_CACHE_HISTORICO='')
+        sem_cache.enable()
+        for fracao in (0, 0.1, 0.5, 0.9, 1):
+            deslocamento = min(int(total * fracao), max(total - tamanho, 0))
+            anterior = (
+                Operacao.objects.do_usuario(usuario).order_by(*ORDENACAO_HISTORICO)
+                .values_list('data_criacao', 'pk')[deslocamento - 1]
+                if deslocamento else None
+            )
+            pagina = {'page': deslocamento // tamanho + 1, 'page_size': tamanho}
+            cursor = {'paginacao': 'cursor', 'page_size': tamanho}
+            if anterior:
+                cursor['cursor'] = _codificar_cursor(*anterior, reverso=False)
+            tempo_pagina = _medir(lambda: chamar(pagina), options['repeticoes'])
+            tempo_cursor = _medir(lambda: chamar(cursor), options['repeticoes'])
+            tempo_total = _medir(lambda: chamar({**cursor, 'total': 'true'}), options['repeticoes'])
+            self.stdout.write(
+                f'{deslocamento:>14}{_formatar_tempo(tempo_pagina):>14}'
+                f'{_formatar_tempo(tempo_cursor):>14}{_formatar_tempo(tempo_total):>14}'
+            )
+        sem_cache.disable()
+
+        self._cache_historico(chamar, tamanho, options)
+        self._delta_historico(chamar, tamanho, options)
+        self._serializacao_historico(usuario, tamanho, options)
+
+    def _cache_historico(self, chamar, tamanho, options):
+        """Primeira página sem cache, com ETag válida (304), com o cache vazio (falha) e já em cache (acerto)."""
+        from calculadora import cache_historico
+
+        self.stdout.write('')
+        self.stdout.write(f"{'cache':<16}{'page':>14}{'cursor':>14}")
+        parametros = [{'page_size': tamanho}, {'paginacao': 'cursor', 'page_size': tamanho}]
+        with override_settings(CALCULADORA_CACHE_HISTORICO=''):
+            tempos = [_medir(lambda: chamar(p), options['repeticoes']) for p in parametros]
+            etags = [chamar(p)['ETag'] for p in parametros]
+            condicionais = [
+                _medir(lambda: chamar(p, 304, HTTP_IF_NONE_MATCH=etag), options['repeticoes'])
+                for p, etag in zip(parametros, etags)
+            ]
+        self.stdout.write(f"{'desativado':<16}" + ''.join(f'{_formatar_tempo(t):>14}' for t in tempos))
+        self.stdout.write(f"{'If-None-Match':<16}" + ''.join(f'{_formatar_tempo(t):>14}' for t in condicionais))
+
+        cache = cache_historico._cache()
+        if cache is None:
+            self.stderr.write('CALCULADORA_CACHE_HISTORICO está desativado.')
+            return
+        falhas = []
+        for p in parametros:
+            def falha():
+                cache.clear()
+                chamar(p)
+            falhas.append(_medir(falha, options['repeticoes']))
+        acertos = [_medir(lambda: chamar(p), options['repeticoes']) for p in parametros]
+        self.stdout.write(f"{'falha':<16}" + ''.join(f'{_formatar_tempo(t):>14}' for t in falhas))
+        self.stdout.write(f"{'acerto':<16}" + ''.join(f'{_formatar_tempo(t):>14}' for t in acertos))
+
+    def _delta_historico(self, chamar, tamanho, options):
+        """Recarregar a primeira página x pedir só o delta desde o último cursor."""
+        from kogui_portal.renderers import dumps
+
+        self.stdout.write('')
+        self.stdout.write(f"{'atualização':<22}{'bytes':>10}{'tempo':>14}")
+        with override_settings(CALCULADORA_CACHE_HISTORICO=''):
+            pagina = {'page_size': tamanho}
+            delta = {'since': chamar({'since': ''}).data['since']}
+            for nome, parametros in (('primeira página', pagina), ('delta (since)', delta)):
+                corpo = dumps(chamar(parametros).data)
+                tempo = _medir(lambda: chamar(parametros), options['repeticoes'])
+                self.stdout.write(f'{nome:<22}{len(corpo):>10}{_formatar_tempo(tempo):>14}')
+
+    def _serializacao_historico(self, usuario, tamanho, options):
+        """Uma página: OperacaoSerializer sobre modelos x OperacaoListaSerializer sobre linhas."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from calculadora.models import Operacao
+        from calculadora.paginacao import ORDENACAO_HISTORICO
+        from calculadora.serializers import OperacaoListaSerializer, OperacaoSerializer
+
+        operacoes = Operacao.objects.do_usuario(usuario).order_by(*ORDENACAO_HISTORICO)
+
+        def modelos():
+            return OperacaoSerializer(operacoes[:tamanho], many=True).data
+
+        def linhas():
+            return OperacaoListaSerializer(OperacaoListaSerializer.consulta(operacoes)[:tamanho], usuario).data
+
+        self.stdout.write('')
+        self.stdout.write(f"{'serialização':<16}{'consultas':>10}{'tempo':>14}")
+        tempos = {}
+        for nome, funcao in (('modelos', modelos), ('linhas', linhas)):
+            with CaptureQueriesContext(connection) as consultas:
+                funcao()
+            tempos[nome] = _medir(funcao, options['repeticoes'])
+            self.stdout.write(f'{nome:<16}{len(consultas):>10}{_formatar_tempo(tempos[nome]):>14}')
+            if nome == 'linhas' and len(consultas) != 1:
+                raise CommandError(f'O caminho de listagem fez {len(consultas)} consultas; esperado 1.')
+        self.stdout.write(f"ganho: {tempos['modelos'] / tempos['linhas']:.1f}x")
+
+    def _pagina_historico(self, tamanho):
+        """Página do histórico como a view monta, a partir de linhas sintéticas."""
+        from collections import namedtuple
+        from decimal import Decimal
+        from types import SimpleNamespace
+
+        from django.utils import timezone
+
+        from calculadora.fields import codificar_float64
+        from calculadora.serializers import OperacaoListaSerializer
+
+        Linha = namedtuple('Linha', OperacaoListaSerializer.CAMPOS)
+        gerador = random.Random(tamanho)
+        agora = timezone.now()
+        linhas = []
+        for i in range(tamanho):
+            numeros = [round(gerador.uniform(-1000, 1000), 2) for _ in range(gerador.randint(2, 8))]
+            linhas.append(Linha(
+                id=i + 1, tipo_operacao=gerador.choice(list(engine.OPERACOES)),
+                parametros=codificar_float64(numeros), quantidade_parametros=len(numeros),
+                digest_parametros='', resultado=Decimal(f'{gerador.uniform(-1e6, 1e6):.2f}'),
+                data_criacao=agora - timezone.timedelta(minutes=i),
+            ))
+        usuario = SimpleNamespace(pk=1, nome='Benchmark')
+        return {
+            'count': 10_000, 'next': 'http://localhost/api/calc/historico/?page=2', 'previous': None,
+            'results': OperacaoListaSerializer(linhas, usuario).data,
+        }
+
+    def suite_json(self, options):
+        """Renderers e parsers da API: JSON do DRF x JSON rápido x MessagePack."""
+        import io
+
+        from rest_framework.parsers import JSONParser
+        from rest_framework.renderers import JSONRenderer
+
+        from kogui_portal.parsers import JSONRapidoParser, MessagePackParser
+        from kogui_portal.renderers import JSONRapidoRenderer, MessagePackRenderer, msgpack, orjson
+
+        if orjson is None:
+            self.stderr.write('orjson não está instalado: o JSON rápido é o próprio JSON do DRF.')
+        formatos = [('drf', JSONRenderer(), JSONParser()), ('rápido', JSONRapidoRenderer(), JSONRapidoParser())]
+        if msgpack is not None:
+            formatos.append(('msgpack', MessagePackRenderer(), MessagePackParser()))
+
+        cargas = [
+            ('resposta calcular', {'message': 'Cálculo realizado com sucesso', 'operacao': self._pagina_historico(1)['results'][0]}),
+            ('histórico 10', self._pagina_historico(10)),
+            ('histórico 100', self._pagina_historico(100)),
+        ]
+        for tamanho in options['tamanhos']:
+            cargas.append((f'numeros {tamanho}', {'tipo_operacao': 'soma', 'numeros': self._operandos(tamanho)}))
+
+        cabecalho = f"{'carga':<20}{'etapa':<10}" + ''.join(f'{nome:>14}' for nome, _, _ in formatos)
+        self.stdout.write(cabecalho + f"{'ganho':>9}")
+        for nome_carga, dados in cargas:
+            corpos = [renderer.render(dados) for _, renderer, _ in formatos]
+            tamanhos = ''.join(f'{len(corpo):>12} B' for corpo in corpos)
+            self.stdout.write(f"{nome_carga:<20}{'bytes':<10}{tamanhos}")
+
+            renderizar = [_medir(lambda: renderer.render(dados), options['repeticoes']) for _, renderer, _ in formatos]
+            ler = [
+                _medir(lambda: parser.parse(io.BytesIO(corpo)), options['repeticoes'])
+                for (_, _, parser), corpo in zip(formatos, corpos)
+            ]
+            for etapa, tempos in (('render', renderizar), ('parse', ler)):
+                self.stdout.write(
+                    f"{'':<20}{etapa:<10}" + ''.join(f'{_formatar_tempo(t):>14}' for t in tempos)
+                    + f'{tempos[0] / tempos[1]:>8.1f}x'
+                )
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from calculadora.expurgo import PARADA_PADRAO, PAUSA_PADRAO, Expurgo
+from calculadora.models import LimpezaHistorico
+
+
+class Command(BaseCommand):
+    help = (
+        'Apaga agora as operações das limpezas do histórico pendentes, paradas '
+        '(sem progresso há CALCULADORA_EXPURGO_PARADA segundos) e, com --erros, as que falharam'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=getattr(settings, 'CALCULADORA_EXPURGO_LOTE', 1000),
+            help='Operações apagadas por transação'
+        )
+        parser.add_argument(
+            '--pausa',
+            type=float,
+            default=getattr(settings, 'CALCULADORA_EXPURGO_PAUSA', PAUSA_PADRAO),
+            help='Segundos de pausa entre os lotes'
+        )
+        parser.add_argument(
+            '--erros',
+            action='store_true',
+            help='Tenta de novo as limpezas que terminaram com erro'
+        )
+
+    def handle(self, *args, **options):
+        expurgo = Expurgo(
+            tamanho_lote=options['lote'],
+            pausa=options['pausa'],
+            parada=getattr(settings, 'CALCULADORA_EXPURGO_PARADA', PARADA_PADRAO),
+        )
+        estados = (LimpezaHistorico.PENDENTE, LimpezaHistorico.ERRO) if options['erros'] else (LimpezaHistorico.PENDENTE,)
+        concluidas = expurgo.processar(estados)
+        estatisticas = expurgo.estatisticas()
+        self.stdout.write(self.style.SUCCESS(
+            f"Concluído: {concluidas} limpeza(s), {estatisticas['operacoes_removidas']} operação(ões) apagada(s)."
+        ))
+        if estatisticas['erros']:
+            self.stderr.write(self.style.ERROR(f"{estatisticas['erros']} limpeza(s) com erro."))
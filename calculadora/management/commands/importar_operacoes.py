@@ -0,0 +1,78 @@
+import gzip
+import json
+import sys
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from calculadora import importacao
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa operações de um arquivo CSV ou NDJSON (ou .gz, ou - para a entrada padrão) '
+        'para o histórico de um usuário, em blocos gravados cada um na sua transação'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo; - lê da entrada padrão')
+        parser.add_argument('--usuario', required=True, help='E-mail do dono das operações')
+        parser.add_argument(
+            '--formato',
+            choices=list(importacao.FORMATOS),
+            help='Formato da entrada (padrão: pela extensão do arquivo)'
+        )
+        parser.add_argument('--lote', type=int, help='Registros por transação (padrão: CALCULADORA_IMPORTACAO_LOTE)')
+        parser.add_argument('--simular', action='store_true', help='Valida e calcula sem gravar nada')
+        parser.add_argument('--pular', type=int, default=0, help='Registros iniciais já importados')
+        parser.add_argument(
+            '--progresso',
+            help='Arquivo onde o progresso é salvo após cada bloco; se existir, a importação é retomada dele'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            usuario = get_user_model().objects.get(email=options['usuario'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Usuário {options['usuario']} não encontrado.")
+
+        arquivo = options['arquivo']
+        formato = options['formato'] or importacao.formato_do_arquivo(arquivo)
+        progresso = Path(options['progresso']) if options['progresso'] else None
+        pular = options['pular']
+        if progresso is not None and progresso.exists():
+            pular = json.loads(progresso.read_text())['registros']
+            self.stdout.write(f'Retomando após {pular} registro(s) ({progresso}).')
+
+        if arquivo == '-':
+            entrada = sys.stdin.buffer
+        elif arquivo.endswith('.gz'):
+            entrada = gzip.open(arquivo, 'rb')
+        else:
+            entrada = open(arquivo, 'rb')
+        with entrada:
+            try:
+                leitor = importacao.abrir(entrada, formato)
+            except importacao.ErroImportacao as e:
+                raise CommandError(str(e))
+            execucao = importacao.Importacao(
+                usuario, lote=options['lote'], simular=options['simular'], pular=pular
+            )
+            for bloco in execucao.executar(leitor):
+                for erro in bloco['erros_bloco']:
+                    self.stderr.write(f"registro {erro['registro']}: {erro['error']}")
+                if progresso is not None and not options['simular']:
+                    progresso.write_text(json.dumps({'arquivo': arquivo, 'registros': bloco['registros']}))
+                self.stdout.write(
+                    f"{bloco['registros']} registro(s) processado(s): "
+                    f"{bloco['importadas']} importado(s), {bloco['erros']} erro(s)"
+                )
+
+        if progresso is not None and not options['simular'] and progresso.exists():
+            progresso.unlink()
+        resumo = execucao.resumo()
+        acao = 'validado(s) (simulação, nada gravado)' if options['simular'] else 'importado(s)'
+        self.stdout.write(self.style.SUCCESS(
+            f"Concluído: {resumo['importadas']} registro(s) {acao}, {resumo['erros']} erro(s)."
+        ))
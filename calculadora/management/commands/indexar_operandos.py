@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from calculadora.models import Operacao, OperandoOperacao, VersaoHistorico, indice_operandos_ativo
+
+
+class Command(BaseCommand):
+    help = (
+        'Preenche OperandoOperacao para operações gravadas sem índice de operandos '
+        '(linhas antigas ou gravadas com CALCULADORA_INDICE_OPERANDOS desativado)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Operações indexadas por transação'
+        )
+        parser.add_argument(
+            '--remover-orfaos',
+            action='store_true',
+            help='Apaga também operandos cuja operação não existe mais'
+        )
+
+    def handle(self, *args, **options):
+        if not indice_operandos_ativo():
+            raise CommandError('CALCULADORA_INDICE_OPERANDOS está desativado.')
+
+        if options['remover_orfaos']:
+            removidos, _ = OperandoOperacao.objects.filter(
+                ~Exists(Operacao.objects.filter(pk=OuterRef('operacao_id')))
+            ).delete()
+            self.stdout.write(f'{removidos} operando(s) órfão(s) removido(s).')
+
+        # Só operações sem operandos: a execução pode ser interrompida e retomada.
+        pendentes = Operacao.objects.filter(
+            quantidade_parametros__gt=0,
+            quantidade_parametros__lte=getattr(settings, 'CALCULADORA_INDICE_OPERANDOS_MAXIMO', 1000),
+        ).filter(
+            ~Exists(OperandoOperacao.objects.filter(operacao=OuterRef('pk')))
+        ).order_by('pk').only('pk', 'usuario_id', 'parametros')
+
+        ultimo_pk = 0
+        total = 0
+        while True:
+            lote = list(pendentes.filter(pk__gt=ultimo_pk)[:options['lote']])
+            if not lote:
+                break
+            with transaction.atomic():
+                OperandoOperacao.indexar(lote)
+                # Invalida as páginas em cache filtradas por valor
+                VersaoHistorico.incrementar({operacao.usuario_id for operacao in lote})
+            ultimo_pk = lote[-1].pk
+            total += len(lote)
+            self.stdout.write(f'{total} operação(ões) indexada(s)...')
+
+        self.stdout.write(self.style.SUCCESS(f'Concluído: {total} operação(ões) indexada(s).'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from calculadora.delta import retencao
+from calculadora.models import OperacaoRemovida
+
+
+class Command(BaseCommand):
+    help = (
+        'Apaga os registros de operações removidas mais antigos que '
+        'CALCULADORA_REMOCOES_RETENCAO_DIAS (cursores since dessa idade já não são aceitos)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=10000,
+            help='Registros apagados por comando DELETE'
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - retencao()
+        antigos = OperacaoRemovida.objects.filter(data_remocao__lt=limite).order_by('pk')
+        total = 0
+        while True:
+            ids = list(antigos.values_list('pk', flat=True)[:options['lote']])
+            if not ids:
+                break
+            removidos, _ = OperacaoRemovida.objects.filter(pk__in=ids).delete()
+            total += removidos
+        self.stdout.write(self.style.SUCCESS(f'Concluído: {total} registro(s) de remoção apagado(s).'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from calculadora import agregados
+
+
+class Command(BaseCommand):
+    help = (
+        'Apaga os agregados de analise/ e os recalcula a partir de todas as operações, '
+        'em lotes com pausas para não segurar o banco'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            help='Operações agregadas por transação (padrão: CALCULADORA_AGREGADOS_LOTE)'
+        )
+        parser.add_argument(
+            '--pausa',
+            type=float,
+            help='Segundos de pausa entre os lotes (padrão: CALCULADORA_AGREGADOS_PAUSA)'
+        )
+        parser.add_argument(
+            '--continuar',
+            action='store_true',
+            help='Continua de onde a marca parou em vez de apagar os agregados'
+        )
+
+    def handle(self, *args, **options):
+        if not options['continuar']:
+            agregados.reiniciar()
+        total = agregados.agregar(
+            options['lote'], options['pausa'],
+            progresso=lambda total: self.stdout.write(f'{total} operação(ões) agregada(s)...'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Concluído: {total} operação(ões) agregada(s).'))
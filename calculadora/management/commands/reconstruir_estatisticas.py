@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.forms.models import model_to_dict
+
+from calculadora.models import EstatisticaUsuario
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstrói EstatisticaUsuario a partir das operações, em lotes de usuários, '
+        'e informa quantos resumos estavam divergentes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=100,
+            help='Usuários reconstruídos por transação'
+        )
+        parser.add_argument(
+            '--usuario',
+            help='E-mail de um único usuário'
+        )
+
+    def handle(self, *args, **options):
+        usuarios = get_user_model().objects.order_by('pk')
+        if options['usuario']:
+            usuarios = usuarios.filter(email=options['usuario'])
+            if not usuarios.exists():
+                raise CommandError(f"Usuário {options['usuario']} não encontrado.")
+
+        ultimo_pk = 0
+        total = 0
+        divergentes = 0
+        while True:
+            ids = list(usuarios.filter(pk__gt=ultimo_pk).values_list('pk', flat=True)[:options['lote']])
+            if not ids:
+                break
+            antes = {r.pk: model_to_dict(r) for r in EstatisticaUsuario.objects.filter(usuario_id__in=ids)}
+            EstatisticaUsuario.reconstruir(ids)
+            for resumo in EstatisticaUsuario.objects.filter(usuario_id__in=ids):
+                if resumo.pk in antes and antes[resumo.pk] != model_to_dict(resumo):
+                    divergentes += 1
+                    self.stdout.write(f'Usuário {resumo.pk}: {antes[resumo.pk]} -> {model_to_dict(resumo)}')
+            ultimo_pk = ids[-1]
+            total += len(ids)
+            self.stdout.write(f'{total} usuário(s) reconstruído(s)...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Concluído: {total} usuário(s) reconstruído(s), {divergentes} resumo(s) corrigido(s).'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from calculadora import persistencia
+
+
+class Command(BaseCommand):
+    help = (
+        'Grava as operações pendentes nos journals do write-behind deixados por processos '
+        'encerrados (journals de processos vivos são ignorados)'
+    )
+
+    def handle(self, *args, **options):
+        recuperadas, descartadas = persistencia.recuperar_journals()
+        self.stdout.write(self.style.SUCCESS(
+            f'Concluído: {recuperadas} operação(ões) recuperada(s), {descartadas} descartada(s).'
+        ))
@@ -0,0 +1,65 @@
+"""
+Memoização de resultados do motor de cálculo.
+
+A chave é o SHA-256 do tipo de operação e dos números em float64
+little-endian, então ``[1, 2]`` e ``[1.0, 2.0]`` dão a mesma chave. Os
+resultados ficam no cache ``settings.CALCULADORA_CACHE_RESULTADOS`` (um alias
+de ``CACHES``): o padrão é um ``LRUBytesCache`` por processo, e um backend
+compartilhado (arquivo, Redis, Memcached...) permite reaproveitar resultados
+entre workers. Erros como divisão por zero nunca são guardados.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import engine
+from .contadores import ContadorAcertos
+
+PREFIXO_CHAVE = 'calculadora:resultado:'
+
+_contador = ContadorAcertos()
+
+
+def _cache():
+    alias = getattr(settings, 'CALCULADORA_CACHE_RESULTADOS', None)
+    return caches[alias] if alias else None
+
+
+def chave_calculo(tipo_operacao, numeros):
+    digest = hashlib.sha256(tipo_operacao.encode() + b'\0')
+    return PREFIXO_CHAVE + engine.atualizar_digest(digest, numeros).hexdigest()
+
+
+def calcular(tipo_operacao, numeros):
+    """Mesma interface de ``engine.calcular``, consultando o cache antes."""
+    cache = _cache()
+    if cache is None or tipo_operacao not in engine.OPERACOES:
+        return engine.calcular(tipo_operacao, numeros)
+
+    chave = chave_calculo(tipo_operacao, numeros)
+    resultado = cache.get(chave)
+    _contador.contar(resultado is not None)
+    if resultado is not None:
+        return resultado
+
+    resultado = engine.calcular(tipo_operacao, numeros)
+    cache.set(chave, resultado)
+    return resultado
+
+
+def estatisticas():
+    """Contadores de acertos/falhas deste processo e ocupação do cache local."""
+    dados = _contador.dados()
+    cache = _cache()
+    if cache is not None and hasattr(cache, 'bytes_usados'):
+        dados.update({
+            'entradas': len(cache),
+            'bytes_usados': cache.bytes_usados,
+            'limite_bytes': cache.max_bytes,
+        })
+    return dados
+
+
+def zerar_estatisticas():
+    _contador.zerar()
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calculadora', '0004_alter_operacao_parametros'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='operacao',
+            name='digest_parametros',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 dos parâmetros (float64 little-endian) de cálculos recebidos por streaming', max_length=64, verbose_name='Digest dos Parâmetros'),
+        ),
+        migrations.AddField(
+            model_name='operacao',
+            name='quantidade_parametros',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Quantidade de Parâmetros'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+import calculadora.fields
+
+
+class Migration(migrations.Migration):
+    # A cópia dos parâmetros fica na 0007_converter_parametros, fora de uma
+    # transação; esta só cria a coluna, atomicamente.
+
+    dependencies = [
+        ('calculadora', '0005_parametros_streaming'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='operacao',
+            name='parametros_binarios',
+            field=calculadora.fields.Float64ArrayField(null=True, verbose_name='Parâmetros'),
+        ),
+    ]
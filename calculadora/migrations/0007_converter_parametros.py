@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from ._parametros import converter_parametros, restaurar_parametros
+
+
+class Migration(migrations.Migration):
+    # Lotes em transações separadas: uma tabela grande não fica bloqueada
+    # em uma única transação e o progresso não se perde se a migração parar.
+    # Só a cópia, que pode ser repetida, roda fora de uma transação.
+    atomic = False
+
+    # Era a 0006_converter_parametros, número repetido com a 0006_parametros_binarios
+    replaces = [('calculadora', '0006_converter_parametros')]
+
+    dependencies = [
+        ('calculadora', '0006_parametros_binarios'),
+    ]
+
+    operations = [
+        migrations.RunPython(converter_parametros, restaurar_parametros),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+import calculadora.fields
+
+# Converte linhas gravadas pelo código antigo depois da 0007 (deploy gradual).
+from ._parametros import converter_parametros
+
+
+class Migration(migrations.Migration):
+    # Atômica: interrompida no meio, volta inteira e pode ser executada de
+    # novo (a coluna de texto não some antes de a binária ser renomeada).
+
+    # Era a 0007_remover_parametros_texto
+    replaces = [('calculadora', '0007_remover_parametros_texto')]
+
+    dependencies = [
+        ('calculadora', '0007_converter_parametros'),
+    ]
+
+    operations = [
+        migrations.RunPython(converter_parametros, migrations.RunPython.noop),
+        # Default só para que a coluna possa ser recriada ao reverter.
+        migrations.AlterField(
+            model_name='operacao',
+            name='parametros',
+            field=models.TextField(blank=True, default='', verbose_name='Parâmetros'),
+        ),
+        migrations.RemoveField(
+            model_name='operacao',
+            name='parametros',
+        ),
+        migrations.RenameField(
+            model_name='operacao',
+            old_name='parametros_binarios',
+            new_name='parametros',
+        ),
+        migrations.AlterField(
+            model_name='operacao',
+            name='parametros',
+            field=calculadora.fields.Float64ArrayField(default=list, help_text='Números da operação em float64 (comprimidos com zlib quando grandes)', verbose_name='Parâmetros'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Só esquema, atomicamente; as linhas existentes são preenchidas pela
+    # 0010_preencher_operandos, em lotes e fora de uma transação.
+
+    # Era a 0008_operandos
+    replaces = [('calculadora', '0008_operandos')]
+
+    dependencies = [
+        ('calculadora', '0008_remover_parametros_texto'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperandoOperacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicao', models.PositiveIntegerField(verbose_name='Posição')),
+                ('valor', models.FloatField(verbose_name='Valor')),
+            ],
+            options={
+                'verbose_name': 'Operando',
+                'verbose_name_plural': 'Operandos',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='operacao',
+            index=models.Index(fields=['usuario', 'quantidade_parametros'], name='operacao_usuario_qtd_idx'),
+        ),
+        migrations.AddField(
+            model_name='operandooperacao',
+            name='operacao',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='operandos', to='calculadora.operacao', verbose_name='Operação'),
+        ),
+        migrations.AddIndex(
+            model_name='operandooperacao',
+            index=models.Index(fields=['valor', 'operacao'], name='operando_valor_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='operandooperacao',
+            constraint=models.UniqueConstraint(fields=('operacao', 'posicao'), name='operando_posicao_unica'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db import migrations, transaction
+from django.db.models import Exists, OuterRef
+
+TAMANHO_LOTE = 1000
+
+
+def preencher_quantidade_parametros(apps, schema_editor):
+    """Linhas anteriores à 0005 não têm ``quantidade_parametros``, usada nos filtros."""
+    Operacao = apps.get_model('calculadora', 'Operacao')
+    ultimo_pk = 0
+    while True:
+        lote = list(
+            Operacao.objects.filter(pk__gt=ultimo_pk, quantidade_parametros__isnull=True)
+            .order_by('pk').only('pk', 'parametros')[:TAMANHO_LOTE]
+        )
+        if not lote:
+            return
+        for operacao in lote:
+            operacao.quantidade_parametros = len(operacao.parametros)
+        with transaction.atomic():
+            Operacao.objects.bulk_update(lote, ['quantidade_parametros'])
+        ultimo_pk = lote[-1].pk
+
+
+def indexar_operandos(apps, schema_editor):
+    """
+    Grava ``OperandoOperacao`` das operações existentes, para que
+    ``historico/?valor=`` as encontre logo depois da migração. Como
+    ``manage.py indexar_operandos``: só operações ainda sem operandos, um lote
+    por transação, então a migração pode ser interrompida e executada de novo.
+    """
+    if not getattr(settings, 'CALCULADORA_INDICE_OPERANDOS', True):
+        return
+    Operacao = apps.get_model('calculadora', 'Operacao')
+    OperandoOperacao = apps.get_model('calculadora', 'OperandoOperacao')
+    pendentes = Operacao.objects.filter(
+        quantidade_parametros__gt=0,
+        quantidade_parametros__lte=getattr(settings, 'CALCULADORA_INDICE_OPERANDOS_MAXIMO', 1000),
+    ).filter(
+        ~Exists(OperandoOperacao.objects.filter(operacao=OuterRef('pk')))
+    ).order_by('pk').only('pk', 'parametros')
+    ultimo_pk = 0
+    while True:
+        lote = list(pendentes.filter(pk__gt=ultimo_pk)[:TAMANHO_LOTE])
+        if not lote:
+            return
+        with transaction.atomic():
+            OperandoOperacao.objects.bulk_create(
+                [
+                    OperandoOperacao(operacao_id=operacao.pk, posicao=posicao, valor=valor)
+                    for operacao in lote
+                    for posicao, valor in enumerate(operacao.parametros)
+                ],
+                ignore_conflicts=True,
+            )
+        ultimo_pk = lote[-1].pk
+
+
+def remover_operandos(apps, schema_editor):
+    apps.get_model('calculadora', 'OperandoOperacao').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+    # Lotes em transações separadas, como na 0007_converter_parametros.
+    atomic = False
+
+    # Era a 0008_preencher_operandos
+    replaces = [('calculadora', '0008_preencher_operandos')]
+
+    dependencies = [
+        ('calculadora', '0009_operandos'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_quantidade_parametros, migrations.RunPython.noop),
+        migrations.RunPython(indexar_operandos, remover_operandos),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Era a 0009_indice_historico
+    replaces = [('calculadora', '0009_indice_historico')]
+
+    dependencies = [
+        ('calculadora', '0010_preencher_operandos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='operacao',
+            index=models.Index(fields=['usuario', '-data_criacao', '-id'], name='operacao_usuario_data_id_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:32
+
+import calculadora.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Era a 0010_versao_historico
+    replaces = [('calculadora', '0010_versao_historico')]
+
+    dependencies = [
+        ('calculadora', '0011_indice_historico'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoHistorico',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='versao_historico', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+                ('versao', models.PositiveBigIntegerField(default=calculadora.models.versao_inicial, verbose_name='Versão')),
+            ],
+            options={
+                'verbose_name': 'Versão do Histórico',
+                'verbose_name_plural': 'Versões do Histórico',
+            },
+        ),
+    ]
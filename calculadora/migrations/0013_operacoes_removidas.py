@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Era a 0011_operacoes_removidas
+    replaces = [('calculadora', '0011_operacoes_removidas')]
+
+    dependencies = [
+        ('calculadora', '0012_versao_historico'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperacaoRemovida',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operacao_id', models.BigIntegerField(blank=True, null=True, verbose_name='Operação')),
+                ('data_remocao', models.DateTimeField(auto_now_add=True, verbose_name='Data de Remoção')),
+                ('usuario', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='operacoes_removidas', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Operação Removida',
+                'verbose_name_plural': 'Operações Removidas',
+                'indexes': [models.Index(fields=['usuario', 'id'], name='remocao_usuario_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Era a 0012_data_criacao_importavel
+    replaces = [('calculadora', '0012_data_criacao_importavel')]
+
+    dependencies = [
+        ('calculadora', '0013_operacoes_removidas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='operacao',
+            name='data_criacao',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Data de Criação'),
+        ),
+    ]
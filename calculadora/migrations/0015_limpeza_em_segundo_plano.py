@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Era a 0013_limpeza_em_segundo_plano
+    replaces = [('calculadora', '0013_limpeza_em_segundo_plano')]
+
+    dependencies = [
+        ('calculadora', '0014_data_criacao_importavel'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='versaohistorico',
+            name='limpo_ate',
+            field=models.BigIntegerField(default=0, help_text='Operações com id até este foram limpas e não aparecem mais no histórico', verbose_name='Limpo até'),
+        ),
+        migrations.CreateModel(
+            name='LimpezaHistorico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desde_id', models.BigIntegerField(default=0, verbose_name='Desde o id (exclusive)')),
+                ('ate_id', models.BigIntegerField(verbose_name='Até o id')),
+                ('total', models.PositiveBigIntegerField(default=0, verbose_name='Total')),
+                ('removidas', models.PositiveBigIntegerField(default=0, verbose_name='Removidas')),
+                ('excluir_usuario', models.BooleanField(default=False, verbose_name='Excluir usuário')),
+                ('estado', models.CharField(choices=[('pendente', 'Pendente'), ('executando', 'Executando'), ('concluida', 'Concluída'), ('erro', 'Erro')], default='pendente', max_length=10, verbose_name='Estado')),
+                ('erro', models.TextField(blank=True, default='', verbose_name='Erro')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('data_atualizacao', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data de Atualização')),
+                ('data_conclusao', models.DateTimeField(blank=True, null=True, verbose_name='Data de Conclusão')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='limpezas_historico', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Limpeza do Histórico',
+                'verbose_name_plural': 'Limpezas do Histórico',
+                'indexes': [models.Index(fields=['estado', 'id'], name='limpeza_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Era a 0014_estatistica_usuario
+    replaces = [('calculadora', '0014_estatistica_usuario')]
+
+    dependencies = [
+        ('autenticacao', '0001_initial'),
+        ('calculadora', '0015_limpeza_em_segundo_plano'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticaUsuario',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estatistica_historico', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+                ('quantidade_soma', models.BigIntegerField(default=0, verbose_name='Somas')),
+                ('quantidade_subtracao', models.BigIntegerField(default=0, verbose_name='Subtrações')),
+                ('quantidade_multiplicacao', models.BigIntegerField(default=0, verbose_name='Multiplicações')),
+                ('quantidade_divisao', models.BigIntegerField(default=0, verbose_name='Divisões')),
+                ('centavos_soma', models.BigIntegerField(default=0, verbose_name='Resultados das somas (centavos)')),
+                ('centavos_subtracao', models.BigIntegerField(default=0, verbose_name='Resultados das subtrações (centavos)')),
+                ('centavos_multiplicacao', models.BigIntegerField(default=0, verbose_name='Resultados das multiplicações (centavos)')),
+                ('centavos_divisao', models.BigIntegerField(default=0, verbose_name='Resultados das divisões (centavos)')),
+                ('ultima_operacao', models.DateTimeField(blank=True, null=True, verbose_name='Última operação')),
+            ],
+            options={
+                'verbose_name': 'Estatística do Usuário',
+                'verbose_name_plural': 'Estatísticas dos Usuários',
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Era a 0015_agregados_operacoes
+    replaces = [('calculadora', '0015_agregados_operacoes')]
+
+    dependencies = [
+        ('calculadora', '0016_estatistica_usuario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaAgregacao',
+            fields=[
+                ('nome', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Nome')),
+                ('ultimo_id', models.BigIntegerField(default=0, verbose_name='Último id agregado')),
+                ('data_atualizacao', models.DateTimeField(blank=True, null=True, verbose_name='Data de Atualização')),
+            ],
+            options={
+                'verbose_name': 'Marca de Agregação',
+                'verbose_name_plural': 'Marcas de Agregação',
+            },
+        ),
+        migrations.CreateModel(
+            name='AgregadoOperacoes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularidade', models.CharField(choices=[('minuto', 'Minuto'), ('hora', 'Hora'), ('dia', 'Dia')], max_length=6, verbose_name='Granularidade')),
+                ('inicio', models.DateTimeField(verbose_name='Início do intervalo')),
+                ('tipo_operacao', models.CharField(choices=[('soma', 'Soma'), ('subtracao', 'Subtração'), ('multiplicacao', 'Multiplicação'), ('divisao', 'Divisão')], max_length=20, verbose_name='Tipo de Operação')),
+                ('faixa', models.SmallIntegerField(verbose_name='Faixa do resultado')),
+                ('quantidade', models.BigIntegerField(default=0, verbose_name='Operações')),
+                ('centavos', models.BigIntegerField(default=0, verbose_name='Soma dos resultados (centavos)')),
+                ('minimo_centavos', models.BigIntegerField(verbose_name='Menor resultado (centavos)')),
+                ('maximo_centavos', models.BigIntegerField(verbose_name='Maior resultado (centavos)')),
+            ],
+            options={
+                'verbose_name': 'Agregado de Operações',
+                'verbose_name_plural': 'Agregados de Operações',
+                'constraints': [models.UniqueConstraint(fields=('granularidade', 'inicio', 'tipo_operacao', 'faixa'), name='agregado_chave_unica')],
+            },
+        ),
+    ]
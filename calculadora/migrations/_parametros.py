@@ -0,0 +1,59 @@
+"""
+Conversão dos parâmetros de JSON para ``Float64ArrayField``, usada pela
+0007_converter_parametros e repetida pela 0008_remover_parametros_texto.
+
+Fica fora dos arquivos numerados (que não podem ser importados com
+``import``); o carregador de migrações ignora módulos iniciados por ``_``.
+"""
+import json
+
+from django.db import transaction
+
+TAMANHO_LOTE = 1000
+
+
+def _numeros(texto):
+    try:
+        return [float(n) for n in json.loads(texto)]
+    except (TypeError, ValueError):
+        return []
+
+
+def converter_parametros(apps, schema_editor):
+    """
+    Copia ``parametros`` (JSON) para ``parametros_binarios`` em lotes.
+
+    Cada lote é gravado em uma transação própria e só linhas ainda sem valor
+    binário são lidas, então a migração pode ser interrompida e executada de
+    novo de onde parou (a coluna já existe: foi criada, em uma migração
+    atômica, pela 0006_parametros_binarios).
+    """
+    Operacao = apps.get_model('calculadora', 'Operacao')
+    pendentes = Operacao.objects.filter(parametros_binarios__isnull=True).order_by('pk')
+    ultimo_pk = 0
+    while True:
+        lote = list(pendentes.filter(pk__gt=ultimo_pk).only('pk', 'parametros')[:TAMANHO_LOTE])
+        if not lote:
+            return
+        for operacao in lote:
+            operacao.parametros_binarios = _numeros(operacao.parametros)
+        with transaction.atomic():
+            Operacao.objects.bulk_update(lote, ['parametros_binarios'])
+        ultimo_pk = lote[-1].pk
+
+
+def restaurar_parametros(apps, schema_editor):
+    Operacao = apps.get_model('calculadora', 'Operacao')
+    ultimo_pk = 0
+    while True:
+        lote = list(
+            Operacao.objects.filter(pk__gt=ultimo_pk, parametros_binarios__isnull=False)
+            .order_by('pk').only('pk', 'parametros_binarios')[:TAMANHO_LOTE]
+        )
+        if not lote:
+            return
+        for operacao in lote:
+            operacao.parametros = json.dumps(operacao.parametros_binarios)
+        with transaction.atomic():
+            Operacao.objects.bulk_update(lote, ['parametros'])
+        ultimo_pk = lote[-1].pk
@@ -1,6 +1,256 @@
-from django.db import models
+import math
+import secrets
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import connections, models, router, transaction
+from django.db.models import BigIntegerField, Count, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest, Round
+from django.db.models.lookups import GreaterThan
 from django.conf import settings
-import json
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from . import sinais
+from .engine import ErroCalculo
+from .fields import Float64ArrayField
+
+
+SIMBOLOS_OPERACAO = {
+    'soma': '+',
+    'subtracao': '-',
+    'multiplicacao': '×',
+    'divisao': '÷'
+}
+
+
+def formatar_parametros(parametros, quantidade_parametros, digest_parametros):
+    """Texto de ``parametros_display``; cálculos por streaming não guardam os números."""
+    if not parametros and quantidade_parametros:
+        return f'{quantidade_parametros} números (sha256 {digest_parametros[:12]}…)'
+    return ', '.join(map(str, parametros))
+
+
+def indice_operandos_ativo():
+    return getattr(settings, 'CALCULADORA_INDICE_OPERANDOS', True)
+
+
+# Campos cujo valor Python (int, float, str) vai ao banco sem conversão
+TIPOS_SEM_CONVERSAO = {
+    'BigIntegerField', 'CharField', 'FloatField', 'ForeignKey', 'IntegerField',
+    'PositiveBigIntegerField', 'PositiveIntegerField',
+}
+
+
+def _inserir_linhas(model, nomes_campos, linhas, conexao, retornar_pk=False):
+    """
+    ``INSERT`` de ``linhas`` (tuplas na ordem de ``nomes_campos``) sem
+    instanciar modelos nem passar pelo compilador do ORM: só os valores que
+    precisam de conversão (decimais, datas, parâmetros) passam pelo
+    ``get_db_prep_save`` do campo, e as linhas vão em ``INSERT`` de várias
+    linhas, no tamanho de lote do banco. Com ``retornar_pk``, retorna as
+    chaves primárias na ordem das linhas (exige ``INSERT ... RETURNING``).
+    """
+    operacoes = conexao.ops
+    campos = [model._meta.get_field(nome) for nome in nomes_campos]
+    converter = [
+        (indice, campo.get_db_prep_save) for indice, campo in enumerate(campos)
+        if campo.get_internal_type() not in TIPOS_SEM_CONVERSAO
+    ]
+    if converter:
+        linhas = [list(linha) for linha in linhas]
+        for linha in linhas:
+            for indice, preparar in converter:
+                linha[indice] = preparar(linha[indice], conexao)
+    colunas = ', '.join(operacoes.quote_name(campo.column) for campo in campos)
+    retorno, _ = operacoes.return_insert_columns([model._meta.pk]) if retornar_pk else ('', ())
+    tamanho = max(operacoes.bulk_batch_size(campos, linhas), 1)
+    marcadores = ', '.join(['%s'] * len(campos))
+    pks = []
+    with conexao.cursor() as cursor:
+        for inicio in range(0, len(linhas), tamanho):
+            lote = linhas[inicio:inicio + tamanho]
+            valores = operacoes.bulk_insert_sql(campos, [[marcadores]] * len(lote))
+            cursor.execute(
+                f'INSERT INTO {operacoes.quote_name(model._meta.db_table)} ({colunas}) {valores} {retorno}',
+                [valor for linha in lote for valor in linha],
+            )
+            if retornar_pk:
+                pks.extend(pk for pk, in operacoes.fetch_returned_insert_rows(cursor))
+    return pks
+
+
+# Ids por ``DELETE ... IN (...)``, abaixo do limite de 999 parâmetros do SQLite
+TAMANHO_LOTE_IDS = 900
+
+
+def _apagar_retornando(usuario, ids, conexao):
+    """
+    ``DELETE`` das operações de ``ids`` que ``usuario`` ainda vê no histórico
+    (ver ``OperacaoQuerySet.do_usuario``); retorna ``(id, tipo_operacao,
+    resultado)`` das apagadas.
+    """
+    q = conexao.ops.quote_name
+    pk, dono = q(Operacao._meta.pk.column), q(Operacao._meta.get_field('usuario').column)
+    retorno = ', '.join(q(Operacao._meta.get_field(campo).column) for campo in ('id', 'tipo_operacao', 'resultado'))
+    limpo_ate = (
+        f'SELECT {q(VersaoHistorico._meta.get_field("limpo_ate").column)} '
+        f'FROM {q(VersaoHistorico._meta.db_table)} WHERE {q(VersaoHistorico._meta.pk.column)} = %s'
+    )
+    marcadores = ', '.join(['%s'] * len(ids))
+    with conexao.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {q(Operacao._meta.db_table)} '
+            f'WHERE {dono} = %s AND {pk} IN ({marcadores}) AND {pk} > COALESCE(({limpo_ate}), 0) '
+            f'RETURNING {retorno}',
+            [usuario.pk, *ids, usuario.pk],
+        )
+        return cursor.fetchall()
+
+
+class OperacaoQuerySet(models.QuerySet):
+    """
+    Mantém ``OperandoOperacao``, ``VersaoHistorico`` e ``OperacaoRemovida``
+    junto com as operações: ``bulk_create`` grava os operandos das novas
+    linhas e ``delete`` remove os das linhas apagadas e registra os ids
+    removidos; os dois incrementam a versão do histórico dos donos e enviam
+    os sinais de ``sinais.py``.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            OperandoOperacao.indexar(objs)
+            VersaoHistorico.incrementar({operacao.usuario_id for operacao in objs})
+            EstatisticaUsuario.somar((o.usuario_id, o.tipo_operacao, o.resultado, o.data_criacao) for o in objs)
+            sinais.operacoes_criadas.send(
+                self.model, pares=[(o.usuario_id, o.pk) for o in objs if o.pk is not None], using=self.db
+            )
+        return objs
+
+    def inserir_linhas(self, linhas):
+        """
+        Grava operações a partir de tuplas na ordem de ``Operacao.CAMPOS_INSERCAO``,
+        com o mesmo efeito de ``bulk_create`` e sem instanciar ``Operacao``
+        (para importações grandes). Retorna as chaves primárias, na ordem.
+        """
+        conexao = connections[self.db]
+        if not conexao.features.can_return_rows_from_bulk_insert:
+            objs = self.bulk_create(
+                [self.model(**dict(zip(self.model.CAMPOS_INSERCAO, linha))) for linha in linhas], batch_size=1000
+            )
+            return [operacao.pk for operacao in objs]
+        with transaction.atomic(using=self.db):
+            pks = _inserir_linhas(self.model, self.model.CAMPOS_INSERCAO, linhas, conexao, retornar_pk=True)
+            OperandoOperacao.indexar_parametros(zip(pks, (linha[2] for linha in linhas)), using=self.db)
+            VersaoHistorico.incrementar({linha[0] for linha in linhas})
+            EstatisticaUsuario.somar((linha[0], linha[1], linha[5], linha[6]) for linha in linhas)
+            sinais.operacoes_criadas.send(
+                self.model, pares=[(linha[0], pk) for linha, pk in zip(linhas, pks)], using=self.db
+            )
+        return pks
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            linhas = list(self.order_by().values_list('usuario_id', 'pk', 'tipo_operacao', 'resultado'))
+            removidas = [(usuario_id, pk) for usuario_id, pk, _, _ in linhas]
+            OperandoOperacao.objects.filter(operacao__in=self.values('pk')).delete()
+            resultado = super().delete()
+            if resultado[0]:
+                OperacaoRemovida.registrar(removidas)
+                EstatisticaUsuario.descontar(linhas)
+                VersaoHistorico.incrementar({usuario_id for usuario_id, _ in removidas})
+                sinais.operacoes_removidas.send(self.model, pares=removidas, using=self.db)
+            return resultado
+
+    def remover_ids(self, usuario, ids):
+        """
+        Apaga as operações de ``ids`` que pertencem a ``usuario`` (e estão no
+        histórico) e retorna os ids apagados, com o mesmo efeito de ``delete``.
+        Cada lote de ``TAMANHO_LOTE_IDS`` ids é um único
+        ``DELETE ... WHERE id IN (...) RETURNING id``, sem ler as linhas antes.
+        """
+        conexao = connections[self.db]
+        ids = sorted(set(ids))
+        linhas = []
+        with transaction.atomic(using=self.db):
+            for inicio in range(0, len(ids), TAMANHO_LOTE_IDS):
+                lote = ids[inicio:inicio + TAMANHO_LOTE_IDS]
+                if conexao.features.can_return_rows_from_bulk_insert:
+                    apagadas = _apagar_retornando(usuario, lote, conexao)
+                else:
+                    apagadas = list(self.do_usuario(usuario).filter(pk__in=lote).values_list(
+                        'pk', 'tipo_operacao', 'resultado'
+                    ))
+                    models.QuerySet.delete(self.model.objects.using(self.db).filter(
+                        pk__in=[pk for pk, _, _ in apagadas]
+                    ))
+                OperandoOperacao.objects.using(self.db).filter(operacao_id__in=[pk for pk, _, _ in apagadas]).delete()
+                linhas.extend((usuario.pk, *apagada) for apagada in apagadas)
+            removidas = [pk for _, pk, _, _ in linhas]
+            if removidas:
+                pares = [(usuario.pk, pk) for pk in removidas]
+                OperacaoRemovida.registrar(pares)
+                VersaoHistorico.incrementar([usuario.pk])
+                EstatisticaUsuario.descontar(linhas)
+                sinais.operacoes_removidas.send(self.model, pares=pares, using=self.db)
+        return sorted(removidas)
+
+    async def aremover_ids(self, usuario, ids):
+        return await sync_to_async(self.remover_ids)(usuario, ids)
+
+    def do_usuario(self, usuario):
+        """
+        Operações de ``usuario`` que aparecem no histórico. As de ``id`` até
+        ``VersaoHistorico.limpo_ate`` já foram limpas e só aguardam a remoção
+        física pela ``LimpezaHistorico``.
+        """
+        limpo_ate = VersaoHistorico.objects.filter(usuario_id=usuario.pk).values('limpo_ate')[:1]
+        # ``id + 0``: com ``id > ...`` o SQLite troca o índice (usuario,
+        # data_criacao, id), que já entrega a ordem do histórico, por uma faixa
+        # de ids, e ordena todas as operações do usuário a cada página.
+        return self.filter(GreaterThan(F('id') + 0, Coalesce(Subquery(limpo_ate), 0)), usuario=usuario)
+
+    def limpar_historico(self, usuario, excluir_usuario=False):
+        """
+        Limpa o histórico de ``usuario`` e retorna a ``LimpezaHistorico`` que
+        apagará as operações (``None`` se não havia nenhuma).
+
+        A limpeza em si é instantânea: ``VersaoHistorico.limpo_ate`` passa a
+        ser o maior ``id`` atual, o que esconde as operações de todas as
+        leituras (``do_usuario``), e uma única marca em ``OperacaoRemovida``
+        avisa os clientes incrementais. O total vem de ``EstatisticaUsuario``,
+        sem ``COUNT(*)``, e o resumo é zerado. Com ``excluir_usuario`` a conta
+        é desativada já e apagada depois das operações.
+        """
+        with transaction.atomic(using=self.db):
+            # Grava primeiro: no SQLite a transação já segura o lock de escrita
+            # e nenhuma operação entra entre a leitura do total e o zeramento.
+            VersaoHistorico.incrementar([usuario.pk])
+            total = EstatisticaUsuario.obter(usuario.pk).total
+            if not total and not excluir_usuario:
+                return None
+            ultimo_id = self.filter(usuario=usuario).order_by('-id').values_list('id', flat=True).first() or 0
+            versao = VersaoHistorico.objects.select_for_update().get(usuario_id=usuario.pk)
+            desde_id, ate_id = versao.limpo_ate, max(ultimo_id, versao.limpo_ate)
+            VersaoHistorico.objects.filter(usuario_id=usuario.pk).update(limpo_ate=ate_id)
+            EstatisticaUsuario.zerar(usuario.pk)
+            if excluir_usuario:
+                type(usuario).objects.filter(pk=usuario.pk).update(is_active=False)
+            if total:
+                OperacaoRemovida.objects.create(usuario=usuario, operacao_id=None)
+                sinais.historico_limpo.send(self.model, usuario_id=usuario.pk, using=self.db)
+            return LimpezaHistorico.objects.create(
+                usuario=usuario,
+                desde_id=desde_id,
+                ate_id=ate_id,
+                total=total,
+                excluir_usuario=excluir_usuario,
+            )
+
+    async def alimpar_historico(self, usuario, excluir_usuario=False):
+        return await sync_to_async(self.limpar_historico)(usuario, excluir_usuario)
+
 
 class Operacao(models.Model):
     TIPOS_OPERACAO = [
@@ -12,14 +262,43 @@ class Operacao(models.Model):
     
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name='Usuário')
     tipo_operacao = models.CharField(max_length=20, choices=TIPOS_OPERACAO, verbose_name='Tipo de Operação')
-    parametros = models.TextField(verbose_name='Parâmetros')
+    parametros = Float64ArrayField(
+        default=list,
+        verbose_name='Parâmetros',
+        help_text='Números da operação em float64 (comprimidos com zlib quando grandes)'
+    )
+    quantidade_parametros = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Quantidade de Parâmetros'
+    )
+    digest_parametros = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        verbose_name='Digest dos Parâmetros',
+        help_text='SHA-256 dos parâmetros (float64 little-endian) de cálculos recebidos por streaming'
+    )
     resultado = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Resultado')
-    data_criacao = models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')
+    # Default em vez de auto_now_add: importar_operacoes preserva a data original
+    data_criacao = models.DateTimeField(default=timezone.now, editable=False, verbose_name='Data de Criação')
+    
+    objects = OperacaoQuerySet.as_manager()
+    
+    # Ordem dos valores em OperacaoQuerySet.inserir_linhas
+    CAMPOS_INSERCAO = (
+        'usuario_id', 'tipo_operacao', 'parametros', 'quantidade_parametros',
+        'digest_parametros', 'resultado', 'data_criacao',
+    )
     
     class Meta:
         verbose_name = 'Operação'
         verbose_name_plural = 'Operações'
         ordering = ['-data_criacao']
+        indexes = [
+            models.Index(fields=['usuario', 'quantidade_parametros'], name='operacao_usuario_qtd_idx'),
+            models.Index(fields=['usuario', '-data_criacao', '-id'], name='operacao_usuario_data_id_idx'),
+        ]
     
     def __str__(self):
         params = self.get_parametros_list()
@@ -27,34 +306,533 @@ class Operacao(models.Model):
             return f'{self.usuario.username} - {params[0]} {self.get_simbolo_operacao()} {params[1]} = {self.resultado}'
         return f'{self.usuario.username} - {self.tipo_operacao}({params}) = {self.resultado}'
     
+    def save(self, *args, **kwargs):
+        adicionando = self._state.adding
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            if adicionando:
+                OperandoOperacao.indexar([self])
+                EstatisticaUsuario.somar([(self.usuario_id, self.tipo_operacao, self.resultado, self.data_criacao)])
+                sinais.operacoes_criadas.send(type(self), pares=[(self.usuario_id, self.pk)], using=kwargs.get('using'))
+            VersaoHistorico.incrementar([self.usuario_id])
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            OperandoOperacao.objects.filter(operacao_id=self.pk).delete()
+            OperacaoRemovida.registrar([(self.usuario_id, self.pk)])
+            sinais.operacoes_removidas.send(type(self), pares=[(self.usuario_id, self.pk)], using=kwargs.get('using'))
+            linha = (self.usuario_id, self.pk, self.tipo_operacao, self.resultado)
+            removidas = super().delete(*args, **kwargs)
+            VersaoHistorico.incrementar([self.usuario_id])
+            EstatisticaUsuario.descontar([linha])
+            return removidas
+    
     def get_simbolo_operacao(self):
-        simbolos = {
-            'soma': '+',
-            'subtracao': '-',
-            'multiplicacao': '×',
-            'divisao': '÷'
-        }
-        return simbolos.get(self.tipo_operacao, '?')
+        return SIMBOLOS_OPERACAO.get(self.tipo_operacao, '?')
     
     def get_parametros_list(self):
-        try:
-            return json.loads(self.parametros)
-        except (json.JSONDecodeError, TypeError):
-            return []
+        return self.parametros or []
     
     def set_parametros_list(self, parametros_list):
-        self.parametros = json.dumps(parametros_list)
+        self.parametros = parametros_list
     
     def get_parametros_display(self):
-        params = self.get_parametros_list()
-        return ', '.join(map(str, params))
+        return formatar_parametros(self.get_parametros_list(), self.quantidade_parametros, self.digest_parametros)
     
     @staticmethod
     def get_simbolo_operacao_by_tipo(tipo):
-        simbolos = {
-            'soma': '+',
-            'subtracao': '-',
-            'multiplicacao': '×',
-            'divisao': '÷'
+        return SIMBOLOS_OPERACAO.get(tipo, '?')
+
+
+_campo_resultado = Operacao._meta.get_field('resultado')
+LIMITE_RESULTADO = 10 ** (_campo_resultado.max_digits - _campo_resultado.decimal_places)
+
+
+def verificar_resultado(resultado):
+    """
+    Levanta ``ErroCalculo`` se ``resultado`` não cabe em ``Operacao.resultado``
+    (infinito, NaN ou maior que ``LIMITE_RESULTADO``). Chamada antes de gravar
+    ou enfileirar qualquer operação: um valor desses só falharia no banco.
+    """
+    if not math.isfinite(resultado) or abs(round(resultado, 2)) >= LIMITE_RESULTADO:
+        raise ErroCalculo(f'Resultado fora do intervalo armazenável (até ±{LIMITE_RESULTADO}).')
+
+
+class OperandoOperacao(models.Model):
+    """
+    Cada número de uma operação em uma linha própria, indexado por valor, para
+    buscas como "operações que usaram 42.5" sem decodificar ``parametros``.
+
+    Gravado pelo ``save``/``bulk_create`` de ``Operacao`` quando
+    ``CALCULADORA_INDICE_OPERANDOS`` está ativo, apenas para operações com até
+    ``CALCULADORA_INDICE_OPERANDOS_MAXIMO`` números. A chave estrangeira não
+    tem ``ON DELETE`` no banco nem no Django: ``OperacaoQuerySet.delete`` apaga
+    os operandos com um único ``DELETE``, sem carregar as linhas.
+    """
+    operacao = models.ForeignKey(
+        Operacao,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='operandos',
+        verbose_name='Operação'
+    )
+    posicao = models.PositiveIntegerField(verbose_name='Posição')
+    valor = models.FloatField(verbose_name='Valor')
+    
+    class Meta:
+        verbose_name = 'Operando'
+        verbose_name_plural = 'Operandos'
+        constraints = [
+            models.UniqueConstraint(fields=['operacao', 'posicao'], name='operando_posicao_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['valor', 'operacao'], name='operando_valor_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.operacao_id}[{self.posicao}] = {self.valor}'
+    
+    @classmethod
+    def indexar(cls, operacoes):
+        """Grava os operandos de operações já salvas (com ``pk``)."""
+        cls.indexar_parametros(
+            (operacao.pk, operacao.parametros) for operacao in operacoes if operacao.pk is not None
+        )
+    
+    @classmethod
+    def indexar_parametros(cls, pares, using=None):
+        """Grava os operandos dos pares ``(operacao_id, parametros)``."""
+        if not indice_operandos_ativo():
+            return
+        maximo = getattr(settings, 'CALCULADORA_INDICE_OPERANDOS_MAXIMO', 1000)
+        linhas = [
+            (operacao_id, posicao, valor)
+            for operacao_id, parametros in pares
+            if len(parametros) <= maximo
+            for posicao, valor in enumerate(parametros)
+        ]
+        if linhas:
+            conexao = connections[using or router.db_for_write(cls)]
+            _inserir_linhas(cls, ('operacao_id', 'posicao', 'valor'), linhas, conexao)
+
+
+def versao_inicial():
+    return secrets.randbits(48)
+
+
+class VersaoHistorico(models.Model):
+    """
+    Contador por usuário, incrementado na mesma transação de qualquer gravação
+    ou remoção de operações (``Operacao.save``/``delete`` e ``bulk_create``/
+    ``delete`` do queryset). As páginas do histórico em cache são guardadas
+    sob a versão lida: um incremento invalida todas de uma vez, sem procurar
+    chaves, e a leitura da versão é uma busca pela chave primária nesta
+    tabela pequena, igual para todos os workers.
+
+    A contagem começa em um número aleatório: a versão de um banco restaurado
+    ou de um id reaproveitado não coincide com páginas antigas ainda no cache.
+    """
+    usuario = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='versao_historico',
+        verbose_name='Usuário'
+    )
+    versao = models.PositiveBigIntegerField(default=versao_inicial, verbose_name='Versão')
+    limpo_ate = models.BigIntegerField(
+        default=0,
+        verbose_name='Limpo até',
+        help_text='Operações com id até este foram limpas e não aparecem mais no histórico'
+    )
+    
+    class Meta:
+        verbose_name = 'Versão do Histórico'
+        verbose_name_plural = 'Versões do Histórico'
+    
+    def __str__(self):
+        return f'{self.usuario_id}: {self.versao}'
+    
+    @classmethod
+    def incrementar(cls, usuario_ids):
+        usuario_ids = set(usuario_ids)
+        if not usuario_ids:
+            return
+        atualizados = cls.objects.filter(usuario_id__in=usuario_ids).update(versao=F('versao') + 1)
+        if atualizados < len(usuario_ids):
+            # Usuário ainda sem linha: cria as que faltam e incrementa de novo.
+            # As que já existiam sobem duas vezes, o que não importa: a versão
+            # só precisa mudar.
+            cls.objects.bulk_create([cls(usuario_id=i) for i in usuario_ids], ignore_conflicts=True)
+            cls.objects.filter(usuario_id__in=usuario_ids).update(versao=F('versao') + 1)
+
+    @classmethod
+    def atual(cls, usuario_id):
+        versao = cls.objects.filter(usuario_id=usuario_id).values_list('versao', flat=True).first()
+        if versao is None:
+            versao = cls.objects.get_or_create(usuario_id=usuario_id)[0].versao
+        return versao
+
+    @classmethod
+    async def aatual(cls, usuario_id):
+        versao = await cls.objects.filter(usuario_id=usuario_id).values_list('versao', flat=True).afirst()
+        if versao is None:
+            versao = (await cls.objects.aget_or_create(usuario_id=usuario_id))[0].versao
+        return versao
+
+
+def _centavos(resultado):
+    """``resultado`` como ``Operacao.resultado`` o grava, em centavos."""
+    campo = Operacao._meta.get_field('resultado')
+    return int(campo.to_python(resultado).quantize(Decimal(1).scaleb(-campo.decimal_places)).scaleb(2))
+
+
+class EstatisticaUsuario(models.Model):
+    """
+    Resumo do histórico de cada usuário: operações e soma dos resultados por
+    tipo e data da operação mais recente gravada, para responder "quantas
+    operações e quanto somam" sem agregar as operações.
+
+    Atualizado com ``F()`` na mesma transação de toda gravação e remoção de
+    operações (os mesmos pontos que incrementam ``VersaoHistorico``) e zerado
+    na limpeza do histórico; remoções não alteram ``ultima_operacao``. As
+    somas ficam em centavos inteiros, sem o erro acumulado de somar decimais
+    como ``REAL`` no SQLite. Um usuário sem linha (anterior a esta tabela)
+    tem a sua reconstruída a partir das operações no primeiro uso;
+    ``manage.py reconstruir_estatisticas`` reconstrói todas.
+    """
+    TIPOS = [tipo for tipo, _ in Operacao.TIPOS_OPERACAO]
+    
+    usuario = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='estatistica_historico',
+        verbose_name='Usuário'
+    )
+    quantidade_soma = models.BigIntegerField(default=0, verbose_name='Somas')
+    quantidade_subtracao = models.BigIntegerField(default=0, verbose_name='Subtrações')
+    quantidade_multiplicacao = models.BigIntegerField(default=0, verbose_name='Multiplicações')
+    quantidade_divisao = models.BigIntegerField(default=0, verbose_name='Divisões')
+    centavos_soma = models.BigIntegerField(default=0, verbose_name='Resultados das somas (centavos)')
+    centavos_subtracao = models.BigIntegerField(default=0, verbose_name='Resultados das subtrações (centavos)')
+    centavos_multiplicacao = models.BigIntegerField(default=0, verbose_name='Resultados das multiplicações (centavos)')
+    centavos_divisao = models.BigIntegerField(default=0, verbose_name='Resultados das divisões (centavos)')
+    ultima_operacao = models.DateTimeField(null=True, blank=True, verbose_name='Última operação')
+    
+    class Meta:
+        verbose_name = 'Estatística do Usuário'
+        verbose_name_plural = 'Estatísticas dos Usuários'
+    
+    def __str__(self):
+        return f'{self.usuario_id}: {self.total} operações'
+    
+    @property
+    def total(self):
+        return sum(getattr(self, f'quantidade_{tipo}') for tipo in self.TIPOS)
+    
+    def dados(self):
+        """Resposta de ``estatisticas/``."""
+        centavos = sum(getattr(self, f'centavos_{tipo}') for tipo in self.TIPOS)
+        return {
+            'total': self.total,
+            'soma_resultados': centavos / 100,
+            'ultima_operacao': self.ultima_operacao,
+            'por_tipo': {
+                tipo: {
+                    'quantidade': getattr(self, f'quantidade_{tipo}'),
+                    'soma_resultados': getattr(self, f'centavos_{tipo}') / 100,
+                }
+                for tipo in self.TIPOS
+            },
+        }
+    
+    @classmethod
+    def somar(cls, linhas):
+        """Acrescenta as operações gravadas ``(usuario_id, tipo_operacao, resultado, data_criacao)``."""
+        cls._aplicar(linhas, 1)
+    
+    @classmethod
+    def descontar(cls, linhas):
+        """
+        Desconta as operações apagadas ``(usuario_id, id, tipo_operacao,
+        resultado)``; as já escondidas por uma limpeza saíram do resumo nela.
+        """
+        linhas = list(linhas)
+        limpo_ate = dict(VersaoHistorico.objects.filter(
+            usuario_id__in={linha[0] for linha in linhas}
+        ).values_list('usuario_id', 'limpo_ate'))
+        cls._aplicar(
+            ((usuario_id, tipo, resultado, None) for usuario_id, pk, tipo, resultado in linhas
+             if pk > limpo_ate.get(usuario_id, 0)),
+            -1
+        )
+    
+    @classmethod
+    def _aplicar(cls, linhas, sinal):
+        deltas = {}
+        for usuario_id, tipo, resultado, data_criacao in linhas:
+            if tipo not in cls.TIPOS:
+                continue
+            delta = deltas.setdefault(usuario_id, {'ultima': None, 'campos': {}})
+            campos = delta['campos']
+            campos[f'quantidade_{tipo}'] = campos.get(f'quantidade_{tipo}', 0) + sinal
+            campos[f'centavos_{tipo}'] = campos.get(f'centavos_{tipo}', 0) + sinal * _centavos(resultado)
+            if data_criacao is not None and (delta['ultima'] is None or data_criacao > delta['ultima']):
+                delta['ultima'] = data_criacao
+        for usuario_id, delta in deltas.items():
+            valores = {campo: F(campo) + valor for campo, valor in delta['campos'].items()}
+            if delta['ultima'] is not None:
+                ultima = Value(delta['ultima'])
+                # MAX do SQLite com NULL é NULL: o Coalesce cobre a primeira operação
+                valores['ultima_operacao'] = Greatest(Coalesce('ultima_operacao', ultima), ultima)
+            if not cls.objects.filter(usuario_id=usuario_id).update(**valores):
+                # Sem linha: a reconstrução já conta as operações desta transação
+                cls.reconstruir([usuario_id])
+    
+    @classmethod
+    def zerar(cls, usuario_id):
+        valores = {campo.name: 0 for campo in cls._meta.concrete_fields if isinstance(campo, BigIntegerField)}
+        if not cls.objects.filter(usuario_id=usuario_id).update(ultima_operacao=None, **valores):
+            cls.objects.create(usuario_id=usuario_id)
+    
+    @classmethod
+    def reconstruir(cls, usuario_ids):
+        """Recalcula os resumos de ``usuario_ids`` a partir das operações do histórico."""
+        usuario_ids = list(usuario_ids)
+        limpo_ate = VersaoHistorico.objects.filter(usuario_id=OuterRef('usuario_id')).values('limpo_ate')[:1]
+        with transaction.atomic():
+            # Grava antes de ler: no SQLite a transação já segura o lock de
+            # escrita e nos outros bancos as linhas ficam travadas, então
+            # nenhuma operação gravada durante a leitura fica fora do resumo.
+            cls.objects.filter(usuario_id__in=usuario_ids).update(ultima_operacao=F('ultima_operacao'))
+            agregados = Operacao.objects.filter(
+                usuario_id__in=usuario_ids, id__gt=Coalesce(Subquery(limpo_ate), 0)
+            ).order_by().values_list('usuario_id', 'tipo_operacao').annotate(
+                quantidade=Count('id'),
+                centavos=Sum(Cast(Round(F('resultado') * 100), BigIntegerField())),
+                ultima=Max('data_criacao'),
+            )
+            resumos = {usuario_id: cls(usuario_id=usuario_id) for usuario_id in usuario_ids}
+            for usuario_id, tipo, quantidade, centavos, ultima in agregados:
+                resumo = resumos[usuario_id]
+                if tipo in cls.TIPOS:
+                    setattr(resumo, f'quantidade_{tipo}', quantidade)
+                    setattr(resumo, f'centavos_{tipo}', centavos or 0)
+                if resumo.ultima_operacao is None or ultima > resumo.ultima_operacao:
+                    resumo.ultima_operacao = ultima
+            cls.objects.bulk_create(
+                resumos.values(),
+                update_conflicts=True,
+                unique_fields=['usuario'],
+                update_fields=[campo.name for campo in cls._meta.concrete_fields if not campo.primary_key],
+            )
+    
+    @classmethod
+    def obter(cls, usuario_id):
+        resumo = cls.objects.filter(usuario_id=usuario_id).first()
+        if resumo is None:
+            cls.reconstruir([usuario_id])
+            resumo = cls.objects.get(usuario_id=usuario_id)
+        return resumo
+    
+    @classmethod
+    async def aobter(cls, usuario_id):
+        resumo = await cls.objects.filter(usuario_id=usuario_id).afirst()
+        if resumo is None:
+            resumo = await sync_to_async(cls.obter)(usuario_id)
+        return resumo
+
+
+class OperacaoRemovida(models.Model):
+    """
+    Registro ("tombstone") de uma operação apagada, para que ``historico/?since=``
+    informe as remoções a clientes que guardam o histórico localmente. O ``id``
+    crescente é a sequência lida pelo cursor. ``operacao_id`` vazio marca uma
+    limpeza do histórico inteiro do usuário.
+
+    Registros mais antigos que ``CALCULADORA_REMOCOES_RETENCAO_DIAS`` são
+    apagados por ``python manage.py podar_remocoes``; cursores dessa idade
+    deixam de ser aceitos.
+    """
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False,  # coberto por remocao_usuario_id_idx
+        related_name='operacoes_removidas',
+        verbose_name='Usuário'
+    )
+    operacao_id = models.BigIntegerField(null=True, blank=True, verbose_name='Operação')
+    data_remocao = models.DateTimeField(auto_now_add=True, verbose_name='Data de Remoção')
+    
+    class Meta:
+        verbose_name = 'Operação Removida'
+        verbose_name_plural = 'Operações Removidas'
+        indexes = [
+            models.Index(fields=['usuario', 'id'], name='remocao_usuario_id_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.usuario_id}: {self.operacao_id or "limpeza"}'
+    
+    @classmethod
+    def registrar(cls, removidas):
+        """Grava um registro por par ``(usuario_id, operacao_id)``."""
+        cls.objects.bulk_create([
+            cls(usuario_id=usuario_id, operacao_id=operacao_id) for usuario_id, operacao_id in removidas
+        ], batch_size=1000)
+
+
+class LimpezaHistorico(models.Model):
+    """
+    Remoção física das operações de uma limpeza do histórico
+    (``OperacaoQuerySet.limpar_historico``). As operações do usuário com ``id``
+    em ``(desde_id, ate_id]`` já estão fora das leituras e são apagadas em
+    lotes pequenos, com pausas, por ``calculadora.expurgo``, que atualiza
+    ``removidas`` a cada lote. Com ``excluir_usuario`` a conta é apagada no
+    fim, quando o ``DELETE`` em cascata já não tem operações para apagar.
+    """
+    PENDENTE = 'pendente'
+    EXECUTANDO = 'executando'
+    CONCLUIDA = 'concluida'
+    ERRO = 'erro'
+    ESTADOS = [
+        (PENDENTE, 'Pendente'),
+        (EXECUTANDO, 'Executando'),
+        (CONCLUIDA, 'Concluída'),
+        (ERRO, 'Erro'),
+    ]
+    
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='limpezas_historico',
+        verbose_name='Usuário'
+    )
+    desde_id = models.BigIntegerField(default=0, verbose_name='Desde o id (exclusive)')
+    ate_id = models.BigIntegerField(verbose_name='Até o id')
+    total = models.PositiveBigIntegerField(default=0, verbose_name='Total')
+    removidas = models.PositiveBigIntegerField(default=0, verbose_name='Removidas')
+    excluir_usuario = models.BooleanField(default=False, verbose_name='Excluir usuário')
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=PENDENTE, verbose_name='Estado')
+    erro = models.TextField(blank=True, default='', verbose_name='Erro')
+    data_criacao = models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')
+    # Atualizada a cada lote; uma limpeza EXECUTANDO parada há muito tempo é retomada
+    data_atualizacao = models.DateTimeField(default=timezone.now, verbose_name='Data de Atualização')
+    data_conclusao = models.DateTimeField(null=True, blank=True, verbose_name='Data de Conclusão')
+    
+    class Meta:
+        verbose_name = 'Limpeza do Histórico'
+        verbose_name_plural = 'Limpezas do Histórico'
+        indexes = [
+            models.Index(fields=['estado', 'id'], name='limpeza_estado_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.usuario_id}: {self.removidas}/{self.total} ({self.estado})'
+    
+    def apagar_lote(self, tamanho):
+        """Apaga até ``tamanho`` operações desta limpeza; retorna quantas."""
+        ids = list(Operacao.objects.filter(
+            usuario_id=self.usuario_id, id__gt=self.desde_id, id__lte=self.ate_id
+        ).order_by('id').values_list('id', flat=True)[:tamanho])
+        if not ids:
+            return 0
+        with transaction.atomic():
+            OperandoOperacao.objects.filter(operacao_id__in=ids).delete()
+            # Sem os registros de OperacaoQuerySet.delete: as operações já
+            # saíram do histórico (versão, marca e evento) na limpeza lógica.
+            apagadas, _ = models.QuerySet.delete(Operacao.objects.filter(pk__in=ids))
+            LimpezaHistorico.objects.filter(pk=self.pk).update(
+                removidas=F('removidas') + apagadas, data_atualizacao=timezone.now()
+            )
+        self.removidas += apagadas
+        return apagadas
+    
+    def concluir(self):
+        with transaction.atomic():
+            if self.excluir_usuario and self.usuario_id is not None:
+                get_user_model().objects.filter(pk=self.usuario_id).delete()
+            agora = timezone.now()
+            LimpezaHistorico.objects.filter(pk=self.pk).update(
+                estado=self.CONCLUIDA, erro='', data_atualizacao=agora, data_conclusao=agora
+            )
+        self.estado, self.data_conclusao = self.CONCLUIDA, agora
+    
+    def dados(self):
+        """Situação para ``limpar_historico/<id>/``."""
+        return {
+            'id': self.pk,
+            'estado': self.estado,
+            'total': self.total,
+            'removidas': self.removidas,
+            'progresso': round(min(self.removidas / self.total, 1), 4) if self.total else 1.0,
+            'excluir_usuario': self.excluir_usuario,
+            'data_criacao': self.data_criacao,
+            'data_conclusao': self.data_conclusao,
+            'erro': self.erro or None,
         }
-        return simbolos.get(tipo, '?')
+
+
+class AgregadoOperacoes(models.Model):
+    """
+    Operações realizadas por intervalo de tempo (minuto, hora ou dia, no fuso
+    de ``TIME_ZONE``), tipo e faixa do resultado, para ``analise/`` responder
+    sem agrupar ``calculadora_operacao``. Preenchido por
+    ``calculadora.agregados`` a partir das operações com id acima de
+    ``MarcaAgregacao``; remoções e limpezas não alteram o que já foi contado.
+
+    ``faixa`` é a ordem de grandeza do resultado em centavos com sinal: 0 para
+    zero, 1 para ``[0,01, 0,1)``, 2 para ``[0,1, 1)``, ... e negativa para
+    resultados negativos.
+    """
+    MINUTO = 'minuto'
+    HORA = 'hora'
+    DIA = 'dia'
+    GRANULARIDADES = [
+        (MINUTO, 'Minuto'),
+        (HORA, 'Hora'),
+        (DIA, 'Dia'),
+    ]
+    
+    granularidade = models.CharField(max_length=6, choices=GRANULARIDADES, verbose_name='Granularidade')
+    inicio = models.DateTimeField(verbose_name='Início do intervalo')
+    tipo_operacao = models.CharField(max_length=20, choices=Operacao.TIPOS_OPERACAO, verbose_name='Tipo de Operação')
+    faixa = models.SmallIntegerField(verbose_name='Faixa do resultado')
+    quantidade = models.BigIntegerField(default=0, verbose_name='Operações')
+    centavos = models.BigIntegerField(default=0, verbose_name='Soma dos resultados (centavos)')
+    minimo_centavos = models.BigIntegerField(verbose_name='Menor resultado (centavos)')
+    maximo_centavos = models.BigIntegerField(verbose_name='Maior resultado (centavos)')
+    
+    class Meta:
+        verbose_name = 'Agregado de Operações'
+        verbose_name_plural = 'Agregados de Operações'
+        constraints = [
+            # Também é o índice das consultas por granularidade e período
+            models.UniqueConstraint(
+                fields=['granularidade', 'inicio', 'tipo_operacao', 'faixa'], name='agregado_chave_unica'
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.granularidade} {self.inicio:%Y-%m-%d %H:%M} {self.tipo_operacao} ({self.faixa}): {self.quantidade}'
+
+
+class MarcaAgregacao(models.Model):
+    """
+    Até onde ``calculadora.agregados`` já contou: as operações com id até
+    ``ultimo_id`` estão em ``AgregadoOperacoes``. Uma linha por agregação.
+    """
+    nome = models.CharField(max_length=50, primary_key=True, verbose_name='Nome')
+    ultimo_id = models.BigIntegerField(default=0, verbose_name='Último id agregado')
+    data_atualizacao = models.DateTimeField(null=True, blank=True, verbose_name='Data de Atualização')
+    
+    class Meta:
+        verbose_name = 'Marca de Agregação'
+        verbose_name_plural = 'Marcas de Agregação'
+    
+    def __str__(self):
+        return f'{self.nome}: {self.ultimo_id}'
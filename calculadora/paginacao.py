@@ -0,0 +1,147 @@
+"""
+Paginação do histórico.
+
+``OperacaoPagination`` numera páginas (``?page=3``) e faz ``COUNT(*)`` +
+``OFFSET`` a cada requisição. ``OperacaoCursorPagination`` (``?paginacao=cursor``)
+navega por chave em ``(data_criacao, id)`` decrescentes: cada página é uma
+busca no índice ``operacao_usuario_data_id_idx`` a partir do cursor, com o
+mesmo custo em qualquer profundidade. O total só é contado com ``?total=true``.
+"""
+import base64
+from collections import OrderedDict
+from datetime import datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+ORDENACAO_HISTORICO = ('-data_criacao', '-id')
+
+
+class OperacaoPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def usar_cursor(parametros):
+    return parametros.get('paginacao') == 'cursor' or OperacaoCursorPagination.cursor_query_param in parametros
+
+
+def _codificar_cursor(data_criacao, pk, reverso):
+    texto = f"{data_criacao.isoformat()}|{pk}|{'r' if reverso else 'f'}"
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def _decodificar_cursor(cursor):
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        data_criacao, pk, direcao = texto.split('|')
+        if direcao not in ('f', 'r'):
+            raise ValueError
+        return datetime.fromisoformat(data_criacao), int(pk), direcao == 'r'
+    except (ValueError, UnicodeDecodeError):
+        raise NotFound('Cursor inválido.')
+
+
+class OperacaoCursorPagination(BasePagination):
+    """
+    Paginação por chave (keyset) em ``(data_criacao, id)`` decrescentes.
+
+    ``preparar`` devolve a consulta da página (``page_size + 1`` linhas, a
+    extra só indica se há mais) e ``paginar_linhas`` monta a página a partir
+    das linhas lidas; as duas etapas separadas permitem ler as linhas com
+    ``async for`` nas views assíncronas.
+    """
+    page_size = OperacaoPagination.page_size
+    page_size_query_param = OperacaoPagination.page_size_query_param
+    max_page_size = OperacaoPagination.max_page_size
+    cursor_query_param = 'cursor'
+    total_query_param = 'total'
+    # Preenchido pela view antes de ``preparar`` quando ``contar_total``
+    total = None
+
+    def _tamanho_pagina(self, request):
+        try:
+            tamanho = int(request.GET.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(tamanho, self.max_page_size) if tamanho > 0 else self.page_size
+
+    def preparar(self, queryset, request):
+        self.request = request
+        self.tamanho = self._tamanho_pagina(request)
+        self.url = request.build_absolute_uri()
+        cursor = request.GET.get(self.cursor_query_param)
+        self.posicao = _decodificar_cursor(cursor) if cursor else None
+
+        queryset = queryset.order_by(*ORDENACAO_HISTORICO)
+        if self.posicao is None:
+            self.reverso = False
+            return queryset[:self.tamanho + 1]
+
+        # "data <= cursor, exceto os já vistos com a mesma data" em vez de
+        # "data < cursor OR (data = cursor AND id < cursor)": com o OR o SQLite
+        # não usa a faixa de data no índice e volta a varrer desde o início.
+        data_criacao, pk, self.reverso = self.posicao
+        if self.reverso:
+            # Página anterior: lê em ordem crescente a partir do cursor e inverte depois.
+            queryset = queryset.filter(data_criacao__gte=data_criacao).exclude(
+                data_criacao=data_criacao, id__lte=pk
+            ).order_by('data_criacao', 'id')
+        else:
+            queryset = queryset.filter(data_criacao__lte=data_criacao).exclude(
+                data_criacao=data_criacao, id__gte=pk
+            )
+        return queryset[:self.tamanho + 1]
+
+    def contar_total(self, request):
+        return request.GET.get(self.total_query_param, '').lower() in ('1', 'true')
+
+    def paginar_linhas(self, linhas):
+        linhas = list(linhas)
+        ha_mais = len(linhas) > self.tamanho
+        linhas = linhas[:self.tamanho]
+        if self.reverso:
+            linhas.reverse()
+            self.tem_anterior, self.tem_proxima = ha_mais, True
+        else:
+            self.tem_anterior, self.tem_proxima = self.posicao is not None, ha_mais
+        self.linhas = linhas
+        return linhas
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.contar_total(request):
+            self.total = queryset.count()
+        return self.paginar_linhas(self.preparar(queryset, request))
+
+    def _link(self, linha, reverso):
+        url = remove_query_param(self.url, self.total_query_param)
+        url = replace_query_param(url, 'paginacao', 'cursor')
+        return replace_query_param(
+            url, self.cursor_query_param, _codificar_cursor(linha.data_criacao, linha.id, reverso)
+        )
+
+    def get_next_link(self):
+        if not self.tem_proxima or not self.linhas:
+            return None
+        return self._link(self.linhas[-1], reverso=False)
+
+    def get_previous_link(self):
+        if not self.tem_anterior or not self.linhas:
+            return None
+        return self._link(self.linhas[0], reverso=True)
+
+    def get_paginated_data(self, data):
+        dados = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.total is not None:
+            dados['count'] = self.total
+        dados['results'] = data
+        return dados
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
@@ -0,0 +1,125 @@
+"""
+Redução em vários processos para operações muito grandes.
+
+Os números são copiados uma única vez para um bloco de
+``multiprocessing.shared_memory``; cada processo de um pool persistente anexa
+o bloco, reduz o seu trecho sem copiar e devolve apenas um float. O primeiro
+trecho é reduzido pela própria operação e os demais pela operação de
+``engine.JUNCAO``; os parciais são então unidos em ordem pela operação
+original, o que preserva o resultado de subtração e divisão. Na divisão, os
+zeros são checados em cada trecho, nos números, e não no produto parcial,
+que pode virar 0.0 por underflow sem que nenhum divisor seja zero.
+
+Ativado por ``CALCULADORA_PARALELO_PROCESSOS`` (>= 2) a partir de
+``CALCULADORA_PARALELO_LIMIAR`` números; veja ``engine.calcular``.
+"""
+import atexit
+import math
+import multiprocessing
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from . import engine
+from .engine import CAUDA_SEM_ZERO, JUNCAO, DivisaoPorZero, np
+
+TAMANHO_FLOAT64 = 8
+
+_pool = None
+_pool_processos = 0
+_pool_lock = threading.Lock()
+
+
+def obter_pool(processos):
+    """Retorna o pool persistente, recriando-o se a quantidade de processos mudar."""
+    global _pool, _pool_processos
+    with _pool_lock:
+        if _pool is None or _pool_processos != processos:
+            if _pool is not None:
+                _pool.shutdown()
+            # 'spawn' evita herdar threads e conexões do processo do servidor.
+            _pool = ProcessPoolExecutor(
+                max_workers=processos,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _pool_processos = processos
+        return _pool
+
+
+@atexit.register
+def encerrar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _visao(buffer, quantidade):
+    if np is not None:
+        return np.ndarray((quantidade,), dtype=np.float64, buffer=buffer)
+    return buffer[:quantidade * TAMANHO_FLOAT64].cast('d')
+
+
+def _reduzir_trecho(nome, quantidade, inicio, fim, tipo_operacao):
+    """Executado nos processos do pool: reduz ``numeros[inicio:fim]``."""
+    # O processo filho compartilha o resource tracker do pai (contexto 'spawn'),
+    # então anexar o bloco não o registra de novo; quem o cria faz o unlink.
+    memoria = shared_memory.SharedMemory(name=nome)
+    try:
+        trecho = _visao(memoria.buf, quantidade)[inicio:fim]
+        if inicio == 0:
+            return engine.reduzir(tipo_operacao, trecho)
+        if tipo_operacao in CAUDA_SEM_ZERO and 0 in trecho:
+            raise DivisaoPorZero('Divisão por zero não é permitida')
+        return engine.reduzir(JUNCAO[tipo_operacao], trecho)
+    finally:
+        # As visões precisam ser liberadas antes de fechar a memória compartilhada.
+        trecho = None
+        memoria.close()
+
+
+def _dividir(dividendo, divisor):
+    """Divisão IEEE 754: ``divisor`` 0.0 é um produto que sofreu underflow, não um zero."""
+    if divisor:
+        return dividendo / divisor
+    if not dividendo or math.isnan(dividendo):
+        return dividendo
+    return math.copysign(math.inf, dividendo) * math.copysign(1.0, divisor)
+
+
+def unir_parciais(tipo_operacao, parciais):
+    """Une, em ordem, os resultados dos trechos."""
+    if tipo_operacao in CAUDA_SEM_ZERO:
+        # Os trechos já levantaram DivisaoPorZero se algum número era zero
+        resultado = parciais[0]
+        for parcial in parciais[1:]:
+            resultado = _dividir(resultado, parcial)
+        return resultado
+    return engine.reduzir(tipo_operacao, parciais)
+
+
+def calcular_paralelo(tipo_operacao, numeros, processos):
+    """Reduz ``numeros`` dividindo-os em ``processos`` trechos contíguos."""
+    quantidade = len(numeros)
+    memoria = shared_memory.SharedMemory(create=True, size=quantidade * TAMANHO_FLOAT64)
+    try:
+        destino = _visao(memoria.buf, quantidade)
+        if np is None and not isinstance(numeros, memoryview):
+            numeros = array('d', numeros)
+        destino[:] = numeros
+        destino = None
+
+        pool = obter_pool(processos)
+        limites = [quantidade * i // processos for i in range(processos + 1)]
+        futuros = [
+            pool.submit(_reduzir_trecho, memoria.name, quantidade, inicio, fim, tipo_operacao)
+            for inicio, fim in zip(limites, limites[1:])
+            if fim > inicio
+        ]
+        parciais = [futuro.result() for futuro in futuros]
+    finally:
+        memoria.close()
+        memoria.unlink()
+    return unir_parciais(tipo_operacao, parciais)
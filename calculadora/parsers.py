@@ -0,0 +1,143 @@
+"""
+Parsers dos formatos alternativos de entrada da calculadora.
+
+Binário (``application/octet-stream``)
+    O corpo é uma sequência de um ou mais registros, cada um com:
+
+    * 1 byte: tamanho ``T`` do nome da operação;
+    * ``T`` bytes: ``tipo_operacao`` em ASCII (ex.: ``soma``);
+    * 4 bytes: quantidade ``N`` de números (uint32 little-endian);
+    * bytes zero até o próximo múltiplo de 8 (contado desde o início do corpo);
+    * ``N`` x 8 bytes: os números em float64 little-endian.
+
+    Os números não passam por uma lista de objetos Python: viram um array
+    NumPy (``np.frombuffer``) ou um ``memoryview`` sobre o próprio corpo.
+
+NDJSON (``application/x-ndjson``)
+    Uma linha por número ou por lista JSON de números. ``ler_blocos_ndjson`` lê
+    o corpo aos poucos, sem passar por ``request.data``.
+"""
+import json
+import struct
+import sys
+from array import array
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from .engine import np
+
+CABECALHO_QUANTIDADE = struct.Struct('<I')
+TAMANHO_FLOAT64 = 8
+TAMANHO_BLOCO_NDJSON = 64 * 1024
+
+
+def _alinhar(posicao):
+    return (posicao + TAMANHO_FLOAT64 - 1) // TAMANHO_FLOAT64 * TAMANHO_FLOAT64
+
+
+def _ler_numeros(corpo, inicio, quantidade):
+    if np is not None:
+        return np.frombuffer(corpo, dtype='<f8', count=quantidade, offset=inicio)
+    janela = memoryview(corpo)[inicio:inicio + quantidade * TAMANHO_FLOAT64]
+    if sys.byteorder == 'little':
+        return janela.cast('d')
+    numeros = array('d', janela)
+    numeros.byteswap()
+    return memoryview(numeros)
+
+
+def codificar_operacoes(operacoes):
+    """Monta o corpo binário para uma lista de pares ``(tipo_operacao, numeros)``."""
+    corpo = bytearray()
+    for tipo_operacao, numeros in operacoes:
+        nome = tipo_operacao.encode('ascii')
+        valores = array('d', numeros)
+        if sys.byteorder != 'little':
+            valores.byteswap()
+        corpo += bytes([len(nome)]) + nome + CABECALHO_QUANTIDADE.pack(len(valores))
+        corpo += bytes(_alinhar(len(corpo)) - len(corpo))
+        corpo += valores.tobytes()
+    return bytes(corpo)
+
+
+def decodificar_operacoes(corpo):
+    """Lê todos os registros de ``corpo`` e retorna uma lista de dicts."""
+    operacoes = []
+    posicao = 0
+    while posicao < len(corpo):
+        tamanho_nome = corpo[posicao]
+        fim_nome = posicao + 1 + tamanho_nome
+        fim_cabecalho = fim_nome + CABECALHO_QUANTIDADE.size
+        if tamanho_nome == 0 or fim_cabecalho > len(corpo):
+            raise ParseError('Cabeçalho binário inválido.')
+        try:
+            tipo_operacao = corpo[posicao + 1:fim_nome].decode('ascii')
+        except UnicodeDecodeError:
+            raise ParseError('Tipo de operação deve estar em ASCII.')
+        quantidade, = CABECALHO_QUANTIDADE.unpack_from(corpo, fim_nome)
+        inicio = _alinhar(fim_cabecalho)
+        posicao = inicio + quantidade * TAMANHO_FLOAT64
+        if posicao > len(corpo):
+            raise ParseError('Corpo binário menor que a quantidade de números informada.')
+        operacoes.append({
+            'tipo_operacao': tipo_operacao,
+            'numeros': _ler_numeros(corpo, inicio, quantidade),
+        })
+    return operacoes
+
+
+class Float64Parser(BaseParser):
+    """
+    Aceita operações em float64 little-endian (ver docstring do módulo).
+
+    Com um único registro, ``request.data`` tem ``numeros`` e ``tipo_operacao``
+    como no JSON de ``calcular``; todos os registros ficam em ``operacoes``,
+    como no corpo do endpoint de lote.
+    """
+    media_type = 'application/octet-stream'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            raise ParseError('Corpo binário vazio.')
+        operacoes = decodificar_operacoes(stream.read())
+        if not operacoes:
+            raise ParseError('Corpo binário vazio.')
+        dados = {'operacoes': operacoes}
+        if len(operacoes) == 1:
+            dados.update(operacoes[0])
+        return dados
+
+
+def _numeros_da_linha(linha):
+    try:
+        valor = json.loads(linha)
+    except ValueError:
+        raise ParseError('Linha NDJSON inválida.')
+    if isinstance(valor, list):
+        return valor
+    return [valor]
+
+
+def ler_blocos_ndjson(stream, tamanho_bloco=TAMANHO_BLOCO_NDJSON):
+    """
+    Gera listas de números a partir de um corpo NDJSON lido em blocos.
+
+    Cada bloco de ``tamanho_bloco`` bytes vira uma lista com os números das
+    linhas completas; o trecho final incompleto fica para o próximo bloco.
+    """
+    resto = b''
+    while True:
+        bloco = stream.read(tamanho_bloco)
+        if not bloco:
+            break
+        linhas = (resto + bloco).split(b'\n')
+        resto = linhas.pop()
+        numeros = []
+        for linha in linhas:
+            if linha.strip():
+                numeros.extend(_numeros_da_linha(linha))
+        if numeros:
+            yield numeros
+    if resto.strip():
+        yield _numeros_da_linha(resto)
@@ -0,0 +1,375 @@
+"""
+Gravação assíncrona (write-behind) das operações.
+
+Com ``CALCULADORA_WRITE_BEHIND`` ativo, ``calcular_api`` responde assim que o
+resultado é calculado e a ``Operacao`` vai para uma fila em memória. Uma
+thread grava a fila com ``bulk_create`` em commits agrupados, disparados ao
+atingir ``CALCULADORA_WRITE_BEHIND_LOTE`` linhas ou a cada
+``CALCULADORA_WRITE_BEHIND_INTERVALO`` segundos.
+
+Cada linha enfileirada é antes anexada a um journal em disco (uma linha JSON
+com número de sequência) e, com ``CALCULADORA_WRITE_BEHIND_FSYNC``, levada ao
+disco com ``fsync`` antes da resposta; sem ele o journal só sobrevive à queda
+do processo, não à do sistema. Depois de cada commit é anexado um marcador
+com a última sequência gravada. Cada execução de um processo usa o seu
+próprio arquivo, protegido por ``flock``. Journals de processos que morreram
+são relidos e as linhas sem marcador de commit gravadas na primeira
+requisição de cada processo (``recuperar_ao_iniciar``, com o write-behind
+ativo ou não), ao iniciar a fila e com ``manage.py recuperar_journals``. A
+fila é esvaziada no encerramento do processo (``atexit``).
+
+Um lote que falha por causa dos dados é dividido ao meio até isolar as linhas
+que não podem ser gravadas; elas são registradas no log, contadas em
+``metricas/`` e descartadas, e o resto é gravado. Só erros do banco
+(``ERROS_BANCO``: banco travado ou fora do ar) devolvem as linhas à fila.
+"""
+import atexit
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from itertools import chain
+from pathlib import Path
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections, connections, transaction
+from django.utils.dateparse import parse_datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem flock, um único processo de desenvolvimento
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_JOURNAL = [
+    'usuario_id', 'tipo_operacao', 'parametros', 'quantidade_parametros',
+    'digest_parametros', 'resultado', 'data_criacao',
+]
+
+# Falhas em que as linhas voltam para a fila; as demais são dos dados
+ERROS_BANCO = (OperationalError, InterfaceError)
+
+
+def _para_journal(seq, operacao):
+    linha = {campo: getattr(operacao, campo) for campo in CAMPOS_JOURNAL}
+    linha['resultado'] = float(linha['resultado'])
+    linha['data_criacao'] = linha['data_criacao'].isoformat()
+    linha['seq'] = seq
+    return json.dumps(linha) + '\n'
+
+
+def _ler_journal(arquivo):
+    """Retorna os pares ``(seq, operacao)`` do journal que não chegaram a ser gravados."""
+    from .models import Operacao
+
+    pendentes = {}
+    for linha in arquivo:
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            break  # última linha incompleta (queda no meio da escrita)
+        if 'commit' in registro:
+            for seq in [s for s in pendentes if s <= registro['commit']]:
+                del pendentes[seq]
+        else:
+            seq = registro.pop('seq')
+            if isinstance(registro.get('parametros'), str):
+                # Journal gravado antes do armazenamento binário (texto JSON)
+                registro['parametros'] = json.loads(registro['parametros'] or '[]')
+            if 'data_criacao' in registro:
+                # Sem ela (journal antigo), vale a data da recuperação
+                registro['data_criacao'] = parse_datetime(registro['data_criacao'])
+            pendentes[seq] = Operacao(**registro)
+    return sorted(pendentes.items())
+
+
+class FilaEscrita:
+
+    def __init__(self, diretorio_journal=None, tamanho_lote=500, intervalo=0.5, fsync=True):
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.fsync = fsync
+        self.diretorio_journal = Path(diretorio_journal) if diretorio_journal else None
+        self._fila = deque()
+        self._condicao = threading.Condition()
+        self._seq = 0
+        self._journal = None
+        self._thread = None
+        self._parar = False
+        self._commits = 0
+        self._linhas_gravadas = 0
+        self._linhas_recuperadas = 0
+        self._linhas_descartadas = 0
+        self._erros = 0
+        self._latencia_ultima = None
+        self._latencia_total = 0.0
+        self._latencia_maxima = 0.0
+
+    # Ciclo de vida -------------------------------------------------------
+
+    def iniciar(self):
+        with self._condicao:
+            if self._thread is not None:
+                return
+            if self.diretorio_journal:
+                self.diretorio_journal.mkdir(parents=True, exist_ok=True)
+                self._recuperar_journals()
+                # Sufixo aleatório: um PID reutilizado não continua o journal de outra execução
+                caminho = self.diretorio_journal / f'operacoes-{os.getpid()}-{secrets.token_hex(4)}.journal'
+                self._journal = open(caminho, 'a', encoding='utf-8')
+                if fcntl is not None:
+                    fcntl.flock(self._journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._parar = False
+            self._thread = threading.Thread(target=self._executar, name='calculadora-write-behind', daemon=True)
+            self._thread.start()
+        atexit.register(self.encerrar)
+
+    def encerrar(self):
+        """Para a thread e grava tudo o que ainda estiver na fila."""
+        with self._condicao:
+            if self._thread is None:
+                return
+            self._parar = True
+            self._condicao.notify()
+            thread = self._thread
+        thread.join()
+        self.esvaziar()
+        with self._condicao:
+            self._thread = None
+            if self._journal is not None:
+                caminho = self._journal.name
+                self._journal.close()
+                self._journal = None
+                if not self._fila:
+                    os.unlink(caminho)
+
+    def _recuperar_journals(self):
+        for caminho in sorted(self.diretorio_journal.glob('operacoes-*.journal')):
+            with open(caminho, 'r+', encoding='utf-8') as arquivo:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue  # journal de um processo vivo
+                pendentes = _ler_journal(arquivo)
+                if pendentes:
+                    descartadas, restantes = self._gravar_isolando(pendentes)
+                    feitas = len(pendentes) - len(restantes)
+                    self._linhas_recuperadas += feitas - descartadas
+                    self._linhas_descartadas += descartadas
+                    if restantes:
+                        if feitas:
+                            arquivo.write(json.dumps({'commit': pendentes[feitas - 1][0]}) + '\n')
+                        logger.error('Journal %s recuperado em parte; nova tentativa no próximo início', caminho)
+                        continue
+                    logger.info('Recuperadas %d operações do journal %s', feitas - descartadas, caminho)
+                os.unlink(caminho)
+
+    # Fila ----------------------------------------------------------------
+
+    def _sincronizar(self):
+        """Leva ao disco o que foi escrito no journal (chamado com o lock)."""
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def enfileirar(self, operacao):
+        with self._condicao:
+            self._seq += 1
+            descritor = None
+            if self._journal is not None:
+                self._journal.write(_para_journal(self._seq, operacao))
+                self._journal.flush()
+                descritor = self._journal.fileno()
+            self._fila.append((self._seq, operacao))
+            if len(self._fila) >= self.tamanho_lote:
+                self._condicao.notify()
+        if descritor is not None and self.fsync:
+            # Fora do lock: requisições simultâneas esperam o disco juntas
+            os.fsync(descritor)
+
+    def _retirar_lote(self):
+        lote = []
+        while self._fila and len(lote) < self.tamanho_lote:
+            lote.append(self._fila.popleft())
+        return lote
+
+    def _executar(self):
+        while True:
+            with self._condicao:
+                self._condicao.wait_for(
+                    lambda: self._parar or len(self._fila) >= self.tamanho_lote,
+                    timeout=self.intervalo
+                )
+                if self._parar:
+                    return
+                lote = self._retirar_lote()
+            if lote:
+                close_old_connections()
+                self._gravar_lote(lote)
+
+    def esvaziar(self):
+        """Grava de forma síncrona todas as operações enfileiradas."""
+        while True:
+            with self._condicao:
+                lote = self._retirar_lote()
+            if not lote:
+                return
+            if not self._gravar_lote(lote):
+                return
+
+    def _gravar(self, operacoes):
+        from .models import Operacao
+
+        with transaction.atomic():
+            Operacao.objects.bulk_create(operacoes)
+
+    def _gravar_isolando(self, lote):
+        """
+        Grava os pares ``(seq, operacao)`` de ``lote``, em ordem. Uma parte que
+        falha por causa dos dados é dividida ao meio até isolar as linhas que
+        não podem ser gravadas, que são descartadas. Retorna ``(descartadas,
+        restantes)``: ``restantes`` são as linhas não gravadas por um erro do
+        banco, a partir da primeira (as anteriores já foram gravadas).
+        """
+        partes = deque([lote])
+        descartadas = 0
+        while partes:
+            parte = partes.popleft()
+            try:
+                self._gravar([operacao for _, operacao in parte])
+            except ERROS_BANCO:
+                restantes = list(chain(parte, *partes))
+                logger.exception('Falha ao gravar %d operações; elas voltam para a fila', len(restantes))
+                return descartadas, restantes
+            except Exception:
+                if len(parte) > 1:
+                    meio = len(parte) // 2
+                    partes.extendleft((parte[meio:], parte[:meio]))
+                    continue
+                logger.exception('Operação descartada por não poder ser gravada: %s', _para_journal(*parte[0]).strip())
+                descartadas += 1
+        return descartadas, []
+
+    def _gravar_lote(self, lote):
+        """Grava ``lote``; retorna falso se parte dele voltou para a fila."""
+        inicio = time.perf_counter()
+        descartadas, restantes = self._gravar_isolando(lote)
+        latencia = time.perf_counter() - inicio
+        feitas = lote[:len(lote) - len(restantes)]
+
+        with self._condicao:
+            self._linhas_descartadas += descartadas
+            if restantes:
+                self._erros += 1
+                self._fila.extendleft(reversed(restantes))
+            if feitas:
+                self._commits += 1
+                self._linhas_gravadas += len(feitas) - descartadas
+                self._latencia_ultima = latencia
+                self._latencia_total += latencia
+                self._latencia_maxima = max(self._latencia_maxima, latencia)
+                if self._journal is not None:
+                    # Descartadas também contam como feitas: não voltam na recuperação
+                    # Um marcador perdido numa queda do sistema regravaria o lote
+                    if self._fila:
+                        self._journal.write(json.dumps({'commit': feitas[-1][0]}) + '\n')
+                    else:
+                        self._journal.truncate(0)
+                    self._sincronizar()
+        return not restantes
+
+    def estatisticas(self):
+        with self._condicao:
+            commits = self._commits
+            return {
+                'ativa': self._thread is not None,
+                'profundidade': len(self._fila),
+                'commits': commits,
+                'linhas_gravadas': self._linhas_gravadas,
+                'linhas_recuperadas': self._linhas_recuperadas,
+                'linhas_descartadas': self._linhas_descartadas,
+                'erros': self._erros,
+                'latencia_commit_ms': {
+                    'ultima': round(self._latencia_ultima * 1000, 3) if self._latencia_ultima is not None else None,
+                    'media': round(self._latencia_total / commits * 1000, 3) if commits else None,
+                    'maxima': round(self._latencia_maxima * 1000, 3),
+                },
+            }
+
+
+_fila = None
+_fila_lock = threading.Lock()
+
+
+def write_behind_ativo():
+    return getattr(settings, 'CALCULADORA_WRITE_BEHIND', False)
+
+
+def obter_fila():
+    """Fila do processo atual, criada e iniciada no primeiro uso."""
+    global _fila
+    with _fila_lock:
+        if _fila is None:
+            _fila = FilaEscrita(
+                diretorio_journal=getattr(settings, 'CALCULADORA_WRITE_BEHIND_JOURNAL', None),
+                tamanho_lote=getattr(settings, 'CALCULADORA_WRITE_BEHIND_LOTE', 500),
+                intervalo=getattr(settings, 'CALCULADORA_WRITE_BEHIND_INTERVALO', 0.5),
+                fsync=getattr(settings, 'CALCULADORA_WRITE_BEHIND_FSYNC', True),
+            )
+            _fila.iniciar()
+        return _fila
+
+
+def recuperar_journals():
+    """
+    Grava as operações pendentes nos journals de processos encerrados, sem
+    iniciar a fila; retorna ``(recuperadas, descartadas)``.
+    """
+    diretorio = getattr(settings, 'CALCULADORA_WRITE_BEHIND_JOURNAL', None)
+    if not diretorio or not os.path.isdir(diretorio):
+        return 0, 0
+    fila = FilaEscrita(diretorio_journal=diretorio)
+    fila._recuperar_journals()
+    return fila._linhas_recuperadas, fila._linhas_descartadas
+
+
+_recuperacao_iniciada = False
+
+
+def recuperar_ao_iniciar(**kwargs):
+    """
+    Receptor de ``request_started`` ligado em ``CalculadoraConfig.ready``: na
+    primeira requisição do processo, grava em uma thread as operações
+    pendentes nos journals deixados por processos encerrados. Não roda no
+    ``ready`` em si para não acessar o banco em ``migrate`` e nos testes.
+    """
+    global _recuperacao_iniciada
+    with _fila_lock:
+        if _recuperacao_iniciada:
+            return
+        _recuperacao_iniciada = True
+    diretorio = getattr(settings, 'CALCULADORA_WRITE_BEHIND_JOURNAL', None)
+    if diretorio and any(Path(diretorio).glob('operacoes-*.journal')):
+        threading.Thread(target=_recuperar_em_segundo_plano, name='calculadora-journals', daemon=True).start()
+
+
+def _recuperar_em_segundo_plano():
+    try:
+        recuperadas, descartadas = recuperar_journals()
+        if recuperadas or descartadas:
+            logger.info('Journals recuperados: %d operações gravadas, %d descartadas', recuperadas, descartadas)
+    except Exception:
+        logger.exception('Falha ao recuperar os journals do write-behind')
+    finally:
+        connections.close_all()
+
+
+def estatisticas():
+    if _fila is None:
+        return {'ativa': False, 'profundidade': 0}
+    return _fila.estatisticas()
@@ -1,9 +1,27 @@
 from rest_framework import serializers
-from .models import Operacao
+from .engine import ErroCalculo, calcular, como_lista, normalizar_numeros
+from .fields import decodificar_float64
+from .models import SIMBOLOS_OPERACAO, Operacao, formatar_parametros, verificar_resultado
 import json
 
 
+class ParametrosField(serializers.Field):
+    """
+    ``parametros`` como texto JSON, o formato da API antes do armazenamento
+    binário: ``"[10.0, 5.0]"`` na resposta e na entrada.
+    """
+
+    def to_representation(self, value):
+        return json.dumps(value)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            raise serializers.ValidationError("Parâmetros devem ser uma lista de números em formato JSON válido.")
+        return data
+
+
 class OperacaoSerializer(serializers.ModelSerializer):
+    parametros = ParametrosField()
     usuario_nome = serializers.CharField(
         source='usuario.nome', 
         read_only=True
@@ -38,8 +56,7 @@ class OperacaoSerializer(serializers.ModelSerializer):
         tipo_operacao = validated_data['tipo_operacao']
         
         try:
-            parametros = json.loads(parametros_str)
-            parametros = [float(p) for p in parametros]
+            parametros = normalizar_numeros(json.loads(parametros_str))
         except (json.JSONDecodeError, ValueError, TypeError):
             raise serializers.ValidationError("Parâmetros devem ser uma lista de números em formato JSON válido.")
         
@@ -47,37 +64,69 @@ class OperacaoSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("São necessários pelo menos 2 parâmetros para a operação.")
         
         try:
-            if tipo_operacao == 'soma':
-                resultado = sum(parametros)
-            elif tipo_operacao == 'subtracao':
-                resultado = parametros[0]
-                for num in parametros[1:]:
-                    resultado -= num
-            elif tipo_operacao == 'multiplicacao':
-                resultado = 1
-                for num in parametros:
-                    resultado *= num
-            elif tipo_operacao == 'divisao':
-                if 0 in parametros[1:]:
-                    raise serializers.ValidationError("Divisão por zero não é permitida.")
-                resultado = parametros[0]
-                for num in parametros[1:]:
-                    resultado /= num
-            else:
-                raise serializers.ValidationError("Tipo de operação inválido.")
-                
-        except Exception as e:
-            raise serializers.ValidationError(f"Erro ao realizar operação: {str(e)}")
+            resultado = calcular(tipo_operacao, parametros)
+            verificar_resultado(resultado)
+        except ErroCalculo as e:
+            raise serializers.ValidationError(str(e))
             
         operacao = Operacao.objects.create(
             usuario=self.context['request'].user,
             tipo_operacao=tipo_operacao,
-            parametros=parametros_str,
+            parametros=como_lista(parametros),
+            quantidade_parametros=len(parametros),
             resultado=resultado
         )
         return operacao
 
 
+class OperacaoListaSerializer:
+    """
+    Serialização do histórico direto das linhas do banco, sem instanciar
+    ``Operacao``: ``consulta`` lê só as colunas usadas (uma consulta, sem
+    ``JOIN`` com o usuário) e ``data`` monta os mesmos dicionários de
+    ``OperacaoSerializer``. Todas as linhas são do ``usuario`` informado.
+    """
+    CAMPOS = (
+        'id', 'tipo_operacao', 'parametros', 'quantidade_parametros',
+        'digest_parametros', 'resultado', 'data_criacao',
+    )
+
+    # Mesmas regras de formatação dos campos de OperacaoSerializer
+    _resultado = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=False)
+    _data_criacao = serializers.DateTimeField()
+
+    def __init__(self, linhas, usuario):
+        self.linhas = linhas
+        self.usuario = usuario
+
+    @classmethod
+    def consulta(cls, queryset):
+        return queryset.values_list(*cls.CAMPOS, named=True)
+
+    @property
+    def data(self):
+        usuario_id, usuario_nome = self.usuario.pk, self.usuario.nome
+        resultado = self._resultado.to_representation
+        data_criacao = self._data_criacao.to_representation
+        dados = []
+        for linha in self.linhas:
+            parametros = decodificar_float64(linha.parametros) if linha.parametros else []
+            dados.append({
+                'id': linha.id,
+                'usuario': usuario_id,
+                'usuario_nome': usuario_nome,
+                'tipo_operacao': linha.tipo_operacao,
+                'parametros': json.dumps(parametros),
+                'parametros_display': formatar_parametros(
+                    parametros, linha.quantidade_parametros, linha.digest_parametros
+                ),
+                'resultado_serializado': resultado(linha.resultado),
+                'data_criacao': data_criacao(linha.data_criacao),
+                'simbolo_operacao': SIMBOLOS_OPERACAO.get(linha.tipo_operacao, '?'),
+            })
+        return dados
+
+
 class CalcularSerializer(serializers.Serializer):
     parametros = serializers.ListField(
         child=serializers.DecimalField(max_digits=10, decimal_places=2),
@@ -0,0 +1,17 @@
+"""
+Sinais das mudanças do histórico de operações.
+
+Os modelos enviam estes sinais dentro da transação de cada gravação ou
+remoção (``save``, ``delete``, ``bulk_create``, ``inserir_linhas``,
+``remover_ids``, ``limpar_historico``), sem saber quem os recebe. Quem
+precisa agir só depois do commit (os eventos SSE, em ``eventos.py``) usa
+``transaction.on_commit`` com o ``using`` recebido. Os receptores são
+conectados em ``CalculadoraConfig.ready``.
+"""
+from django.dispatch import Signal
+
+# ``pares``: lista de ``(usuario_id, operacao_id)``; ``using``: alias do banco
+operacoes_criadas = Signal()
+operacoes_removidas = Signal()
+# ``usuario_id`` e ``using``
+historico_limpo = Signal()
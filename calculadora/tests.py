@@ -1,3 +1,1804 @@
-from django.test import TestCase
+"""
+Testes da calculadora.
 
-# Create your tests here.
+As operações são criadas direto pelo ORM quando o teste não é da API; a
+escrita assíncrona (``CALCULADORA_WRITE_BEHIND``) fica desligada em todos.
+"""
+import asyncio
+import base64
+import csv
+import datetime
+import decimal
+import gzip
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import shutil
+import struct
+import tempfile
+import uuid
+from array import array
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from autenticacao.models import Usuario
+from kogui_portal import parsers as kogui_parsers, renderers
+from kogui_portal.compressao import aceita_gzip
+
+from . import (
+    agregados, cache_historico, engine, eventos, exportacao, expressao, expurgo, memoizacao, paralelo, parsers,
+    persistencia,
+)
+from .cache_backends import LRUBytesCache
+from .contadores import ContadorAcertos
+from .expurgo import Expurgo, excluir_usuario
+from .fields import FORMATO_INT32, FORMATO_ZLIB, codificar_float64, decodificar_float64
+from .models import (
+    AgregadoOperacoes, EstatisticaUsuario, LimpezaHistorico, MarcaAgregacao, Operacao, OperacaoRemovida,
+    OperandoOperacao, VersaoHistorico,
+)
+from .parsers import codificar_operacoes, decodificar_operacoes
+from .serializers import OperacaoListaSerializer, OperacaoSerializer
+
+
+@override_settings(CALCULADORA_WRITE_BEHIND=False, CALCULADORA_EXPURGO_SEGUNDO_PLANO=False)
+class CalculadoraTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username='ana', email='ana@exemplo.com', password='senha12345', nome='Ana'
+        )
+        cls.outro_usuario = Usuario.objects.create_user(
+            username='bruno', email='bruno@exemplo.com', password='senha12345', nome='Bruno'
+        )
+
+    def criar_operacao(self, usuario=None, tipo_operacao='soma', parametros=(1, 2), resultado=3, **kwargs):
+        return Operacao.objects.create(
+            usuario=usuario or self.usuario,
+            tipo_operacao=tipo_operacao,
+            parametros=parametros,
+            quantidade_parametros=len(parametros),
+            resultado=resultado,
+            **kwargs
+        )
+
+    def cliente(self, usuario=None):
+        cliente = APIClient()
+        cliente.force_authenticate(usuario or self.usuario)
+        return cliente
+
+
+def calcular_original(tipo_operacao, numeros):
+    """Cálculo de ``calcular_api`` antes do ``engine``, como referência."""
+    if tipo_operacao == 'soma':
+        resultado = sum(numeros)
+    elif tipo_operacao == 'subtracao':
+        resultado = numeros[0]
+        for num in numeros[1:]:
+            resultado -= num
+    elif tipo_operacao == 'multiplicacao':
+        resultado = 1
+        for num in numeros:
+            resultado *= num
+    elif tipo_operacao == 'divisao':
+        if 0 in numeros[1:]:
+            raise engine.DivisaoPorZero('Divisão por zero não é permitida')
+        resultado = numeros[0]
+        for num in numeros[1:]:
+            resultado /= num
+    return resultado
+
+
+class EngineTest(SimpleTestCase):
+    TIPOS = ('soma', 'subtracao', 'multiplicacao', 'divisao')
+    LISTAS = (
+        [10, 2],
+        [7, -3, 0.5],
+        [1.5, 2.25, 3, 4.125],
+        [100, 0.1, 0.2, 0.3],
+        [-8, 4, -2, 1],
+    )
+
+    def test_mesmos_resultados_do_calculo_original(self):
+        for tipo_operacao in self.TIPOS:
+            for numeros in self.LISTAS:
+                with self.subTest(tipo_operacao=tipo_operacao, numeros=numeros):
+                    resultado = engine.calcular(tipo_operacao, engine.normalizar_numeros(numeros))
+                    self.assertAlmostEqual(resultado, calcular_original(tipo_operacao, numeros), places=9)
+
+    def test_listas_grandes_no_caminho_numpy(self):
+        if engine.np is None:
+            self.skipTest('NumPy não instalado')
+        aleatorio = random.Random(42)
+        numeros = [aleatorio.uniform(0.5, 1.5) for _ in range(2000)]
+        with self.settings(CALCULADORA_NUMPY_LIMIAR=1000):
+            normalizados = engine.normalizar_numeros(numeros)
+            self.assertIsInstance(normalizados, engine.np.ndarray)
+            for tipo_operacao in self.TIPOS:
+                with self.subTest(tipo_operacao=tipo_operacao):
+                    resultado = engine.calcular(tipo_operacao, normalizados)
+                    esperado = calcular_original(tipo_operacao, numeros)
+                    self.assertAlmostEqual(resultado, esperado, delta=abs(esperado) * 1e-9)
+
+    def test_soma_igual_nos_dois_caminhos(self):
+        if engine.np is None:
+            self.skipTest('NumPy não instalado')
+        numeros = [0.1] * 10 + [1e16, 1.0, -1e16]
+        python = engine.calcular('soma', engine.normalizar_numeros(numeros))
+        with self.settings(CALCULADORA_NUMPY_LIMIAR=2):
+            vetorizado = engine.calcular('soma', engine.normalizar_numeros(numeros))
+        self.assertEqual(python, vetorizado)
+
+    def test_divisao_por_zero(self):
+        for numeros in ([1, 0], [0, 5, 0], [8, 2, 0.0]):
+            with self.subTest(numeros=numeros):
+                with self.assertRaises(engine.DivisaoPorZero):
+                    calcular_original('divisao', numeros)
+                with self.assertRaises(engine.DivisaoPorZero):
+                    engine.calcular('divisao', engine.normalizar_numeros(numeros))
+
+    def test_zero_como_dividendo(self):
+        self.assertEqual(engine.calcular('divisao', [0.0, 5.0]), calcular_original('divisao', [0, 5]))
+
+    def test_operacao_invalida(self):
+        with self.assertRaises(engine.OperacaoInvalida):
+            engine.calcular('potencia', [2.0, 3.0])
+
+    def test_numeros_invalidos(self):
+        with self.assertRaises(engine.ErroCalculo):
+            engine.normalizar_numeros([1, 'x'])
+
+
+class CalcularApiTest(CalculadoraTestCase):
+
+    def test_calcular_usa_o_engine(self):
+        resposta = self.cliente().post(
+            '/api/calc/calcular/', {'numeros': [10, 4, 1], 'tipo_operacao': 'subtracao'}, format='json'
+        )
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(resposta.json()['operacao']['resultado_serializado'], 5.0)
+
+    def test_resultado_fora_do_intervalo(self):
+        resposta = self.cliente().post(
+            '/api/calc/calcular/', {'numeros': [1e300, 1e300], 'tipo_operacao': 'multiplicacao'}, format='json'
+        )
+        self.assertEqual(resposta.status_code, 400)
+        self.assertFalse(Operacao.objects.exists())
+
+    def test_lote_recusa_so_os_itens_fora_do_intervalo(self):
+        resposta = self.cliente().post('/api/calc/calcular/lote/', {'operacoes': [
+            {'numeros': [1, 2], 'tipo_operacao': 'soma'},
+            {'numeros': [1e300, 1e300], 'tipo_operacao': 'multiplicacao'},
+            {'numeros': [1e8, 1], 'tipo_operacao': 'soma'},
+            {'numeros': [8, 0], 'tipo_operacao': 'divisao'},
+        ]}, format='json')
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual([erro['indice'] for erro in resposta.json()['erros']], [1, 2, 3])
+        self.assertEqual(len(resposta.json()['resultados']), 1)
+        self.assertEqual(Operacao.objects.count(), 1)
+
+
+class Float64ParserTest(CalculadoraTestCase):
+
+    def post_binario(self, url, operacoes):
+        return self.cliente().post(url, data=codificar_operacoes(operacoes), content_type='application/octet-stream')
+
+    def test_ida_e_volta(self):
+        operacoes = decodificar_operacoes(codificar_operacoes([('soma', [1.5, 2.5, 3]), ('divisao', [1 / 3, 7])]))
+        self.assertEqual([operacao['tipo_operacao'] for operacao in operacoes], ['soma', 'divisao'])
+        self.assertEqual([list(operacao['numeros']) for operacao in operacoes], [[1.5, 2.5, 3.0], [1 / 3, 7.0]])
+
+    def test_numeros_alinhados_em_8_bytes(self):
+        corpo = codificar_operacoes([('soma', [1.0])])
+        # 1 + 4 ('soma') + 4 (quantidade) = 9 bytes de cabeçalho, alinhados para 16
+        self.assertEqual(len(corpo), 16 + 8)
+        self.assertEqual(corpo[9:16], bytes(7))
+
+    def test_corpo_invalido(self):
+        for corpo in (b'\x04som', b'\x00', codificar_operacoes([('soma', [1.0, 2.0])])[:-1]):
+            with self.subTest(corpo=corpo):
+                with self.assertRaises(ParseError):
+                    decodificar_operacoes(corpo)
+
+    def test_calcular(self):
+        resposta = self.post_binario('/api/calc/calcular/', [('soma', [1.5, 2.5, 3])])
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(resposta.json()['operacao']['resultado_serializado'], 7.0)
+        self.assertEqual(Operacao.objects.get().parametros, [1.5, 2.5, 3.0])
+
+    def test_lote(self):
+        resposta = self.post_binario(
+            '/api/calc/calcular/lote/', [('soma', [1, 2]), ('divisao', [1, 0]), ('subtracao', [10, 1, 1])]
+        )
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual([erro['indice'] for erro in resposta.json()['erros']], [1])
+        self.assertEqual(
+            [(item['indice'], item['operacao']['resultado_serializado']) for item in resposta.json()['resultados']],
+            [(0, 3.0), (2, 8.0)]
+        )
+
+    def test_corpo_invalido_na_api(self):
+        resposta = self.cliente().post('/api/calc/calcular/', data=b'\x04som', content_type='application/octet-stream')
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_sem_numpy(self):
+        with mock.patch.object(engine, 'np', None), mock.patch.object(parsers, 'np', None):
+            operacao, = decodificar_operacoes(codificar_operacoes([('multiplicacao', [1.5, 2.0, 4.0])]))
+            self.assertIsInstance(operacao['numeros'], memoryview)
+            self.assertEqual(engine.calcular('multiplicacao', engine.normalizar_numeros(operacao['numeros'])), 12.0)
+
+
+class AcumuladorTest(SimpleTestCase):
+
+    def acumular(self, tipo_operacao, blocos):
+        acumulador = engine.Acumulador(tipo_operacao)
+        for bloco in blocos:
+            acumulador.adicionar(bloco)
+        return acumulador
+
+    def test_soma_sem_arredondar_entre_blocos(self):
+        blocos = [[1e16], [1.0], [1.0]]
+        self.assertEqual(self.acumular('soma', blocos).resultado(), engine.calcular('soma', [1e16, 1.0, 1.0]))
+        self.assertEqual(self.acumular('subtracao', [[0.0], *blocos]).resultado(), -1.0000000000000002e16)
+
+    def test_mesmo_resultado_de_calcular(self):
+        aleatorio = random.Random(7)
+        numeros = [aleatorio.uniform(-1, 1) * 10 ** aleatorio.randint(-12, 12) for _ in range(5000)]
+        for tipo_operacao in ('soma', 'subtracao', 'multiplicacao', 'divisao'):
+            blocos, inicio = [], 0
+            while inicio < len(numeros):
+                fim = inicio + aleatorio.randint(1, 700)
+                blocos.append(numeros[inicio:fim])
+                inicio = fim
+            with self.subTest(tipo_operacao=tipo_operacao):
+                with self.settings(CALCULADORA_NUMPY_LIMIAR=500):
+                    acumulador = self.acumular(tipo_operacao, blocos)
+                esperado = engine.calcular(tipo_operacao, engine.normalizar_numeros(numeros))
+                if tipo_operacao in engine.SOMAS_EXATAS:
+                    self.assertEqual(acumulador.resultado(), esperado)
+                else:
+                    self.assertAlmostEqual(acumulador.resultado(), esperado, delta=abs(esperado) * 1e-12)
+                self.assertEqual(acumulador.quantidade, len(numeros))
+
+    def test_digest_dos_numeros(self):
+        acumulador = self.acumular('soma', [[1, 2], [3.5]])
+        self.assertEqual(acumulador.digest, hashlib.sha256(struct.pack('<3d', 1, 2, 3.5)).hexdigest())
+
+    def test_divisao_por_zero_em_outro_bloco(self):
+        with self.assertRaises(engine.DivisaoPorZero):
+            self.acumular('divisao', [[8, 2], [0]])
+
+
+class CalcularStreamTest(CalculadoraTestCase):
+
+    def stream(self, tipo_operacao, corpo):
+        return self.cliente().generic(
+            'POST', f'/api/calc/calcular/stream/?tipo_operacao={tipo_operacao}', corpo,
+            content_type='application/x-ndjson'
+        )
+
+    def test_igual_a_calcular(self):
+        # Mais de um bloco de leitura (64 KiB) do corpo NDJSON
+        aleatorio = random.Random(3)
+        numeros = [round(aleatorio.uniform(-1000, 1000), 3) for _ in range(20000)]
+        corpo = '\n'.join(json.dumps(n) for n in numeros).encode()
+        self.assertGreater(len(corpo), 2 * parsers.TAMANHO_BLOCO_NDJSON)
+        for tipo_operacao in ('soma', 'subtracao'):
+            with self.subTest(tipo_operacao=tipo_operacao):
+                resposta = self.stream(tipo_operacao, corpo)
+                self.assertEqual(resposta.status_code, 201)
+                esperado = self.cliente().post(
+                    '/api/calc/calcular/', {'numeros': numeros, 'tipo_operacao': tipo_operacao}, format='json'
+                )
+                self.assertEqual(
+                    resposta.json()['operacao']['resultado_serializado'],
+                    esperado.json()['operacao']['resultado_serializado']
+                )
+
+    def test_linhas_e_listas(self):
+        resposta = self.stream('subtracao', b'100\n[1, 2]\n3')
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(resposta.json()['operacao']['resultado_serializado'], 94.0)
+        operacao = Operacao.objects.get(pk=resposta.json()['operacao']['id'])
+        self.assertEqual(operacao.quantidade_parametros, 4)
+        self.assertEqual(operacao.digest_parametros, hashlib.sha256(struct.pack('<4d', 100, 1, 2, 3)).hexdigest())
+
+    def test_erros(self):
+        self.assertEqual(self.stream('divisao', b'1\n2\n0\n').status_code, 400)
+        self.assertEqual(self.stream('soma', b'1\n{x').status_code, 400)
+        self.assertEqual(self.stream('soma', b'1').status_code, 400)
+        self.assertEqual(self.stream('potencia', b'1\n2').status_code, 400)
+        self.assertFalse(Operacao.objects.exists())
+
+
+class ParaleloTest(SimpleTestCase):
+
+    def test_unir_parciais_em_ordem(self):
+        # Trechos [100, 1, 2] e [3, 4]: o segundo reduzido por soma (JUNCAO)
+        self.assertEqual(paralelo.unir_parciais('subtracao', [97.0, 7.0]), 90.0)
+        self.assertEqual(paralelo.unir_parciais('divisao', [100.0, 4.0, 5.0]), 5.0)
+        self.assertEqual(paralelo.unir_parciais('multiplicacao', [2.0, 3.0, 4.0]), 24.0)
+
+    def test_produto_parcial_com_underflow_nao_e_divisao_por_zero(self):
+        self.assertEqual(paralelo.unir_parciais('divisao', [1.0, 0.0]), math.inf)
+        self.assertEqual(paralelo.unir_parciais('divisao', [-1.0, -0.0]), math.inf)
+        self.assertEqual(paralelo.unir_parciais('divisao', [-1.0, 0.0]), -math.inf)
+        self.assertEqual(paralelo.unir_parciais('divisao', [0.0, 0.0]), 0.0)
+        self.assertTrue(math.isnan(paralelo.unir_parciais('divisao', [math.nan, 0.0])))
+
+    @override_settings(CALCULADORA_PARALELO_PROCESSOS=2, CALCULADORA_PARALELO_LIMIAR=1000)
+    def test_mesmo_resultado_em_processos(self):
+        self.addCleanup(paralelo.encerrar_pool)
+        aleatorio = random.Random(11)
+        numeros = [aleatorio.uniform(0.5, 2) for _ in range(4001)]
+        for tipo_operacao in ('soma', 'subtracao', 'multiplicacao', 'divisao'):
+            with self.subTest(tipo_operacao=tipo_operacao):
+                normalizados = engine.normalizar_numeros(numeros)
+                esperado = engine.reduzir(tipo_operacao, normalizados)
+                with mock.patch.object(paralelo, 'calcular_paralelo', wraps=paralelo.calcular_paralelo) as espiao:
+                    resultado = engine.calcular(tipo_operacao, normalizados)
+                espiao.assert_called_once()
+                self.assertAlmostEqual(resultado, esperado, delta=abs(esperado) * 1e-9)
+
+        numeros[3000] = 0.0
+        with self.assertRaises(engine.DivisaoPorZero):
+            engine.calcular('divisao', engine.normalizar_numeros(numeros))
+
+    @override_settings(CALCULADORA_PARALELO_PROCESSOS=2, CALCULADORA_PARALELO_LIMIAR=1000)
+    def test_abaixo_do_limiar_sem_processos(self):
+        with mock.patch.object(paralelo, 'calcular_paralelo') as calcular_paralelo:
+            self.assertEqual(engine.calcular('soma', [1.0] * 999), 999.0)
+        calcular_paralelo.assert_not_called()
+
+
+class MemoizacaoTest(SimpleTestCase):
+
+    def setUp(self):
+        caches['resultados'].clear()
+        memoizacao.zerar_estatisticas()
+
+    def test_acerto_e_falha(self):
+        with mock.patch.object(engine, 'calcular', wraps=engine.calcular) as calcular:
+            self.assertEqual(memoizacao.calcular('soma', [1.0, 2.0]), 3.0)
+            self.assertEqual(memoizacao.calcular('soma', [1, 2]), 3.0)
+        calcular.assert_called_once()
+        self.assertEqual(memoizacao.estatisticas()['acertos'], 1)
+        self.assertEqual(memoizacao.estatisticas()['falhas'], 1)
+        self.assertEqual(memoizacao.estatisticas()['taxa_acerto'], 0.5)
+
+    def test_chave_por_operacao_e_numeros(self):
+        chave = memoizacao.chave_calculo('soma', [1.0, 2.0])
+        self.assertEqual(chave, memoizacao.chave_calculo('soma', array('d', [1, 2])))
+        self.assertNotEqual(chave, memoizacao.chave_calculo('subtracao', [1.0, 2.0]))
+        self.assertNotEqual(chave, memoizacao.chave_calculo('soma', [2.0, 1.0]))
+
+    def test_erros_nao_sao_guardados(self):
+        for _ in range(2):
+            with self.assertRaises(engine.DivisaoPorZero):
+                memoizacao.calcular('divisao', [1.0, 0.0])
+        self.assertEqual(len(caches['resultados']), 0)
+
+    @override_settings(CALCULADORA_CACHE_RESULTADOS='')
+    def test_desativado(self):
+        self.assertEqual(memoizacao.calcular('soma', [1.0, 2.0]), 3.0)
+        self.assertEqual(memoizacao.estatisticas()['falhas'], 0)
+
+
+class LRUBytesCacheTest(SimpleTestCase):
+
+    def test_despeja_o_menos_usado_pelo_tamanho(self):
+        cache = LRUBytesCache('teste', {'OPTIONS': {'MAX_BYTES': 700}})
+        for chave in ('a', 'b', 'c'):
+            cache.set(chave, 'x' * 100)
+        self.assertEqual(cache.get('a'), 'x' * 100)
+        cache.set('d', 'x' * 100)
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertLessEqual(cache.bytes_usados, 700)
+
+    def test_valor_maior_que_o_limite(self):
+        cache = LRUBytesCache('teste', {'OPTIONS': {'MAX_BYTES': 100}})
+        cache.set('a', 'x' * 1000)
+        self.assertIsNone(cache.get('a'))
+
+
+class ExpressaoTest(SimpleTestCase):
+
+    def test_precedencia_e_parenteses(self):
+        casos = {
+            '2 + 3 * 4': 14.0,
+            '2 + 3 × (4 - 1)': 11.0,
+            '(2 + 3) * 4': 20.0,
+            '10 - 4 - 3': 3.0,
+            '100 / 10 / 5': 2.0,
+            '8 ÷ 2 x 3': 12.0,
+            '-3 * -(2 + 1)': 9.0,
+            '+1.5e2 - .5': 149.5,
+        }
+        for texto, esperado in casos.items():
+            with self.subTest(texto=texto):
+                self.assertEqual(expressao.avaliar(texto), esperado)
+
+    def test_plano_reaproveitado_para_outros_numeros(self):
+        self.assertEqual(expressao.separar('2 + 3 * 4'), ('n+n*n', [2.0, 3.0, 4.0]))
+        expressao.compilar.cache_clear()
+        self.assertEqual(expressao.avaliar('2 + 3 * 4'), 14.0)
+        self.assertEqual(expressao.avaliar('7+1*2'), 9.0)
+        self.assertEqual(expressao.estatisticas()['falhas'], 1)
+        self.assertEqual(expressao.estatisticas()['acertos'], 1)
+
+    def test_expressoes_invalidas(self):
+        for texto in ('', '2 +', '(1 + 2', '1 + 2)', '2 3', '2 ** 3', 'import os', '1' * (expressao.TAMANHO_MAXIMO + 1)):
+            with self.subTest(texto=texto[:20]):
+                with self.assertRaises(expressao.ExpressaoInvalida):
+                    expressao.avaliar(texto)
+
+    def test_divisao_por_zero(self):
+        with self.assertRaises(engine.DivisaoPorZero):
+            expressao.avaliar('1 / (2 - 2)')
+
+
+class CalcularExpressaoApiTest(CalculadoraTestCase):
+    URL = '/api/calc/calcular/expressao/'
+
+    def test_avalia_sem_gravar(self):
+        resposta = self.cliente().post(self.URL, {'expressao': '2 + 3 × (4 - 1)'}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json(), {'expressao': '2 + 3 × (4 - 1)', 'resultado': 11.0})
+        self.assertFalse(Operacao.objects.exists())
+
+    def test_corpo_invalido(self):
+        for corpo in ({}, {'expressao': ''}, {'expressao': 2}, ['2 + 2'], '2 + 2', {'expressao': '1 / 0'}):
+            with self.subTest(corpo=corpo):
+                self.assertEqual(self.cliente().post(self.URL, corpo, format='json').status_code, 400)
+
+
+class FilaEscritaTest(CalculadoraTestCase):
+
+    def setUp(self):
+        self.diretorio = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.diretorio)
+
+    def nova_operacao(self, **kwargs):
+        campos = {
+            'usuario': self.usuario, 'tipo_operacao': 'soma', 'parametros': [1, 2],
+            'quantidade_parametros': 2, 'resultado': 3, 'data_criacao': timezone.now(),
+        }
+        return Operacao(**{**campos, **kwargs})
+
+    def nova_fila(self, **kwargs):
+        # Intervalo longo: nada é gravado pela thread, só por esvaziar/encerrar
+        fila = persistencia.FilaEscrita(self.diretorio, tamanho_lote=100, intervalo=60, **kwargs)
+        fila.iniciar()
+        self.addCleanup(fila.encerrar)
+        return fila
+
+    def journals(self):
+        return sorted(self.diretorio.glob('operacoes-*.journal'))
+
+    def test_journal_e_gravacao_no_encerramento(self):
+        fila = self.nova_fila()
+        for _ in range(3):
+            fila.enfileirar(self.nova_operacao())
+
+        journal, = self.journals()
+        self.assertEqual(len(journal.read_text().splitlines()), 3)
+        self.assertFalse(Operacao.objects.exists())
+
+        fila.encerrar()
+
+        self.assertEqual(Operacao.objects.count(), 3)
+        self.assertEqual(self.journals(), [])
+        self.assertEqual(fila.estatisticas()['linhas_gravadas'], 3)
+
+    def test_linha_que_nao_pode_ser_gravada_e_descartada(self):
+        fila = self.nova_fila()
+        fila.enfileirar(self.nova_operacao(resultado=1))
+        fila.enfileirar(self.nova_operacao(tipo_operacao=None))
+        fila.enfileirar(self.nova_operacao(resultado=2))
+
+        fila.esvaziar()
+
+        self.assertEqual(sorted(Operacao.objects.values_list('resultado', flat=True)), [1, 2])
+        self.assertEqual(fila.estatisticas()['linhas_descartadas'], 1)
+        self.assertEqual(fila.estatisticas()['profundidade'], 0)
+
+    def test_fsync(self):
+        for fsync, chamadas in ((True, 2), (False, 0)):
+            with self.subTest(fsync=fsync), mock.patch.object(persistencia.os, 'fsync') as os_fsync:
+                fila = self.nova_fila(fsync=fsync)
+                fila.enfileirar(self.nova_operacao())
+                fila.esvaziar()  # mais um fsync, do journal esvaziado
+                self.assertEqual(os_fsync.call_count, chamadas)
+
+    def test_journal_por_execucao(self):
+        self.nova_fila()
+        self.nova_fila()
+        primeiro, segundo = self.journals()
+        self.assertNotEqual(primeiro, segundo)
+        self.assertTrue(primeiro.name.startswith(f'operacoes-{os.getpid()}-'))
+
+    def escrever_journal(self, *linhas):
+        journal = self.diretorio / 'operacoes-1-abcd1234.journal'
+        journal.write_text(''.join(linhas), encoding='utf-8')
+        return journal
+
+    def test_recuperar_journal(self):
+        data_criacao = timezone.now() - timezone.timedelta(days=1)
+        operacoes = [self.nova_operacao(resultado=i, data_criacao=data_criacao) for i in range(1, 4)]
+        self.escrever_journal(
+            persistencia._para_journal(1, operacoes[0]),
+            persistencia._para_journal(2, operacoes[1]),
+            json.dumps({'commit': 1}) + '\n',
+            persistencia._para_journal(3, operacoes[2]),
+            '{"usuario_id": 1, "tipo_',  # queda no meio da escrita
+        )
+
+        with self.settings(CALCULADORA_WRITE_BEHIND_JOURNAL=str(self.diretorio)):
+            self.assertEqual(persistencia.recuperar_journals(), (2, 0))
+
+        self.assertEqual(sorted(Operacao.objects.values_list('resultado', flat=True)), [2, 3])
+        self.assertEqual(set(Operacao.objects.values_list('data_criacao', flat=True)), {data_criacao})
+        self.assertEqual(self.journals(), [])
+
+    def test_recuperar_journals_pelo_comando(self):
+        self.escrever_journal(persistencia._para_journal(1, self.nova_operacao()))
+        saida = io.StringIO()
+        with self.settings(CALCULADORA_WRITE_BEHIND_JOURNAL=str(self.diretorio)):
+            call_command('recuperar_journals', stdout=saida)
+        self.assertIn('1 operação(ões) recuperada(s)', saida.getvalue())
+        self.assertEqual(Operacao.objects.count(), 1)
+
+    def test_recuperacao_na_primeira_requisicao(self):
+        self.escrever_journal(persistencia._para_journal(1, self.nova_operacao()))
+        with self.settings(CALCULADORA_WRITE_BEHIND_JOURNAL=str(self.diretorio)), \
+                mock.patch.object(persistencia, '_recuperacao_iniciada', False), \
+                mock.patch.object(persistencia, 'threading') as threading:
+            self.cliente().get('/api/calc/historico/')
+            self.cliente().get('/api/calc/historico/')
+        threading.Thread.assert_called_once()
+        self.assertIs(threading.Thread.call_args.kwargs['target'], persistencia._recuperar_em_segundo_plano)
+
+    def test_sem_journals_nao_inicia_a_recuperacao(self):
+        with self.settings(CALCULADORA_WRITE_BEHIND_JOURNAL=str(self.diretorio)), \
+                mock.patch.object(persistencia, '_recuperacao_iniciada', False), \
+                mock.patch.object(persistencia, 'threading') as threading:
+            self.cliente().get('/api/calc/historico/')
+        threading.Thread.assert_not_called()
+
+
+@override_settings(CALCULADORA_WRITE_BEHIND=True)
+class CalcularWriteBehindTest(CalculadoraTestCase):
+
+    def test_resposta_antes_da_gravacao(self):
+        fila = mock.Mock()
+        with mock.patch.object(persistencia, 'obter_fila', return_value=fila):
+            resposta = self.cliente().post(
+                '/api/calc/calcular/', {'numeros': [1, 2], 'tipo_operacao': 'soma'}, format='json'
+            )
+        self.assertEqual(resposta.status_code, 202)
+        operacao, = fila.enfileirar.call_args.args
+        self.assertEqual((operacao.tipo_operacao, operacao.resultado), ('soma', 3.0))
+        self.assertIsNotNone(operacao.data_criacao)
+        self.assertFalse(Operacao.objects.exists())
+
+    def test_resultado_fora_do_intervalo_nao_entra_na_fila(self):
+        with mock.patch.object(persistencia, 'obter_fila') as obter_fila:
+            resposta = self.cliente().post(
+                '/api/calc/calcular/', {'numeros': [1e300, 1e300], 'tipo_operacao': 'multiplicacao'}, format='json'
+            )
+        self.assertEqual(resposta.status_code, 400)
+        obter_fila.assert_not_called()
+
+
+class ViewsAsyncTest(CalculadoraTestCase):
+
+    def cliente_async(self, usuario=None):
+        token = AccessToken.for_user(usuario or self.usuario)
+        return Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_calcular(self):
+        with mock.patch.object(memoizacao, 'calcular', wraps=memoizacao.calcular) as calcular:
+            resposta = self.cliente_async().post(
+                '/api/calc/async/calcular/', {'numeros': [1, 2, 3], 'tipo_operacao': 'soma'},
+                content_type='application/json'
+            )
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(resposta.json()['operacao']['resultado_serializado'], 6.0)
+        calcular.assert_called_once_with('soma', [1.0, 2.0, 3.0])
+        self.assertEqual(Operacao.objects.get().usuario, self.usuario)
+
+    def test_calcular_sem_token(self):
+        resposta = Client().post(
+            '/api/calc/async/calcular/', {'numeros': [1, 2], 'tipo_operacao': 'soma'},
+            content_type='application/json'
+        )
+        self.assertEqual(resposta.status_code, 401)
+
+    def test_calcular_fora_do_loop(self):
+        # O cálculo e o journal não podem rodar dentro do event loop
+        no_loop = []
+
+        def registrar(*args):
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                no_loop.append(False)
+            else:
+                no_loop.append(True)
+            return 3
+
+        fila = mock.Mock()
+        fila.enfileirar.side_effect = registrar
+        with self.settings(CALCULADORA_WRITE_BEHIND=True), \
+                mock.patch.object(memoizacao, 'calcular', side_effect=registrar), \
+                mock.patch.object(persistencia, 'obter_fila', return_value=fila):
+            resposta = self.cliente_async().post(
+                '/api/calc/async/calcular/', {'numeros': [1, 2], 'tipo_operacao': 'soma'},
+                content_type='application/json'
+            )
+        self.assertEqual(resposta.status_code, 202)
+        fila.enfileirar.assert_called_once()
+        self.assertEqual(no_loop, [False, False])
+
+    def test_historico_igual_ao_sincrono(self):
+        for i in range(12):
+            self.criar_operacao(parametros=(i, 1), resultado=i + 1)
+        self.criar_operacao(usuario=self.outro_usuario)
+
+        for parametros in ('', '?page=2', '?page_size=5&page=3', '?page_size=500', '?page=abc'):
+            with self.subTest(parametros=parametros):
+                sincrono = self.cliente().get('/api/calc/historico/' + parametros)
+                assincrono = self.cliente_async().get('/api/calc/async/historico/' + parametros)
+                self.assertEqual(assincrono.status_code, sincrono.status_code)
+                dados = assincrono.json()
+                esperado = sincrono.json()
+                for link in ('next', 'previous'):
+                    if esperado.get(link):
+                        esperado[link] = esperado[link].replace('/api/calc/historico/', '/api/calc/async/historico/')
+                self.assertEqual(dados, esperado)
+
+    def test_pagina_invalida(self):
+        self.criar_operacao()
+        resposta = self.cliente_async().get('/api/calc/async/historico/?page=2')
+        self.assertEqual(resposta.status_code, 404)
+        self.assertEqual(resposta.json(), self.cliente().get('/api/calc/historico/?page=2').json())
+
+    def test_detalhe_e_remocao(self):
+        operacao = self.criar_operacao()
+        alheia = self.criar_operacao(usuario=self.outro_usuario)
+        cliente = self.cliente_async()
+
+        self.assertEqual(cliente.get(f'/api/calc/async/operacao/{operacao.pk}/').json()['id'], operacao.pk)
+        self.assertEqual(cliente.get(f'/api/calc/async/operacao/{alheia.pk}/').status_code, 404)
+        self.assertEqual(cliente.delete(f'/api/calc/async/operacao/{alheia.pk}/deletar/').status_code, 404)
+        self.assertEqual(cliente.delete(f'/api/calc/async/operacao/{operacao.pk}/deletar/').status_code, 200)
+        self.assertEqual(list(Operacao.objects.values_list('pk', flat=True)), [alheia.pk])
+
+
+class RenderersTest(CalculadoraTestCase):
+    DADOS = {
+        'decimal': decimal.Decimal('1.50'),
+        'data_hora': datetime.datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=datetime.timezone.utc),
+        'data': datetime.date(2024, 5, 6),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'texto': 'ação',
+        'lista': [1, 2.5, None, True],
+    }
+
+    def drf(self, dados):
+        return json.loads(JSONRenderer().render(dados))
+
+    def test_mesmo_json_do_drf(self):
+        self.assertEqual(json.loads(renderers.JSONRapidoRenderer().render(self.DADOS)), self.drf(self.DADOS))
+
+    def test_pagina_do_historico_igual_a_do_drf(self):
+        for i in range(3):
+            self.criar_operacao(parametros=(i, 0.1), resultado=i + 0.1)
+        linhas = OperacaoListaSerializer.consulta(Operacao.objects.all())
+        dados = OperacaoListaSerializer(linhas, self.usuario).data
+        self.assertEqual(json.loads(renderers.JSONRapidoRenderer().render(dados)), self.drf(dados))
+
+    def test_sem_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(
+                renderers.JSONRapidoRenderer().render(self.DADOS), JSONRenderer().render(self.DADOS)
+            )
+
+    def test_indentacao_fica_com_o_drf(self):
+        corpo = renderers.JSONRapidoRenderer().render(self.DADOS, 'application/json; indent=2')
+        self.assertEqual(corpo, JSONRenderer().render(self.DADOS, 'application/json; indent=2'))
+        self.assertIn(b'\n  "decimal"', corpo)
+
+    def test_none_vira_corpo_vazio(self):
+        self.assertEqual(renderers.JSONRapidoRenderer().render(None), b'')
+
+    def test_resposta_da_api(self):
+        self.criar_operacao(resultado=decimal.Decimal('3.25'))
+        resposta = self.cliente().get('/api/calc/historico/')
+        self.assertEqual(resposta.json()['results'][0]['resultado_serializado'], 3.25)
+
+    @skipUnless(renderers.msgpack, 'msgpack não instalado')
+    def test_messagepack(self):
+        corpo = renderers.MessagePackRenderer().render(self.DADOS)
+        self.assertEqual(
+            kogui_parsers.MessagePackParser().parse(io.BytesIO(corpo)),
+            {**self.drf(self.DADOS), 'data_hora': '2024-05-06T07:08:09.123456Z'}
+        )
+
+    def test_messagepack_sem_o_pacote(self):
+        with mock.patch.object(renderers, 'msgpack', None), self.assertRaises(ImproperlyConfigured):
+            renderers.MessagePackRenderer().render({})
+
+
+class ParsersTest(SimpleTestCase):
+
+    def test_json(self):
+        for orjson in (kogui_parsers.orjson, None):
+            with self.subTest(orjson=orjson is not None), mock.patch.object(kogui_parsers, 'orjson', orjson):
+                corpo = io.BytesIO('{"numeros": [1, 2.5], "texto": "ação"}'.encode())
+                self.assertEqual(
+                    kogui_parsers.JSONRapidoParser().parse(corpo, 'application/json', {}),
+                    {'numeros': [1, 2.5], 'texto': 'ação'}
+                )
+
+    def test_json_invalido(self):
+        for orjson in (kogui_parsers.orjson, None):
+            with self.subTest(orjson=orjson is not None), mock.patch.object(kogui_parsers, 'orjson', orjson):
+                with self.assertRaises(ParseError):
+                    kogui_parsers.JSONRapidoParser().parse(io.BytesIO(b'{"numeros": ['), 'application/json', {})
+
+    def test_loads(self):
+        self.assertEqual(kogui_parsers.loads(b'[1, 2]'), [1, 2])
+        with self.assertRaises(ValueError):
+            kogui_parsers.loads(b'[1, ')
+
+    @skipUnless(renderers.msgpack, 'msgpack não instalado')
+    def test_messagepack_invalido(self):
+        with self.assertRaises(ParseError):
+            kogui_parsers.MessagePackParser().parse(io.BytesIO(b'\xc1'))
+
+
+class CacheHistoricoTest(CalculadoraTestCase):
+    URL = '/api/calc/historico/'
+
+    def setUp(self):
+        # As versões recomeçam a cada teste: páginas de outro teste teriam a mesma chave
+        caches['historico'].clear()
+        cache_historico.zerar_estatisticas()
+        self.operacao = self.criar_operacao()
+
+    def ids(self, usuario=None):
+        return [linha['id'] for linha in self.cliente(usuario).get(self.URL).json()['results']]
+
+    def test_segunda_leitura_vem_do_cache(self):
+        primeira = self.cliente().get(self.URL).json()
+        with mock.patch.object(OperacaoListaSerializer, 'consulta') as consulta:
+            self.assertEqual(self.cliente().get(self.URL).json(), primeira)
+        consulta.assert_not_called()
+        self.assertEqual(cache_historico.estatisticas(), {'acertos': 1, 'falhas': 1, 'taxa_acerto': 0.5})
+
+    def test_parametros_diferentes_sao_outra_pagina(self):
+        self.cliente().get(self.URL)
+        self.cliente().get(self.URL, {'page_size': 5})
+        self.assertEqual(cache_historico.estatisticas()['acertos'], 0)
+
+    def test_escritas_invalidam(self):
+        nova = self.criar_operacao(resultado=4)
+        escritas = {
+            'calcular': lambda: self.cliente().post(
+                '/api/calc/calcular/', {'numeros': [1, 1], 'tipo_operacao': 'soma'}, format='json'
+            ),
+            'criar': lambda: self.criar_operacao(resultado=5),
+            'deletar': lambda: self.cliente().delete(f'/api/calc/operacao/{nova.pk}/deletar/'),
+            'remover_ids': lambda: Operacao.objects.remover_ids(self.usuario, [self.operacao.pk]),
+            'limpar': lambda: self.cliente().delete('/api/calc/limpar_historico/'),
+        }
+        for nome, escrever in escritas.items():
+            with self.subTest(nome):
+                self.ids()
+                escrever()
+                esperados = list(
+                    Operacao.objects.do_usuario(self.usuario).order_by('-data_criacao', '-id').values_list('pk', flat=True)
+                )
+                self.assertEqual(self.ids(), esperados)
+
+    def test_escrita_de_outro_usuario_nao_invalida(self):
+        self.ids()
+        self.criar_operacao(usuario=self.outro_usuario)
+        self.assertEqual(self.ids(), [self.operacao.pk])
+        self.assertEqual(cache_historico.estatisticas()['acertos'], 1)
+
+    def test_usuarios_nao_compartilham_paginas(self):
+        alheia = self.criar_operacao(usuario=self.outro_usuario)
+        self.assertEqual(self.ids(), [self.operacao.pk])
+        self.assertEqual(self.ids(self.outro_usuario), [alheia.pk])
+
+    @override_settings(CALCULADORA_CACHE_HISTORICO='')
+    def test_desativado(self):
+        self.ids()
+        self.ids()
+        self.assertEqual(cache_historico.estatisticas()['acertos'] + cache_historico.estatisticas()['falhas'], 0)
+
+
+class ContadorAcertosTest(SimpleTestCase):
+
+    def test_contagem(self):
+        contador = ContadorAcertos()
+        self.assertEqual(contador.dados(), {'acertos': 0, 'falhas': 0, 'taxa_acerto': None})
+        for acerto in (True, True, False):
+            contador.contar(acerto)
+        self.assertEqual(contador.dados(), {'acertos': 2, 'falhas': 1, 'taxa_acerto': 0.6667})
+        contador.zerar()
+        self.assertEqual(contador.dados()['acertos'], 0)
+
+
+class ETagTest(CalculadoraTestCase):
+    URL = '/api/calc/historico/'
+
+    def setUp(self):
+        caches['historico'].clear()
+        self.operacao = self.criar_operacao()
+
+    def test_cabecalhos(self):
+        resposta = self.cliente().get(self.URL)
+        self.assertRegex(resposta['ETag'], r'^"[0-9a-f]{32}"$')
+        self.assertEqual(set(resposta['Cache-Control'].split(', ')), {'private', 'no-cache'})
+        self.assertIn('Authorization', resposta['Vary'])
+
+    def test_304_sem_consultar_as_operacoes(self):
+        etag = self.cliente().get(self.URL)['ETag']
+        for enviada in (etag, f'W/{etag}', f'"outra", {etag}', '*'):
+            with self.subTest(enviada), mock.patch.object(OperacaoListaSerializer, 'consulta') as consulta:
+                resposta = self.cliente().get(self.URL, HTTP_IF_NONE_MATCH=enviada)
+                self.assertEqual(resposta.status_code, 304)
+                self.assertEqual(resposta.content, b'')
+                self.assertEqual(resposta['ETag'], etag)
+                consulta.assert_not_called()
+
+    def test_etag_muda_com_o_historico(self):
+        etag = self.cliente().get(self.URL)['ETag']
+        self.criar_operacao(resultado=4)
+        resposta = self.cliente().get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta['ETag'], etag)
+        self.assertEqual(len(resposta.json()['results']), 2)
+
+    def test_etag_por_url_usuario_e_formato(self):
+        etag = self.cliente().get(self.URL)['ETag']
+        outras = [
+            self.cliente().get(self.URL, {'page_size': 5})['ETag'],
+            self.cliente(self.outro_usuario).get(self.URL)['ETag'],
+            self.cliente().get(self.URL, HTTP_ACCEPT='application/json; indent=2')['ETag'],
+        ]
+        self.assertNotIn(etag, outras)
+        self.assertEqual(len(set(outras)), 3)
+
+    def test_detalhe(self):
+        url = f'/api/calc/operacao/{self.operacao.pk}/'
+        etag = self.cliente().get(url)['ETag']
+        self.assertEqual(self.cliente().get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.criar_operacao(usuario=self.outro_usuario)
+        self.assertEqual(self.cliente().get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.criar_operacao()
+        self.assertEqual(self.cliente().get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_async(self):
+        cliente = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.usuario)}')
+        for url in ('/api/calc/async/historico/', f'/api/calc/async/operacao/{self.operacao.pk}/'):
+            with self.subTest(url):
+                etag = cliente.get(url)['ETag']
+                self.assertEqual(cliente.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+                self.criar_operacao()
+                self.assertEqual(cliente.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SinaisEventosTest(CalculadoraTestCase):
+
+    def publicados(self, acao):
+        with mock.patch.object(eventos, 'publicar') as publicar, self.captureOnCommitCallbacks(execute=True):
+            acao()
+        return [chamada.args for chamada in publicar.call_args_list]
+
+    def test_criacao(self):
+        publicados = self.publicados(lambda: self.criar_operacao())
+        self.assertEqual(publicados, [(self.usuario.pk, eventos.CRIADAS, [Operacao.objects.get().pk])])
+
+    def test_bulk_create_agrupa_por_usuario(self):
+        publicados = self.publicados(lambda: Operacao.objects.bulk_create([
+            Operacao(usuario=usuario, tipo_operacao='soma', parametros=[1, 2], quantidade_parametros=2, resultado=3)
+            for usuario in (self.usuario, self.outro_usuario, self.usuario)
+        ]))
+        self.assertEqual(
+            sorted((usuario_id, tipo, len(ids)) for usuario_id, tipo, ids in publicados),
+            sorted([(self.usuario.pk, eventos.CRIADAS, 2), (self.outro_usuario.pk, eventos.CRIADAS, 1)])
+        )
+
+    def test_remocoes(self):
+        operacoes = [self.criar_operacao() for _ in range(3)]
+        remocoes = {
+            'delete': lambda: operacoes[0].delete(),
+            'queryset': lambda: Operacao.objects.filter(pk=operacoes[1].pk).delete(),
+            'remover_ids': lambda: Operacao.objects.remover_ids(self.usuario, [operacoes[2].pk]),
+        }
+        for (nome, remover), pk in zip(remocoes.items(), [operacao.pk for operacao in operacoes]):
+            with self.subTest(nome):
+                self.assertEqual(self.publicados(remover), [(self.usuario.pk, eventos.REMOVIDAS, [pk])])
+
+    def test_limpeza(self):
+        self.criar_operacao()
+        publicados = self.publicados(lambda: Operacao.objects.limpar_historico(self.usuario))
+        self.assertEqual(publicados, [(self.usuario.pk, eventos.LIMPO)])
+
+    def test_nada_e_publicado_sem_commit(self):
+        def criar_e_desfazer():
+            with transaction.atomic():
+                self.criar_operacao()
+                transaction.set_rollback(True)
+
+        self.assertEqual(self.publicados(criar_e_desfazer), [])
+
+    def test_falha_do_broker_nao_interrompe_a_gravacao(self):
+        broker = mock.Mock()
+        broker.publicar.side_effect = ConnectionError
+        with mock.patch.object(eventos, 'obter_broker', return_value=broker), \
+                self.assertLogs('calculadora.eventos', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+            self.criar_operacao()
+        broker.publicar.assert_called_once()
+        self.assertEqual(Operacao.objects.count(), 1)
+
+    def test_eventos_exigem_asgi(self):
+        token = AccessToken.for_user(self.usuario)
+        resposta = Client(HTTP_AUTHORIZATION=f'Bearer {token}').get('/api/calc/async/eventos/')
+        self.assertEqual(resposta.status_code, 501)
+
+
+class DifusorTest(SimpleTestCase):
+
+    def setUp(self):
+        self.difusor = eventos.Difusor()
+        self.broker = eventos.BrokerLocal()
+        self.broker.iniciar(self.difusor)
+
+    def publicar(self, usuario_id, tipo=eventos.CRIADAS, ids=(1,)):
+        self.broker.publicar({'usuario': usuario_id, 'tipo': tipo, 'ids': list(ids)})
+
+    def test_entrega_so_ao_usuario(self):
+        async def cenario():
+            ana, bruno = self.difusor.assinar(1, 10), self.difusor.assinar(2, 10)
+            self.publicar(1, ids=[7, 8])
+            self.assertEqual(await ana.proximo(1), {'tipo': eventos.CRIADAS, 'ids': [7, 8]})
+            self.assertIsNone(await bruno.proximo(0.01))
+            self.assertEqual(self.difusor.estatisticas()['conexoes'], 2)
+            ana.cancelar()
+            bruno.cancelar()
+
+        asyncio.run(cenario())
+        self.assertEqual(self.difusor.estatisticas(), {
+            'usuarios': 0, 'conexoes': 0, 'eventos_entregues': 1, 'filas_descartadas': 0,
+        })
+
+    def test_cliente_lento_recebe_recarregar(self):
+        async def cenario():
+            assinatura = self.difusor.assinar(1, 2)
+            for i in range(3):
+                self.publicar(1, ids=[i])
+            await asyncio.sleep(0)
+            self.assertEqual(await assinatura.proximo(1), {'tipo': eventos.RECARREGAR})
+            self.assertIsNone(await assinatura.proximo(0.01))
+            self.publicar(1, ids=[9])
+            self.assertEqual(await assinatura.proximo(1), {'tipo': eventos.CRIADAS, 'ids': [9]})
+
+        asyncio.run(cenario())
+        self.assertEqual(self.difusor.estatisticas()['filas_descartadas'], 1)
+
+    @override_settings(CALCULADORA_EVENTOS_HEARTBEAT=0.01)
+    def test_fluxo(self):
+        async def cenario():
+            assinatura = self.difusor.assinar(1, 10)
+            fluxo = eventos.fluxo(assinatura)
+            partes = [await fluxo.__anext__()]
+            self.publicar(1, eventos.REMOVIDAS, [3])
+            partes.append(await fluxo.__anext__())
+            partes.append(await fluxo.__anext__())
+            await fluxo.aclose()
+            return partes
+
+        self.assertEqual(asyncio.run(cenario()), [
+            f'retry: {eventos.RECONEXAO_MS}\n\n',
+            'event: removidas\ndata: {"ids": [3]}\n\n',
+            ': keepalive\n\n',
+        ])
+        self.assertEqual(self.difusor.estatisticas()['conexoes'], 0)
+
+
+class AceitaGzipTest(SimpleTestCase):
+
+    def test_q_values(self):
+        casos = {
+            '': False,
+            'gzip': True,
+            'GZIP, deflate': True,
+            'deflate, gzip;q=0.5': True,
+            'gzip;q=0': False,
+            'gzip; q=0.0, deflate': False,
+            'br;q=1.0, gzip;q=0.001': True,
+            '*': True,
+            '*;q=0': False,
+            'gzip;q=0, *': False,
+            'identity, *;q=0.1': True,
+            'x-gzip': True,
+            'gzip;q=abc': False,
+            'deflate, br': False,
+            'gzipped': False,
+        }
+        fabrica = RequestFactory()
+        for cabecalho, esperado in casos.items():
+            with self.subTest(cabecalho):
+                self.assertIs(aceita_gzip(fabrica.get('/', HTTP_ACCEPT_ENCODING=cabecalho)), esperado)
+
+
+class ExportacaoTest(CalculadoraTestCase):
+    URL = '/api/calc/historico/exportar/'
+
+    def setUp(self):
+        self.operacoes = [
+            self.criar_operacao(parametros=(i, 0.5, 2), resultado=i + 2.5) for i in range(5)
+        ]
+        self.criar_operacao(usuario=self.outro_usuario)
+
+    def exportar(self, **kwargs):
+        resposta = self.cliente().get(self.URL, **kwargs)
+        self.assertEqual(resposta.status_code, 200)
+        corpo = b''.join(resposta.streaming_content)
+        if resposta.get('Content-Encoding') == 'gzip':
+            corpo = gzip.decompress(corpo)
+        return resposta, corpo.decode()
+
+    def esperado(self):
+        linhas = OperacaoListaSerializer.consulta(
+            Operacao.objects.do_usuario(self.usuario).order_by('-data_criacao', '-id')
+        )
+        return json.loads(JSONRenderer().render(OperacaoListaSerializer(linhas, self.usuario).data))
+
+    @override_settings(CALCULADORA_EXPORTACAO_LOTE=2)
+    def test_csv(self):
+        resposta, corpo = self.exportar()
+        self.assertEqual(resposta['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(resposta['Content-Disposition'], 'attachment; filename="historico.csv"')
+        linhas = list(csv.DictReader(io.StringIO(corpo)))
+        self.assertEqual(list(linhas[0]), list(exportacao.COLUNAS_CSV))
+        self.assertEqual(
+            [(int(linha['id']), linha['parametros'], float(linha['resultado_serializado'])) for linha in linhas],
+            [(item['id'], item['parametros'], item['resultado_serializado']) for item in self.esperado()]
+        )
+
+    @override_settings(CALCULADORA_EXPORTACAO_LOTE=2)
+    def test_ndjson(self):
+        resposta, corpo = self.exportar(data={'formato': 'ndjson'})
+        self.assertEqual(resposta['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(linha) for linha in corpo.splitlines()], self.esperado())
+
+    def test_gzip(self):
+        _, sem_gzip = self.exportar()
+        for cabecalho, comprimida in (('gzip, deflate', True), ('gzip;q=0, deflate', False), ('*;q=0', False)):
+            with self.subTest(cabecalho):
+                resposta, corpo = self.exportar(HTTP_ACCEPT_ENCODING=cabecalho)
+                self.assertEqual(resposta.get('Content-Encoding') == 'gzip', comprimida)
+                self.assertIn('Accept-Encoding', resposta['Vary'])
+                self.assertEqual(corpo, sem_gzip)
+
+    def test_filtros(self):
+        self.criar_operacao(parametros=(1, 2, 3, 4), resultado=10)
+        _, corpo = self.exportar(data={'formato': 'ndjson', 'min_operandos': 4})
+        self.assertEqual([json.loads(linha)['resultado_serializado'] for linha in corpo.splitlines()], [10.0])
+
+    def test_erros(self):
+        self.assertEqual(self.cliente().get(self.URL, {'formato': 'xml'}).status_code, 400)
+        self.assertEqual(self.cliente().get(self.URL, {'min_operandos': 'x'}).status_code, 400)
+
+    def test_historico_vazio(self):
+        Operacao.objects.do_usuario(self.usuario).delete()
+        _, corpo = self.exportar()
+        self.assertEqual(corpo.strip(), ','.join(exportacao.COLUNAS_CSV))
+
+
+class ImportacaoTest(CalculadoraTestCase):
+    URL = '/api/calc/importar/'
+
+    def importar(self, corpo, content_type='text/csv', parametros='', **kwargs):
+        resposta = self.cliente(self.outro_usuario).post(
+            self.URL + parametros, data=corpo, content_type=content_type, **kwargs
+        )
+        self.assertEqual(resposta.status_code, 200)
+        corpo = b''.join(resposta.streaming_content)
+        if resposta.get('Content-Encoding') == 'gzip':
+            corpo = gzip.decompress(corpo)
+        return [json.loads(linha) for linha in corpo.splitlines()]
+
+    def historico(self, usuario):
+        return [
+            (operacao.tipo_operacao, list(operacao.parametros), operacao.resultado, operacao.data_criacao)
+            for operacao in Operacao.objects.do_usuario(usuario).order_by('data_criacao', 'id')
+        ]
+
+    def test_ida_e_volta(self):
+        agora = timezone.now()
+        for i, tipo_operacao in enumerate(('soma', 'subtracao', 'multiplicacao', 'divisao')):
+            self.criar_operacao(
+                tipo_operacao=tipo_operacao, parametros=(i + 1, 0.25, 2),
+                resultado=engine.calcular(tipo_operacao, [i + 1, 0.25, 2]),
+                data_criacao=agora - timezone.timedelta(minutes=i),
+            )
+        for formato, content_type in (('csv', 'text/csv'), ('ndjson', 'application/x-ndjson')):
+            with self.subTest(formato), transaction.atomic():
+                exportado = b''.join(
+                    self.cliente().get('/api/calc/historico/exportar/', {'formato': formato}).streaming_content
+                )
+                final = self.importar(exportado, content_type)[-1]
+                self.assertEqual((final['concluido'], final['importadas'], final['erros']), (True, 4, 0))
+                self.assertEqual(self.historico(self.outro_usuario), self.historico(self.usuario))
+                transaction.set_rollback(True)
+
+    def test_quebra_de_linha_entre_aspas(self):
+        corpo = (
+            'tipo_operacao,numeros,observacao\r\n'
+            'soma,"[1,\n2]","primeira\nlinha"\r\n'
+            '\r\n'
+            'multiplicacao,"[3, 4]",ok\r\n'
+            'soma,[1],"curta\r\ndemais"\r\n'
+            'divisao,"[8, 2]",\r\n'
+        ).encode()
+        final = self.importar(corpo)[-1]
+        self.assertEqual((final['registros'], final['importadas'], final['erros']), (4, 3, 1))
+        self.assertEqual(
+            [(t, p) for t, p, _, _ in self.historico(self.outro_usuario)],
+            [('soma', [1.0, 2.0]), ('multiplicacao', [3.0, 4.0]), ('divisao', [8.0, 2.0])]
+        )
+
+    def test_registros_invalidos_sao_informados(self):
+        corpo = b'tipo_operacao,numeros\nsoma,"[1, 2]"\npotencia,"[1, 2]"\nsoma,"[1, 2]",extra\ndivisao,"[1, 0]"\n'
+        linhas = self.importar(corpo, parametros='?simular=true')
+        self.assertEqual(
+            [erro['registro'] for erro in linhas[0]['erros_bloco']], [2, 3, 4]
+        )
+        self.assertEqual(linhas[-1], {'concluido': True, 'registros': 4, 'importadas': 1, 'erros': 3, 'simulacao': True})
+        self.assertFalse(Operacao.objects.exists())
+
+    def test_bom_e_cabecalho(self):
+        final = self.importar('﻿tipo_operacao,numeros\nsoma,"[1, 2]"\n'.encode())[-1]
+        self.assertEqual(final['importadas'], 1)
+        resposta = self.cliente().post(self.URL, data=b'a,b\n1,2\n', content_type='text/csv')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(self.cliente().post(self.URL, data=b'', content_type='text/csv').status_code, 400)
+
+    @override_settings(CALCULADORA_IMPORTACAO_LOTE=2)
+    def test_retomar(self):
+        corpo = ''.join(
+            json.dumps({'tipo_operacao': 'soma', 'numeros': [i, 1]}) + '\n' for i in range(5)
+        ).encode()
+        linhas = self.importar(corpo, 'application/x-ndjson', '?pular=2')
+        self.assertEqual([linha.get('registros') for linha in linhas], [4, 5, 5])
+        self.assertEqual(
+            [p for _, p, _, _ in self.historico(self.outro_usuario)], [[2.0, 1.0], [3.0, 1.0], [4.0, 1.0]]
+        )
+
+    def test_gzip(self):
+        corpo = gzip.compress(b'tipo_operacao,numeros\nsoma,"[1, 2]"\n')
+        for cabecalho, comprimida in (('gzip', True), ('gzip;q=0', False)):
+            with self.subTest(cabecalho):
+                resposta = self.cliente(self.outro_usuario).post(
+                    self.URL, data=corpo, content_type='text/csv',
+                    HTTP_CONTENT_ENCODING='gzip', HTTP_ACCEPT_ENCODING=cabecalho
+                )
+                self.assertEqual(resposta.get('Content-Encoding') == 'gzip', comprimida)
+                b''.join(resposta.streaming_content)
+        self.assertEqual(Operacao.objects.filter(usuario=self.outro_usuario).count(), 2)
+
+    def test_arquivo_enviado(self):
+        arquivo = SimpleUploadedFile('historico.csv', b'tipo_operacao,parametros\nsoma,"[1.5, 2]"\n')
+        resposta = self.cliente().post(self.URL, {'arquivo': arquivo}, format='multipart')
+        self.assertEqual(json.loads(b''.join(resposta.streaming_content).splitlines()[-1])['importadas'], 1)
+
+    def test_comando(self):
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv.gz', delete=False) as arquivo:
+            arquivo.write(gzip.compress(b'tipo_operacao,numeros\nsoma,"[1,\n2]"\nsoma,x\n'))
+        self.addCleanup(os.remove, arquivo.name)
+        saida, erros = io.StringIO(), io.StringIO()
+        call_command('importar_operacoes', arquivo.name, usuario=self.usuario.email, stdout=saida, stderr=erros)
+        self.assertIn('Concluído: 1 registro(s) importado(s), 1 erro(s).', saida.getvalue())
+        self.assertIn('registro 2:', erros.getvalue())
+
+
+class AgregadosTest(CalculadoraTestCase):
+    TIPOS = ('soma', 'subtracao', 'multiplicacao', 'divisao')
+
+    def setUp(self):
+        self.agora = timezone.now()
+        self.criar_operacoes(40, self.agora - timezone.timedelta(days=2))
+
+    def criar_operacoes(self, quantidade, inicio, usuario=None):
+        for i in range(quantidade):
+            self.criar_operacao(
+                usuario=usuario or (self.usuario if i % 3 else self.outro_usuario),
+                tipo_operacao=self.TIPOS[i % 4], resultado=decimal.Decimal(i * 125 - 1000) / 100,
+                data_criacao=inicio + timezone.timedelta(minutes=37 * i),
+            )
+
+    def esperado(self, granularidade):
+        """O mesmo ``GROUP BY`` que os agregados evitam, feito em Python."""
+        intervalos = {}
+        for tipo, resultado, data in Operacao.objects.values_list('tipo_operacao', 'resultado', 'data_criacao'):
+            inicio = agregados.inicio_intervalo(data, granularidade)
+            intervalo = intervalos.setdefault(inicio, {'quantidade': 0, 'soma': 0, 'valores': [], 'por_tipo': {}})
+            intervalo['quantidade'] += 1
+            intervalo['soma'] += resultado
+            intervalo['valores'].append(resultado)
+            intervalo['por_tipo'][tipo] = intervalo['por_tipo'].get(tipo, 0) + 1
+        return [
+            (inicio, i['quantidade'], float(i['soma']), float(min(i['valores'])), float(max(i['valores'])), i['por_tipo'])
+            for inicio, i in sorted(intervalos.items())
+        ]
+
+    def consultar(self, granularidade, tipo_operacao=None):
+        dados = agregados.consultar(
+            granularidade, self.agora - timezone.timedelta(days=5), self.agora + timezone.timedelta(days=1), tipo_operacao
+        )
+        intervalos = [
+            (i['inicio'], i['quantidade'], i['soma_resultados'], i['minimo'], i['maximo'], i['por_tipo'])
+            for i in dados['intervalos']
+        ]
+        return dados, intervalos
+
+    def test_igual_ao_group_by(self):
+        self.assertEqual(agregados.agregar(tamanho=7, pausa=0), 40)
+        for granularidade in (agregados.MINUTO, agregados.HORA, agregados.DIA):
+            with self.subTest(granularidade):
+                dados, intervalos = self.consultar(granularidade)
+                self.assertEqual(intervalos, self.esperado(granularidade))
+                self.assertEqual(dados['total'], 40)
+                self.assertEqual(dados['por_tipo'], {tipo: 10 for tipo in self.TIPOS})
+                self.assertEqual(sum(f['quantidade'] for f in dados['distribuicao']), 40)
+
+    def test_filtro_por_tipo(self):
+        agregados.agregar(pausa=0)
+        dados, intervalos = self.consultar(agregados.DIA, 'divisao')
+        self.assertEqual(dados['por_tipo'], {'divisao': 10})
+        self.assertEqual({tuple(i[5]) for i in intervalos}, {('divisao',)})
+
+    def test_incremental(self):
+        agregados.agregar(pausa=0)
+        marca = MarcaAgregacao.objects.get(nome=agregados.MARCA).ultimo_id
+        self.assertEqual(marca, Operacao.objects.order_by('-id').first().pk)
+        self.assertEqual(agregados.agregar(pausa=0), 0)
+
+        self.criar_operacoes(5, self.agora - timezone.timedelta(hours=3))
+        with mock.patch.object(agregados, '_acumular', wraps=agregados._acumular) as acumular:
+            self.assertEqual(agregados.agregar(pausa=0), 5)
+        self.assertEqual(len(acumular.call_args.args[0]), 5)
+        self.assertEqual(self.consultar(agregados.HORA)[1], self.esperado(agregados.HORA))
+
+    def test_remocoes_nao_alteram(self):
+        agregados.agregar(pausa=0)
+        antes = self.consultar(agregados.DIA)[1]
+        Operacao.objects.limpar_historico(self.usuario)
+        Expurgo(pausa=0).processar()
+        Operacao.objects.filter(usuario=self.outro_usuario)[:1].get().delete()
+        agregados.agregar(pausa=0)
+        self.assertEqual(self.consultar(agregados.DIA)[1], antes)
+
+    @override_settings(CALCULADORA_AGREGADOS_MINUTOS_DIAS=1)
+    def test_retencao_dos_minutos(self):
+        agregados.agregar(pausa=0)
+        limite = self.agora - timezone.timedelta(days=1)
+        minutos = AgregadoOperacoes.objects.filter(granularidade=agregados.MINUTO)
+        self.assertFalse(minutos.filter(inicio__lt=limite - timezone.timedelta(minutes=1)).exists())
+        self.assertEqual(self.consultar(agregados.HORA)[1], self.esperado(agregados.HORA))
+
+        restantes = minutos.count()
+        self.assertTrue(restantes)
+        with override_settings(CALCULADORA_AGREGADOS_MINUTOS_DIAS=0):
+            self.assertEqual(agregados.podar_minutos(), restantes)
+        self.assertFalse(minutos.exists())
+
+    def test_consulta_so_le_os_agregados(self):
+        agregados.agregar(pausa=0)
+        with CaptureQueriesContext(connection) as consultas:
+            agregados.consultar(*agregados.periodo({'granularidade': 'dia'}))
+        self.assertTrue(consultas.captured_queries)
+        self.assertFalse([c['sql'] for c in consultas.captured_queries if '"calculadora_operacao"' in c['sql']])
+
+    def test_comandos(self):
+        call_command('agregar_operacoes', pausa=0, stdout=io.StringIO())
+        antes = self.consultar(agregados.HORA)[1]
+        saida = io.StringIO()
+        call_command('preencher_agregados', lote=9, pausa=0, stdout=saida)
+        self.assertIn('Concluído: 40 operação(ões) agregada(s).', saida.getvalue())
+        self.assertEqual(self.consultar(agregados.HORA)[1], antes)
+
+    def test_faixas(self):
+        for resultado, faixa_esperada in ((0, 0), (0.01, 1), (1, 3), (9.99, 3), (10, 4), (-0.5, -2), (-123.45, -5)):
+            with self.subTest(resultado):
+                faixa = agregados.faixa(round(resultado * 100))
+                self.assertEqual(faixa, faixa_esperada)
+                if faixa:
+                    de, ate = agregados.limites_faixa(faixa)
+                    self.assertTrue(abs(de) <= abs(resultado) < abs(ate))
+
+    def test_api(self):
+        agregados.agregar(pausa=0)
+        admin = Usuario.objects.create_user(
+            username='admin', email='admin@exemplo.com', password='senha12345', nome='Admin', is_staff=True
+        )
+        self.assertEqual(self.cliente().get('/api/calc/analise/').status_code, 403)
+        self.assertEqual(self.cliente(admin).get('/api/calc/analise/', {'granularidade': 'semana'}).status_code, 400)
+        self.assertEqual(
+            self.cliente(admin).get('/api/calc/analise/', {'desde': '2020-01-01T00:00:00', 'granularidade': 'minuto'}).status_code,
+            400
+        )
+        resposta = self.cliente(admin).get('/api/calc/analise/', {
+            'granularidade': 'dia', 'desde': (self.agora - timezone.timedelta(days=5)).isoformat(),
+        })
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['total'], 40)
+
+
+class Float64ArrayFieldTest(CalculadoraTestCase):
+
+    def recarregar(self, operacao):
+        return Operacao.objects.get(pk=operacao.pk)
+
+    def test_ida_e_volta(self):
+        casos = (
+            [],
+            [1, 2, 3],
+            [10.5, -3.75, 0.0001],
+            [1 / 3, 2 ** 0.5, -1e-300],
+            [2 ** 31, -2 ** 40, 1e300],
+        )
+        for parametros in casos:
+            with self.subTest(parametros=parametros):
+                operacao = self.criar_operacao(parametros=parametros)
+                self.assertEqual(self.recarregar(operacao).parametros, [float(n) for n in parametros])
+
+    def test_formato_compacto(self):
+        self.assertEqual(codificar_float64([12, 10.5, 3.75])[0], FORMATO_INT32 | 2 << 2)
+        self.assertEqual(codificar_float64([1 / 3])[0], 0)
+        self.assertEqual(len(codificar_float64([1, 2, 3])), 1 + 3 * 4)
+
+    def test_lista_grande_comprimida(self):
+        parametros = [i / 4 for i in range(5000)]
+        dados = codificar_float64(parametros, comprimir_acima=1024)
+        self.assertTrue(dados[0] & FORMATO_ZLIB)
+        self.assertEqual(decodificar_float64(dados), parametros)
+
+        operacao = self.criar_operacao(parametros=parametros)
+        self.assertEqual(self.recarregar(operacao).parametros, parametros)
+
+    def test_array_numpy(self):
+        if engine.np is None:
+            self.skipTest('NumPy não instalado')
+        parametros = engine.np.array([1.5, 2.0, 1 / 7])
+        operacao = self.criar_operacao(parametros=parametros)
+        self.assertEqual(self.recarregar(operacao).parametros, parametros.tolist())
+
+    def test_regravar_sem_decodificar(self):
+        operacao = self.recarregar(self.criar_operacao(parametros=[1 / 3, 4]))
+        operacao.resultado = 10
+        operacao.save()
+        self.assertEqual(self.recarregar(operacao).parametros, [1 / 3, 4.0])
+
+    def test_formato_desconhecido(self):
+        with self.assertRaises(ValueError):
+            decodificar_float64(bytes([0b11111100]) + b'\x00' * 8)
+
+
+class FiltroOperandosTest(CalculadoraTestCase):
+
+    def ids_com_valor(self, valor):
+        resposta = self.cliente().get('/api/calc/historico/', {'valor': valor})
+        self.assertEqual(resposta.status_code, 200)
+        return sorted(operacao['id'] for operacao in resposta.json()['results'])
+
+    def test_filtro_por_valor(self):
+        primeira = self.criar_operacao(parametros=[42.5, 1], resultado=43.5)
+        self.criar_operacao(parametros=[1, 2, 3], resultado=6)
+        terceira = self.criar_operacao(tipo_operacao='multiplicacao', parametros=[2, 42.5], resultado=85)
+        self.criar_operacao(usuario=self.outro_usuario, parametros=[42.5, 0], resultado=42.5)
+
+        self.assertEqual(self.ids_com_valor('42.5'), [primeira.pk, terceira.pk])
+        self.assertEqual(self.ids_com_valor('7'), [])
+        self.assertEqual(self.cliente().get('/api/calc/historico/', {'valor': 'x'}).status_code, 400)
+
+    def test_remocao_apaga_os_operandos(self):
+        operacao = self.criar_operacao(parametros=[42.5, 1], resultado=43.5)
+        self.assertEqual(OperandoOperacao.objects.filter(operacao=operacao).count(), 2)
+        operacao.delete()
+        self.assertFalse(OperandoOperacao.objects.exists())
+
+    def test_indexar_operandos_preenche_as_operacoes_sem_indice(self):
+        with self.settings(CALCULADORA_INDICE_OPERANDOS=False):
+            operacao = self.criar_operacao(parametros=[42.5, 1], resultado=43.5)
+        self.assertEqual(self.ids_com_valor('42.5'), [])
+
+        call_command('indexar_operandos', stdout=io.StringIO())
+
+        self.assertEqual(self.ids_com_valor('42.5'), [operacao.pk])
+
+
+class PaginacaoCursorTest(CalculadoraTestCase):
+    URL = '/api/calc/historico/?paginacao=cursor&page_size=4'
+
+    def setUp(self):
+        # Três grupos com a mesma data_criacao, maiores que uma página
+        agora = timezone.now()
+        datas = [agora - timezone.timedelta(minutes=i // 5) for i in range(13)]
+        Operacao.objects.bulk_create([
+            Operacao(usuario=self.usuario, tipo_operacao='soma', parametros=[i, 1],
+                     quantidade_parametros=2, resultado=i + 1, data_criacao=data)
+            for i, data in enumerate(datas)
+        ])
+        self.criar_operacao(usuario=self.outro_usuario, data_criacao=agora)
+        self.esperado = list(
+            Operacao.objects.filter(usuario=self.usuario).order_by('-data_criacao', '-id').values_list('id', flat=True)
+        )
+
+    def pagina(self, url):
+        resposta = self.cliente().get(url)
+        self.assertEqual(resposta.status_code, 200)
+        dados = resposta.json()
+        return [operacao['id'] for operacao in dados['results']], dados['next'], dados['previous']
+
+    def test_proxima_percorre_tudo_sem_repetir(self):
+        vistos, paginas, url = [], 0, self.URL
+        while url:
+            ids, url, _ = self.pagina(url)
+            vistos += ids
+            paginas += 1
+        self.assertEqual(vistos, self.esperado)
+        self.assertEqual(paginas, 4)
+
+    def test_anterior_volta_as_mesmas_paginas(self):
+        paginas, url = [], self.URL
+        while url:
+            ids, url, anterior = self.pagina(url)
+            paginas.append((ids, anterior))
+
+        ids, anterior = paginas[-1]
+        for esperados, _ in reversed(paginas[:-1]):
+            ids, proxima, anterior = self.pagina(anterior)
+            self.assertEqual(ids, esperados)
+            self.assertIsNotNone(proxima)
+        self.assertIsNone(anterior)
+
+    def test_total(self):
+        self.assertEqual(self.cliente().get(self.URL + '&total=true').json()['count'], 13)
+        self.assertNotIn('count', self.cliente().get(self.URL).json())
+
+    def test_total_async(self):
+        token = AccessToken.for_user(self.usuario)
+        resposta = Client(HTTP_AUTHORIZATION=f'Bearer {token}').get(
+            '/api/calc/async/historico/?paginacao=cursor&page_size=4&total=true'
+        )
+        self.assertEqual(resposta.json()['count'], 13)
+
+    def test_cursor_invalido(self):
+        self.assertEqual(self.cliente().get('/api/calc/historico/', {'cursor': 'zzz'}).status_code, 404)
+
+
+class DeltaHistoricoTest(CalculadoraTestCase):
+
+    def delta(self, since):
+        resposta = self.cliente().get('/api/calc/historico/', {'since': since})
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.json()
+
+    def test_novas_removidas_e_limpeza(self):
+        since = self.delta('')['since']
+        self.assertEqual(self.delta(since)['novas'], [])
+
+        primeira = self.criar_operacao()
+        segunda = self.criar_operacao(parametros=[2, 2], resultado=4)
+        self.criar_operacao(usuario=self.outro_usuario)
+        dados = self.delta(since)
+        self.assertEqual([operacao['id'] for operacao in dados['novas']], [primeira.pk, segunda.pk])
+        self.assertEqual((dados['removidas'], dados['limpo']), ([], False))
+
+        since = dados['since']
+        removidas = [primeira.pk, segunda.pk]
+        primeira.delete()
+        Operacao.objects.remover_ids(self.usuario, [segunda.pk])
+        Operacao.objects.remover_ids(self.outro_usuario, [Operacao.objects.get(usuario=self.outro_usuario).pk])
+        dados = self.delta(since)
+        self.assertEqual(dados['novas'], [])
+        self.assertEqual(dados['removidas'], removidas)
+
+        since = dados['since']
+        self.criar_operacao()
+        Operacao.objects.limpar_historico(self.usuario)
+        depois = self.criar_operacao(parametros=[5, 5], resultado=10)
+        dados = self.delta(since)
+        self.assertTrue(dados['limpo'])
+        # As operações escondidas pela limpeza não voltam como novas
+        self.assertEqual([operacao['id'] for operacao in dados['novas']], [depois.pk])
+
+        self.assertEqual(self.delta(dados['since'])['novas'], [])
+
+    def test_mais_de_uma_pagina(self):
+        since = self.delta('')['since']
+        for i in range(101):
+            self.criar_operacao(parametros=[i, 1], resultado=i + 1)
+        dados = self.delta(since)
+        self.assertTrue(dados['mais'])
+        self.assertEqual(len(dados['novas']), 100)
+        dados = self.delta(dados['since'])
+        self.assertFalse(dados['mais'])
+        self.assertEqual(len(dados['novas']), 1)
+
+    def test_cursor_invalido_ou_expirado(self):
+        self.assertEqual(self.cliente().get('/api/calc/historico/', {'since': 'lixo'}).status_code, 404)
+        expirado = base64.urlsafe_b64encode(b'0|0|1000').decode().rstrip('=')
+        self.assertEqual(self.cliente().get('/api/calc/historico/', {'since': expirado}).status_code, 410)
+
+
+class LimpezaHistoricoTest(CalculadoraTestCase):
+
+    def setUp(self):
+        for i in range(25):
+            self.criar_operacao(parametros=[i, 1], resultado=i + 1)
+        self.alheia = self.criar_operacao(usuario=self.outro_usuario)
+
+    def test_limpeza_logica_esconde_as_operacoes(self):
+        pk = Operacao.objects.filter(usuario=self.usuario).first().pk
+        cliente = self.cliente()
+
+        resposta = cliente.delete('/api/calc/limpar_historico/')
+
+        self.assertEqual(resposta.status_code, 202)
+        self.assertEqual(resposta.json()['count'], 25)
+        self.assertEqual(Operacao.objects.filter(usuario=self.usuario).count(), 25)
+        self.assertEqual(cliente.get('/api/calc/historico/').json()['count'], 0)
+        self.assertEqual(cliente.get(f'/api/calc/operacao/{pk}/').status_code, 404)
+        self.assertEqual(cliente.get(resposta.json()['limpeza']['url']).json()['estado'], 'pendente')
+
+        nova = self.criar_operacao(parametros=[5, 5], resultado=10)
+        self.assertEqual(list(Operacao.objects.do_usuario(self.usuario).values_list('pk', flat=True)), [nova.pk])
+
+    def test_expurgo_apaga_so_as_operacoes_limpas(self):
+        Operacao.objects.limpar_historico(self.usuario)
+        nova = self.criar_operacao(parametros=[5, 5], resultado=10)
+
+        self.assertEqual(Expurgo(tamanho_lote=10, pausa=0).processar(), 1)
+
+        limpeza = LimpezaHistorico.objects.get()
+        self.assertEqual((limpeza.estado, limpeza.removidas, limpeza.total), (LimpezaHistorico.CONCLUIDA, 25, 25))
+        self.assertEqual(list(Operacao.objects.filter(usuario=self.usuario).values_list('pk', flat=True)), [nova.pk])
+        self.assertTrue(Operacao.objects.filter(pk=self.alheia.pk).exists())
+        self.assertEqual(OperandoOperacao.objects.exclude(operacao__in=[nova.pk, self.alheia.pk]).count(), 0)
+
+    def test_expurgo_depois_do_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cliente().delete('/api/calc/limpar_historico/')
+        self.assertFalse(Operacao.objects.filter(usuario=self.usuario).exists())
+
+    def test_historico_vazio(self):
+        Operacao.objects.limpar_historico(self.usuario)
+        self.assertIsNone(Operacao.objects.limpar_historico(self.usuario))
+        self.assertEqual(self.cliente().delete('/api/calc/limpar_historico/').json()['count'], 0)
+
+    def test_excluir_usuario(self):
+        limpeza = excluir_usuario(self.usuario)
+        self.assertFalse(Usuario.objects.get(pk=self.usuario.pk).is_active)
+        self.assertEqual(Operacao.objects.do_usuario(self.usuario).count(), 0)
+
+        Expurgo(pausa=0).processar()
+
+        self.assertFalse(Usuario.objects.filter(pk=self.usuario.pk).exists())
+        limpeza.refresh_from_db()
+        self.assertEqual((limpeza.usuario_id, limpeza.estado), (None, LimpezaHistorico.CONCLUIDA))
+        self.assertEqual(list(Operacao.objects.values_list('pk', flat=True)), [self.alheia.pk])
+
+    def test_andamento_so_le(self):
+        limpeza = Operacao.objects.limpar_historico(self.usuario)
+        cliente_async = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.usuario)}')
+        for cliente, url in ((self.cliente(), '/api/calc/limpar_historico/'), (cliente_async, '/api/calc/async/limpar_historico/')):
+            with self.subTest(url), mock.patch.object(expurgo, 'agendar') as agendar, \
+                    self.captureOnCommitCallbacks() as callbacks:
+                resposta = cliente.get(f'{url}{limpeza.pk}/')
+            self.assertEqual(resposta.json()['estado'], LimpezaHistorico.PENDENTE)
+            agendar.assert_not_called()
+            self.assertEqual(callbacks, [])
+
+    @override_settings(CALCULADORA_EXPURGO_SEGUNDO_PLANO=True)
+    def test_thread_iniciada_na_primeira_requisicao(self):
+        with mock.patch.object(expurgo, '_iniciado', False), mock.patch.object(expurgo, 'obter_expurgo') as obter:
+            self.cliente().get('/api/calc/historico/')
+            self.cliente().get('/api/calc/historico/')
+        obter.return_value.iniciar.assert_called_once_with()
+
+    def test_sem_segundo_plano_nao_inicia_a_thread(self):
+        with mock.patch.object(expurgo, '_iniciado', False), mock.patch.object(expurgo, 'obter_expurgo') as obter:
+            self.cliente().get('/api/calc/historico/')
+        obter.assert_not_called()
+
+
+class RemoverIdsTest(CalculadoraTestCase):
+
+    def setUp(self):
+        self.ids = [self.criar_operacao(parametros=[i, 1], resultado=i + 1).pk for i in range(10)]
+        self.alheia = self.criar_operacao(usuario=self.outro_usuario).pk
+
+    def test_remove_so_as_do_usuario(self):
+        versao = VersaoHistorico.atual(self.usuario.pk)
+
+        removidas = Operacao.objects.remover_ids(self.usuario, self.ids[:4] + [self.alheia, 999999])
+
+        self.assertEqual(removidas, self.ids[:4])
+        self.assertTrue(Operacao.objects.filter(pk=self.alheia).exists())
+        self.assertEqual(Operacao.objects.filter(usuario=self.usuario).count(), 6)
+        self.assertFalse(OperandoOperacao.objects.filter(operacao_id__in=self.ids[:4]).exists())
+        self.assertEqual(
+            sorted(OperacaoRemovida.objects.filter(usuario=self.usuario).values_list('operacao_id', flat=True)),
+            self.ids[:4]
+        )
+        self.assertFalse(OperacaoRemovida.objects.filter(usuario=self.outro_usuario).exists())
+        self.assertNotEqual(VersaoHistorico.atual(self.usuario.pk), versao)
+
+    def test_ids_repetidos_e_ja_removidos(self):
+        self.assertEqual(Operacao.objects.remover_ids(self.usuario, [self.ids[0], self.ids[0]]), [self.ids[0]])
+        self.assertEqual(Operacao.objects.remover_ids(self.usuario, [self.ids[0]]), [])
+        self.assertEqual(OperacaoRemovida.objects.filter(usuario=self.usuario).count(), 1)
+
+    def test_nao_remove_operacoes_ja_limpas(self):
+        Operacao.objects.limpar_historico(self.usuario)
+        nova = self.criar_operacao(parametros=[5, 5], resultado=10).pk
+
+        removidas = Operacao.objects.remover_ids(self.usuario, self.ids + [nova])
+
+        self.assertEqual(removidas, [nova])
+        # As limpas ficam para a LimpezaHistorico, que conta as que apaga
+        self.assertEqual(Operacao.objects.filter(pk__in=self.ids).count(), 10)
+
+    def test_mais_ids_que_um_lote(self):
+        with self.settings(CALCULADORA_INDICE_OPERANDOS=False):
+            Operacao.objects.bulk_create([
+                Operacao(usuario=self.usuario, tipo_operacao='soma', parametros=[i, 1],
+                         quantidade_parametros=2, resultado=i + 1)
+                for i in range(1200)
+            ])
+        ids = list(Operacao.objects.filter(usuario=self.usuario).values_list('pk', flat=True))
+
+        self.assertEqual(Operacao.objects.remover_ids(self.usuario, ids + [self.alheia]), sorted(ids))
+        self.assertFalse(Operacao.objects.filter(usuario=self.usuario).exists())
+
+    def test_endpoint(self):
+        cliente = self.cliente()
+        resposta = cliente.delete('/api/calc/operacao/lote/', {'ids': [self.ids[0], self.alheia]}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['removidas'], [self.ids[0]])
+        self.assertEqual(resposta.json()['nao_encontradas'], [self.alheia])
+        self.assertEqual(cliente.delete('/api/calc/operacao/lote/', {'ids': []}, format='json').status_code, 400)
+        self.assertEqual(cliente.delete('/api/calc/operacao/lote/', {'ids': ['x']}, format='json').status_code, 400)
+
+
+class EstatisticaUsuarioTest(CalculadoraTestCase):
+
+    def setUp(self):
+        self.criar_operacao(parametros=[0.1, 0.2], resultado=0.3)
+        for tipo_operacao, resultado in (('soma', 13), ('subtracao', 7), ('multiplicacao', 30), ('divisao', 3.33)):
+            self.criar_operacao(tipo_operacao=tipo_operacao, parametros=[10, 3], resultado=resultado)
+        Operacao.objects.bulk_create([
+            Operacao(usuario=self.usuario, tipo_operacao='divisao', parametros=[1, 3],
+                     quantidade_parametros=2, resultado=0.33),
+            Operacao(usuario=self.outro_usuario, tipo_operacao='soma', parametros=[1, 1],
+                     quantidade_parametros=2, resultado=2),
+        ])
+
+    def agregado(self, usuario):
+        """``por_tipo`` de ``estatisticas/`` calculado direto das operações."""
+        por_tipo = {tipo: {'quantidade': 0, 'soma_resultados': 0.0} for tipo in EstatisticaUsuario.TIPOS}
+        linhas = Operacao.objects.do_usuario(usuario).order_by().values('tipo_operacao').annotate(
+            quantidade=Count('id'), soma=Sum('resultado')
+        )
+        for linha in linhas:
+            por_tipo[linha['tipo_operacao']] = {
+                'quantidade': linha['quantidade'],
+                'soma_resultados': round(float(linha['soma']), 2),
+            }
+        return por_tipo
+
+    def assertIgualAoAgregado(self, usuario):
+        dados = EstatisticaUsuario.obter(usuario.pk).dados()
+        por_tipo = {
+            tipo: {'quantidade': valores['quantidade'], 'soma_resultados': round(valores['soma_resultados'], 2)}
+            for tipo, valores in dados['por_tipo'].items()
+        }
+        self.assertEqual(por_tipo, self.agregado(usuario))
+        self.assertEqual(dados['total'], Operacao.objects.do_usuario(usuario).count())
+
+    def test_gravacao(self):
+        self.assertIgualAoAgregado(self.usuario)
+        self.assertIgualAoAgregado(self.outro_usuario)
+        ultima = Operacao.objects.do_usuario(self.usuario).order_by('-data_criacao').first().data_criacao
+        self.assertEqual(EstatisticaUsuario.obter(self.usuario.pk).ultima_operacao, ultima)
+
+    def test_remocoes(self):
+        ids = list(Operacao.objects.filter(usuario=self.usuario).order_by('pk').values_list('pk', flat=True))
+        Operacao.objects.get(pk=ids[0]).delete()
+        self.assertIgualAoAgregado(self.usuario)
+        Operacao.objects.remover_ids(self.usuario, ids[1:3])
+        self.assertIgualAoAgregado(self.usuario)
+        Operacao.objects.filter(pk=ids[3]).delete()
+        self.assertIgualAoAgregado(self.usuario)
+        self.assertIgualAoAgregado(self.outro_usuario)
+
+    def test_limpeza(self):
+        Operacao.objects.limpar_historico(self.usuario)
+        self.assertEqual(EstatisticaUsuario.obter(self.usuario.pk).total, 0)
+        self.assertIgualAoAgregado(self.usuario)
+
+        self.criar_operacao(parametros=[1, 2], resultado=3)
+        self.assertIgualAoAgregado(self.usuario)
+        # A remoção física das operações limpas não desconta de novo
+        Expurgo(pausa=0).processar()
+        self.assertIgualAoAgregado(self.usuario)
+        self.assertEqual(EstatisticaUsuario.obter(self.usuario.pk).total, 1)
+
+    def test_reconstrucao(self):
+        EstatisticaUsuario.objects.all().delete()
+        self.assertIgualAoAgregado(self.usuario)
+
+        EstatisticaUsuario.objects.filter(pk=self.usuario.pk).update(quantidade_soma=99)
+        saida = io.StringIO()
+        call_command('reconstruir_estatisticas', stdout=saida)
+        self.assertIn('1 resumo(s) corrigido(s)', saida.getvalue())
+        self.assertIgualAoAgregado(self.usuario)
+
+    def test_endpoint(self):
+        dados = self.cliente().get('/api/calc/estatisticas/').json()
+        self.assertEqual(dados['total'], 6)
+        self.assertAlmostEqual(dados['soma_resultados'], 0.3 + 13 + 7 + 30 + 3.33 + 0.33)
+
+
+class OperacaoListaSerializerTest(CalculadoraTestCase):
+
+    def test_uma_consulta_para_a_pagina(self):
+        for i in range(20):
+            self.criar_operacao(parametros=(i, 1.5), resultado=i + 1.5)
+        queryset = Operacao.objects.do_usuario(self.usuario).order_by('-data_criacao', '-id')
+
+        with self.assertNumQueries(1):
+            dados = OperacaoListaSerializer(OperacaoListaSerializer.consulta(queryset), self.usuario).data
+
+        self.assertEqual(len(dados), 20)
+        self.assertEqual(dados[0]['usuario_nome'], 'Ana')
+
+    def test_mesmos_dados_do_serializer_do_modelo(self):
+        self.criar_operacao(tipo_operacao='divisao', parametros=(1.5, 2.25, 3), resultado=0.22)
+        self.criar_operacao(tipo_operacao='multiplicacao', parametros=(10 ** 6, 3), resultado=3 * 10 ** 6)
+        queryset = Operacao.objects.do_usuario(self.usuario).order_by('-data_criacao', '-id')
+
+        esperado = OperacaoSerializer(queryset, many=True).data
+        dados = OperacaoListaSerializer(OperacaoListaSerializer.consulta(queryset), self.usuario).data
+
+        self.assertEqual(dados, [dict(item) for item in esperado])
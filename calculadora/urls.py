@@ -5,8 +5,18 @@ app_name = 'calculadora'
 
 urlpatterns = [
     path('calcular/', views.calcular_api, name='calcular'),
+    path('calcular/lote/', views.calcular_lote_api, name='calcular_lote'),
+    path('calcular/stream/', views.calcular_stream_api, name='calcular_stream'),
+    path('calcular/expressao/', views.calcular_expressao_api, name='calcular_expressao'),
     path('historico/', views.historico_api, name='historico'),
+    path('estatisticas/', views.estatisticas_api, name='estatisticas'),
+    path('importar/', views.importar_operacoes_api, name='importar_operacoes'),
+    path('historico/exportar/', views.exportar_historico_api, name='exportar_historico'),
+    path('operacao/lote/', views.deletar_operacoes_api, name='deletar_operacoes'),
     path('operacao/<int:pk>/', views.operacao_detail_api, name='operacao_detail'),
     path('operacao/<int:pk>/deletar/', views.deletar_operacao_api, name='deletar_operacao'),
     path('limpar_historico/', views.limpar_historico_api, name='limpar_historico'),
+    path('limpar_historico/<int:pk>/', views.limpeza_historico_api, name='limpeza_historico'),
+    path('analise/', views.analise_api, name='analise'),
+    path('metricas/', views.metricas_api, name='metricas'),
 ]
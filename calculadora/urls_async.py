@@ -0,0 +1,16 @@
+from django.urls import path
+from . import views_async
+
+app_name = 'calculadora_async'
+
+urlpatterns = [
+    path('calcular/', views_async.calcular_api, name='calcular'),
+    path('historico/', views_async.historico_api, name='historico'),
+    path('estatisticas/', views_async.estatisticas_api, name='estatisticas'),
+    path('operacao/lote/', views_async.deletar_operacoes_api, name='deletar_operacoes'),
+    path('operacao/<int:pk>/', views_async.operacao_detail_api, name='operacao_detail'),
+    path('operacao/<int:pk>/deletar/', views_async.deletar_operacao_api, name='deletar_operacao'),
+    path('limpar_historico/', views_async.limpar_historico_api, name='limpar_historico'),
+    path('limpar_historico/<int:pk>/', views_async.limpeza_historico_api, name='limpeza_historico'),
+    path('eventos/', views_async.eventos_api, name='eventos'),
+]
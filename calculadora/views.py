@@ -1,18 +1,121 @@
+import gzip
+
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.settings import api_settings
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from .models import Operacao
-from .serializers import OperacaoSerializer
-import json
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from kogui_portal.etag import calcular_etag, marcar, nao_modificado
+from . import agregados, cache_historico, eventos, exportacao, expressao, expurgo, importacao, memoizacao, persistencia
+from .delta import MENSAGEM_CURSOR_EXPIRADO, CursorExpirado, DeltaHistorico, usar_delta
+from .engine import (
+    OPERACOES, TIPOS_SEQUENCIA, Acumulador, ErroCalculo, como_lista, normalizar_numeros
+)
+from .models import (
+    EstatisticaUsuario, LimpezaHistorico, Operacao, OperandoOperacao, VersaoHistorico, indice_operandos_ativo,
+    verificar_resultado,
+)
+from .paginacao import ORDENACAO_HISTORICO, OperacaoCursorPagination, OperacaoPagination, usar_cursor
+from .parsers import Float64Parser, ler_blocos_ndjson
+from .serializers import OperacaoListaSerializer, OperacaoSerializer
+
+TIPOS_VALIDOS = list(OPERACOES)
+
+# JSON (padrão do DRF) + formato binário float64 para cálculos grandes
+PARSERS_CALCULO = [*api_settings.DEFAULT_PARSER_CLASSES, Float64Parser]
+
+
+def _preparar_calculo(data):
+    """Extrai (numeros, tipo_operacao) do corpo de calcular/ ou levanta ValueError."""
+    if 'numeros' in data and isinstance(data['numeros'], TIPOS_SEQUENCIA) and len(data['numeros']) >= 2:
+        numeros = normalizar_numeros(data['numeros'])
+    elif 'parametros' in data and isinstance(data['parametros'], list):
+        numeros = normalizar_numeros(data['parametros'])
+    else:
+        raise ValueError('Envie uma lista de números válida com pelo menos 2 valores.')
+    
+    tipo_operacao = data.get('tipo_operacao')
+    if not tipo_operacao or tipo_operacao not in TIPOS_VALIDOS:
+        raise ValueError('Tipo de operação inválido')
+    return numeros, tipo_operacao
+
+
+def _nova_operacao(usuario, tipo_operacao, numeros, resultado):
+    return Operacao(
+        usuario=usuario,
+        tipo_operacao=tipo_operacao,
+        parametros=como_lista(numeros),
+        quantidade_parametros=len(numeros),
+        resultado=resultado
+    )
 
-class OperacaoPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+
+def _filtrar_historico(operacoes, parametros):
+    """
+    Aplica os filtros de historico/: ``valor`` (a operação usou esse número),
+    ``min_operandos`` e ``max_operandos``. Levanta ValueError se inválidos.
+    """
+    valor = parametros.get('valor')
+    if valor not in (None, ''):
+        try:
+            valor = float(valor)
+        except ValueError:
+            raise ValueError('valor deve ser um número.')
+        if not indice_operandos_ativo():
+            raise ValueError('o filtro por valor exige CALCULADORA_INDICE_OPERANDOS.')
+        operacoes = operacoes.filter(
+            pk__in=OperandoOperacao.objects.filter(valor=valor).values('operacao_id')
+        )
+    for parametro, lookup in (('min_operandos', 'gte'), ('max_operandos', 'lte')):
+        if parametros.get(parametro) not in (None, ''):
+            try:
+                quantidade = int(parametros[parametro])
+            except ValueError:
+                raise ValueError(f'{parametro} deve ser um número inteiro.')
+            operacoes = operacoes.filter(**{f'quantidade_parametros__{lookup}': quantidade})
+    return operacoes
+
+
+def _ids_para_remover(data):
+    """Ids de ``{"ids": [...]}`` para ``operacao/lote/``; levanta ValueError se inválidos."""
+    ids = data.get('ids') if isinstance(data, dict) else data
+    if not isinstance(ids, list) or not ids:
+        raise ValueError('Envie uma lista de ids com pelo menos 1 item.')
+    limite = getattr(settings, 'CALCULADORA_LOTE_MAXIMO', 10000)
+    if len(ids) > limite:
+        raise ValueError(f'O lote aceita no máximo {limite} ids.')
+    if not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+        raise ValueError('Os ids devem ser números inteiros.')
+    return ids
+
+
+def _resposta_remocao(ids, removidas):
+    """Dados da resposta de ``operacao/lote/``."""
+    apagadas = set(removidas)
+    return {
+        'message': f'{len(removidas)} operação(ões) deletada(s)',
+        'removidas': removidas,
+        'nao_encontradas': sorted({pk for pk in ids if pk not in apagadas}),
+    }
+
+
+def _preparar_item_lote(item):
+    """Valida um item do lote e devolve (numeros, tipo_operacao) ou levanta ValueError."""
+    if not isinstance(item, dict):
+        raise ValueError('Cada item deve ser um objeto com numeros e tipo_operacao.')
+    numeros = item.get('numeros')
+    if not isinstance(numeros, TIPOS_SEQUENCIA) or len(numeros) < 2:
+        raise ValueError('Envie uma lista de números válida com pelo menos 2 valores.')
+    numeros = normalizar_numeros(numeros)
+    tipo_operacao = item.get('tipo_operacao')
+    if tipo_operacao not in TIPOS_VALIDOS:
+        raise ValueError('Tipo de operação inválido')
+    return numeros, tipo_operacao
 
 @swagger_auto_schema(
     method='post',
@@ -34,7 +137,7 @@ class OperacaoPagination(PageNumberPagination):
     ),
     responses={
         201: openapi.Response(
-            description="Operação realizada com sucesso",
+            description="Operação realizada com sucesso (202 com CALCULADORA_WRITE_BEHIND: gravação pendente)",
             schema=openapi.Schema(
                 type=openapi.TYPE_OBJECT,
                 properties={
@@ -57,68 +160,281 @@ class OperacaoPagination(PageNumberPagination):
     tags=['Calculadora']
 )
 @api_view(['POST'])
+@parser_classes(PARSERS_CALCULO)
 @permission_classes([IsAuthenticated])
 def calcular_api(request):
+    data = request.data
+    
     try:
-        data = request.data
-        
-        if 'numeros' in data and isinstance(data['numeros'], list) and len(data['numeros']) >= 2:
-            numeros = [float(n) for n in data['numeros']]
-        elif 'parametros' in data and isinstance(data['parametros'], list):
-            numeros = [float(n) for n in data['parametros']]
-        else:
-            return Response(
-                {'error': 'Envie uma lista de números válida com pelo menos 2 valores.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        try:
+            numeros, tipo_operacao = _preparar_calculo(data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        tipo_operacao = data.get('tipo_operacao')
+        try:
+            resultado = memoizacao.calcular(tipo_operacao, numeros)
+            verificar_resultado(resultado)
+        except ErroCalculo as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        if not tipo_operacao or tipo_operacao not in ['soma', 'subtracao', 'multiplicacao', 'divisao']:
-            return Response(
-                {'error': 'Tipo de operação inválido'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        operacao = _nova_operacao(request.user, tipo_operacao, numeros, resultado)
         
-        if tipo_operacao == 'soma':
-            resultado = sum(numeros)
-        elif tipo_operacao == 'subtracao':
-            resultado = numeros[0]
-            for num in numeros[1:]:
-                resultado -= num
-        elif tipo_operacao == 'multiplicacao':
-            resultado = 1
-            for num in numeros:
-                resultado *= num
-        elif tipo_operacao == 'divisao':
-            if 0 in numeros[1:]:
-                return Response({
-                    'error': 'Divisão por zero não é permitida'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            resultado = numeros[0]
-            for num in numeros[1:]:
-                resultado /= num
-        
-        operacao = Operacao.objects.create(
-            usuario=request.user,
-            tipo_operacao=tipo_operacao,
-            parametros=json.dumps(numeros),
-            resultado=resultado
-        )
+        if persistencia.write_behind_ativo():
+            # Responde já; a linha é gravada pela fila em um commit agrupado.
+            operacao.data_criacao = timezone.now()
+            persistencia.obter_fila().enfileirar(operacao)
+            status_resposta = status.HTTP_202_ACCEPTED
+        else:
+            operacao.save()
+            status_resposta = status.HTTP_201_CREATED
         
-        from .serializers import OperacaoSerializer
         serializer = OperacaoSerializer(operacao)
         
         return Response({
             'message': 'Cálculo realizado com sucesso',
             'operacao': serializer.data
-        }, status=status.HTTP_201_CREATED)
+        }, status=status_resposta)
             
+    except ErroCalculo as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        return Response(
+            {'error': f'Erro inesperado: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@swagger_auto_schema(
+    method='post',
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        required=['operacoes'],
+        properties={
+            'operacoes': openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    required=['numeros', 'tipo_operacao'],
+                    properties={
+                        'numeros': openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Schema(type=openapi.TYPE_NUMBER)
+                        ),
+                        'tipo_operacao': openapi.Schema(
+                            type=openapi.TYPE_STRING,
+                            enum=TIPOS_VALIDOS
+                        )
+                    }
+                ),
+                example=[
+                    {'numeros': [10, 5], 'tipo_operacao': 'soma'},
+                    {'numeros': [8, 2], 'tipo_operacao': 'divisao'}
+                ]
+            )
+        }
+    ),
+    responses={
+        201: openapi.Response(
+            description="Lote processado; itens inválidos são listados em 'erros'",
+            examples={
+                "application/json": {
+                    "message": "Lote processado: 1 operação(ões) realizada(s), 1 erro(s)",
+                    "resultados": [{"indice": 0, "operacao": {"id": 1, "resultado_serializado": 15.0}}],
+                    "erros": [{"indice": 1, "error": "Divisão por zero não é permitida"}]
+                }
+            }
+        ),
+        400: openapi.Response(
+            description="Lote inválido ou nenhum item válido",
+            examples={"application/json": {"error": "Mensagem de erro"}}
+        ),
+        401: openapi.Response(description="Não autenticado")
+    },
+    tags=['Calculadora']
+)
+@api_view(['POST'])
+@parser_classes(PARSERS_CALCULO)
+@permission_classes([IsAuthenticated])
+def calcular_lote_api(request):
+    data = request.data
+    itens = data.get('operacoes') if isinstance(data, dict) else data
+    
+    if not isinstance(itens, list) or not itens:
+        return Response(
+            {'error': 'Envie uma lista de operações com pelo menos 1 item.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    limite = getattr(settings, 'CALCULADORA_LOTE_MAXIMO', 10000)
+    if len(itens) > limite:
+        return Response(
+            {'error': f'O lote aceita no máximo {limite} operações.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    indices = []
+    operacoes = []
+    erros = []
+    for indice, item in enumerate(itens):
+        try:
+            numeros, tipo_operacao = _preparar_item_lote(item)
+            resultado = memoizacao.calcular(tipo_operacao, numeros)
+            verificar_resultado(resultado)
+        except ValueError as e:
+            erros.append({'indice': indice, 'error': str(e)})
+            continue
+        
+        indices.append(indice)
+        operacoes.append(Operacao(
+            usuario=request.user,
+            tipo_operacao=tipo_operacao,
+            parametros=como_lista(numeros),
+            quantidade_parametros=len(numeros),
+            resultado=resultado
+        ))
+    
+    if not operacoes:
+        return Response(
+            {'error': 'Nenhuma operação válida no lote.', 'erros': erros},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        with transaction.atomic():
+            operacoes = Operacao.objects.bulk_create(operacoes)
     except Exception as e:
         return Response(
             {'error': f'Erro inesperado: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+    
+    serializer = OperacaoSerializer(operacoes, many=True)
+    resultados = [
+        {'indice': indice, 'operacao': dados}
+        for indice, dados in zip(indices, serializer.data)
+    ]
+    
+    return Response({
+        'message': f'Lote processado: {len(resultados)} operação(ões) realizada(s), {len(erros)} erro(s)',
+        'resultados': resultados,
+        'erros': erros
+    }, status=status.HTTP_201_CREATED)
+
+
+def _corpo_da_requisicao(request):
+    """Stream do corpo sem bufferizar; suporta Transfer-Encoding: chunked no WSGI."""
+    meta = request.META
+    if 'CONTENT_LENGTH' not in meta and meta.get('wsgi.input_terminated'):
+        return meta['wsgi.input']
+    return request._request
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_description=(
+        "Recebe os números como NDJSON (um número ou uma lista JSON por linha), "
+        "possivelmente com Transfer-Encoding: chunked. A redução é feita bloco a bloco "
+        "e a operação gravada guarda apenas o resultado, a quantidade e o SHA-256 dos números."
+    ),
+    manual_parameters=[
+        openapi.Parameter(
+            'tipo_operacao', openapi.IN_QUERY,
+            type=openapi.TYPE_STRING,
+            enum=TIPOS_VALIDOS,
+            required=True
+        )
+    ],
+    responses={
+        201: openapi.Response(description="Operação realizada com sucesso"),
+        400: openapi.Response(
+            description="Requisição inválida",
+            examples={"application/json": {"error": "Mensagem de erro"}}
+        ),
+        401: openapi.Response(description="Não autenticado")
+    },
+    tags=['Calculadora']
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def calcular_stream_api(request):
+    try:
+        acumulador = Acumulador(request.query_params.get('tipo_operacao'))
+        for numeros in ler_blocos_ndjson(_corpo_da_requisicao(request)):
+            acumulador.adicionar(numeros)
+        if acumulador.quantidade < 2:
+            raise ErroCalculo('Envie uma lista de números válida com pelo menos 2 valores.')
+        resultado = acumulador.resultado()
+        verificar_resultado(resultado)
+    except ErroCalculo as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    operacao = Operacao.objects.create(
+        usuario=request.user,
+        tipo_operacao=acumulador.tipo_operacao,
+        parametros=[],
+        quantidade_parametros=acumulador.quantidade,
+        digest_parametros=acumulador.digest,
+        resultado=resultado
+    )
+    serializer = OperacaoSerializer(operacao)
+    
+    return Response({
+        'message': 'Cálculo realizado com sucesso',
+        'operacao': serializer.data
+    }, status=status.HTTP_201_CREATED)
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_description=(
+        "Avalia uma expressão infixa com precedência e parênteses "
+        "(+, -, ×/*, ÷//, menos unário). Não grava a operação no histórico."
+    ),
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        required=['expressao'],
+        properties={
+            'expressao': openapi.Schema(type=openapi.TYPE_STRING, example='2 + 3 × (4 - 1)')
+        }
+    ),
+    responses={
+        200: openapi.Response(
+            description="Expressão avaliada",
+            examples={"application/json": {"expressao": "2 + 3 × (4 - 1)", "resultado": 11.0}}
+        ),
+        400: openapi.Response(
+            description="Expressão inválida",
+            examples={"application/json": {"error": "Parênteses não balanceados."}}
+        ),
+        401: openapi.Response(description="Não autenticado")
+    },
+    tags=['Calculadora']
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def calcular_expressao_api(request):
+    data = request.data
+    texto = data.get('expressao') if isinstance(data, dict) else None
+    if not isinstance(texto, str) or not texto.strip():
+        return Response(
+            {'error': 'Envie a expressão em texto no campo expressao.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        resultado = expressao.avaliar(texto)
+    except ErroCalculo as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'expressao': texto,
+        'resultado': resultado
+    }, status=status.HTTP_200_OK)
 
 
 @swagger_auto_schema(
@@ -133,6 +449,45 @@ def calcular_api(request):
             'page_size', openapi.IN_QUERY,
             type=openapi.TYPE_INTEGER,
             default=10
+        ),
+        openapi.Parameter(
+            'paginacao', openapi.IN_QUERY,
+            description="'cursor' para paginação por cursor (custo constante em qualquer página)",
+            type=openapi.TYPE_STRING,
+            enum=['pagina', 'cursor']
+        ),
+        openapi.Parameter(
+            'cursor', openapi.IN_QUERY,
+            description='Cursor opaco devolvido em next/previous (paginação por cursor)',
+            type=openapi.TYPE_STRING
+        ),
+        openapi.Parameter(
+            'since', openapi.IN_QUERY,
+            description=(
+                'Modo incremental: cursor devolvido em "since" (vazio para o estado atual). '
+                'Responde novas, removidas, limpo, mais e o próximo since'
+            ),
+            type=openapi.TYPE_STRING
+        ),
+        openapi.Parameter(
+            'total', openapi.IN_QUERY,
+            description='Com paginação por cursor, inclui count (exige COUNT(*))',
+            type=openapi.TYPE_BOOLEAN
+        ),
+        openapi.Parameter(
+            'valor', openapi.IN_QUERY,
+            description='Apenas operações que usaram este número',
+            type=openapi.TYPE_NUMBER
+        ),
+        openapi.Parameter(
+            'min_operandos', openapi.IN_QUERY,
+            description='Quantidade mínima de números da operação',
+            type=openapi.TYPE_INTEGER
+        ),
+        openapi.Parameter(
+            'max_operandos', openapi.IN_QUERY,
+            description='Quantidade máxima de números da operação',
+            type=openapi.TYPE_INTEGER
         )
     ],
     responses={
@@ -151,23 +506,192 @@ def calcular_api(request):
                 }
             )
         ),
-        401: openapi.Response(description="Não autenticado")
+        304: openapi.Response(description="Histórico inalterado desde a ETag enviada em If-None-Match"),
+        401: openapi.Response(description="Não autenticado"),
+        410: openapi.Response(description="Cursor since expirado; recarregue o histórico")
     },
     tags=['Calculadora']
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def historico_api(request):
-    operacoes = Operacao.objects.filter(usuario=request.user).order_by('-data_criacao')
-    paginator = OperacaoPagination()
-    page = paginator.paginate_queryset(operacoes, request)
+    if usar_delta(request.query_params):
+        return _historico_delta(request)
+
+    versao = VersaoHistorico.atual(request.user.pk)
+    etag = calcular_etag(
+        'historico', request.user.pk, versao, request.build_absolute_uri(), request.accepted_media_type
+    )
+    resposta = nao_modificado(request, etag)
+    if resposta is not None:
+        return resposta
+
+    chave = cache_historico.chave_pagina(request, versao)
+    dados = cache_historico.obter(chave)
+    if dados is not None:
+        return marcar(Response(dados), etag)
+
+    operacoes = Operacao.objects.do_usuario(request.user).order_by(*ORDENACAO_HISTORICO)
+    try:
+        operacoes = _filtrar_historico(operacoes, request.query_params)
+    except ValueError as e:
+        return Response({'error': f'Filtro inválido: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+    paginator = OperacaoCursorPagination() if usar_cursor(request.query_params) else OperacaoPagination()
+    linhas = OperacaoListaSerializer.consulta(operacoes)
+    page = paginator.paginate_queryset(linhas, request)
     
     if page is not None:
-        serializer = OperacaoSerializer(page, many=True)
-        return paginator.get_paginated_response(serializer.data)
-    
-    serializer = OperacaoSerializer(operacoes, many=True)
-    return Response(serializer.data)
+        serializer = OperacaoListaSerializer(page, request.user)
+        resposta = paginator.get_paginated_response(serializer.data)
+    else:
+        serializer = OperacaoListaSerializer(linhas, request.user)
+        resposta = Response(serializer.data)
+    cache_historico.guardar(chave, resposta.data)
+    return marcar(resposta, etag)
+
+
+def _historico_delta(request):
+    try:
+        operacoes = _filtrar_historico(Operacao.objects.do_usuario(request.user), request.query_params)
+        delta = DeltaHistorico(request)
+    except ValueError as e:
+        return Response({'error': f'Filtro inválido: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+    except CursorExpirado:
+        return Response({'detail': MENSAGEM_CURSOR_EXPIRADO}, status=status.HTTP_410_GONE)
+    novas, removidas = delta.consultas(OperacaoListaSerializer.consulta(operacoes), request.user)
+    return Response(delta.montar(novas, removidas, lambda linhas: OperacaoListaSerializer(linhas, request.user).data))
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description=(
+        "Exporta o histórico completo do usuário em CSV ou NDJSON (uma operação por linha), "
+        "em streaming e comprimido com gzip quando o cliente envia Accept-Encoding: gzip. "
+        "Aceita os mesmos filtros de historico/."
+    ),
+    manual_parameters=[
+        openapi.Parameter(
+            'formato', openapi.IN_QUERY,
+            type=openapi.TYPE_STRING,
+            enum=list(exportacao.FORMATOS),
+            default='csv'
+        ),
+        openapi.Parameter(
+            'valor', openapi.IN_QUERY,
+            description='Apenas operações que usaram este número',
+            type=openapi.TYPE_NUMBER
+        ),
+        openapi.Parameter(
+            'min_operandos', openapi.IN_QUERY,
+            description='Quantidade mínima de números da operação',
+            type=openapi.TYPE_INTEGER
+        ),
+        openapi.Parameter(
+            'max_operandos', openapi.IN_QUERY,
+            description='Quantidade máxima de números da operação',
+            type=openapi.TYPE_INTEGER
+        )
+    ],
+    responses={
+        200: openapi.Response(description="Arquivo com o histórico (text/csv ou application/x-ndjson)"),
+        400: openapi.Response(
+            description="Formato ou filtro inválido",
+            examples={"application/json": {"error": "Formato inválido. Use csv ou ndjson."}}
+        ),
+        401: openapi.Response(description="Não autenticado")
+    },
+    tags=['Calculadora']
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def exportar_historico_api(request):
+    formato = request.query_params.get('formato', 'csv')
+    if formato not in exportacao.FORMATOS:
+        return Response(
+            {'error': f"Formato inválido. Use {' ou '.join(exportacao.FORMATOS)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    operacoes = Operacao.objects.do_usuario(request.user).order_by(*ORDENACAO_HISTORICO)
+    try:
+        operacoes = _filtrar_historico(operacoes, request.query_params)
+    except ValueError as e:
+        return Response({'error': f'Filtro inválido: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+    return exportacao.exportar(request, operacoes, formato)
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_description=(
+        "Importa operações em massa para o histórico do usuário. O corpo é CSV (com cabeçalho) ou NDJSON, "
+        "enviado direto (Content-Type text/csv ou application/x-ndjson, opcionalmente com "
+        "Content-Encoding: gzip) ou como o arquivo 'arquivo' de um multipart/form-data. Cada registro tem "
+        "tipo_operacao, numeros ou parametros e, opcionalmente, data_criacao (ISO 8601). "
+        "A resposta é NDJSON enviada durante a importação: uma linha por bloco gravado "
+        "(registros, importadas, erros, erros_bloco) e uma linha final com concluido ou error. "
+        "Para retomar uma importação interrompida, reenvie o arquivo com pular=<registros da última linha>."
+    ),
+    manual_parameters=[
+        openapi.Parameter(
+            'formato', openapi.IN_QUERY,
+            description='Formato do corpo (padrão: pelo Content-Type ou pela extensão do arquivo)',
+            type=openapi.TYPE_STRING,
+            enum=list(importacao.FORMATOS)
+        ),
+        openapi.Parameter(
+            'simular', openapi.IN_QUERY,
+            description='Valida e calcula sem gravar nada',
+            type=openapi.TYPE_BOOLEAN
+        ),
+        openapi.Parameter(
+            'pular', openapi.IN_QUERY,
+            description='Registros iniciais já importados (para retomar)',
+            type=openapi.TYPE_INTEGER
+        )
+    ],
+    responses={
+        200: openapi.Response(
+            description="Progresso da importação em NDJSON",
+            examples={"application/x-ndjson": {
+                "registros": 5000, "importadas": 4998, "erros": 2,
+                "erros_bloco": [{"registro": 17, "error": "Divisão por zero não é permitida"}]
+            }}
+        ),
+        400: openapi.Response(
+            description="Formato, cabeçalho ou parâmetros inválidos",
+            examples={"application/json": {"error": "Formato inválido. Use csv ou ndjson."}}
+        ),
+        401: openapi.Response(description="Não autenticado")
+    },
+    tags=['Calculadora']
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def importar_operacoes_api(request):
+    if request.content_type.startswith('multipart/form-data'):
+        arquivo = request.FILES.get('arquivo')
+        if arquivo is None:
+            return Response({'error': 'Envie o arquivo no campo arquivo.'}, status=status.HTTP_400_BAD_REQUEST)
+        corpo, nome = arquivo, arquivo.name
+    else:
+        corpo, nome = _corpo_da_requisicao(request), ''
+    if request.META.get('HTTP_CONTENT_ENCODING') == 'gzip' or nome.endswith('.gz'):
+        corpo = gzip.GzipFile(fileobj=corpo, mode='rb')
+
+    try:
+        pular = max(int(request.query_params.get('pular') or 0), 0)
+    except ValueError:
+        return Response({'error': 'pular deve ser um número inteiro.'}, status=status.HTTP_400_BAD_REQUEST)
+    formato = request.query_params.get('formato') or importacao.formato_do_arquivo(nome, request.content_type)
+    try:
+        leitor = importacao.abrir(corpo, formato)
+    except (importacao.ErroImportacao, OSError) as e:  # OSError: corpo gzip inválido
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    execucao = importacao.Importacao(
+        request.user,
+        simular=request.query_params.get('simular', '').lower() in ('1', 'true'),
+        pular=pular,
+    )
+    return importacao.resposta_progresso(request, execucao, leitor)
 
 
 @swagger_auto_schema(
@@ -181,6 +705,7 @@ def historico_api(request):
             description="Operação não encontrada",
             examples={"application/json": {"error": "Operação não encontrada"}}
         ),
+        304: openapi.Response(description="Operação inalterada desde a ETag enviada em If-None-Match"),
         401: openapi.Response(description="Não autenticado")
     },
     tags=['Calculadora']
@@ -188,16 +713,71 @@ def historico_api(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def operacao_detail_api(request, pk):
+    # Operações não mudam depois de gravadas; a versão do histórico muda
+    # quando esta (ou qualquer outra do usuário) é removida.
+    etag = calcular_etag(
+        'operacao', request.user.pk, VersaoHistorico.atual(request.user.pk), pk, request.accepted_media_type
+    )
+    resposta = nao_modificado(request, etag)
+    if resposta is not None:
+        return resposta
     try:
-        operacao = Operacao.objects.get(pk=pk, usuario=request.user)
+        operacao = Operacao.objects.do_usuario(request.user).get(pk=pk)
         serializer = OperacaoSerializer(operacao)
-        return Response(serializer.data)
+        return marcar(Response(serializer.data), etag)
     except Operacao.DoesNotExist:
         return Response(
             {'error': 'Operação não encontrada'},
             status=status.HTTP_404_NOT_FOUND
         )
 
+@swagger_auto_schema(
+    method='delete',
+    operation_description=(
+        "Exclui várias operações do histórico em uma requisição. Ids de outros usuários "
+        "ou inexistentes são ignorados e listados em 'nao_encontradas'."
+    ),
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        required=['ids'],
+        properties={
+            'ids': openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                example=[12, 15, 40]
+            )
+        }
+    ),
+    responses={
+        200: openapi.Response(
+            description="Operações deletadas",
+            examples={
+                "application/json": {
+                    "message": "2 operação(ões) deletada(s)",
+                    "removidas": [12, 15],
+                    "nao_encontradas": [40]
+                }
+            }
+        ),
+        400: openapi.Response(
+            description="Lista de ids inválida",
+            examples={"application/json": {"error": "Envie uma lista de ids com pelo menos 1 item."}}
+        ),
+        401: openapi.Response(description="Não autenticado")
+    },
+    tags=['Calculadora']
+)
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def deletar_operacoes_api(request):
+    try:
+        ids = _ids_para_remover(request.data)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    removidas = Operacao.objects.remover_ids(request.user, ids)
+    return Response(_resposta_remocao(ids, removidas))
+
+
 @swagger_auto_schema(
     method='delete',
     responses={
@@ -217,7 +797,7 @@ def operacao_detail_api(request, pk):
 @permission_classes([IsAuthenticated])
 def deletar_operacao_api(request, pk):
     try:
-        operacao = Operacao.objects.get(pk=pk, usuario=request.user)
+        operacao = Operacao.objects.do_usuario(request.user).get(pk=pk)
         operacao.delete()
         return Response(
             {'message': 'Operação deletada com sucesso'},
@@ -229,12 +809,43 @@ def deletar_operacao_api(request, pk):
             status=status.HTTP_404_NOT_FOUND
         )
 
+def _resposta_limpeza(request, limpeza):
+    """
+    ``(dados, status)`` de ``limpar_historico/``: 202 com a ``LimpezaHistorico``
+    que está apagando as operações, ou 200 se o histórico já estava vazio.
+    """
+    if limpeza is None:
+        return {'message': 'O histórico já está vazio', 'count': 0, 'limpeza': None}, status.HTTP_200_OK
+    return {
+        'message': 'Histórico limpo; as operações estão sendo apagadas em segundo plano',
+        'count': limpeza.total,
+        'limpeza': {**limpeza.dados(), 'url': request.build_absolute_uri(f'{limpeza.pk}/')},
+    }, status.HTTP_202_ACCEPTED
+
+
 @swagger_auto_schema(
     method='delete',
+    operation_description=(
+        "Limpa o histórico do usuário. As operações saem do histórico na hora e são apagadas "
+        "em segundo plano, em lotes; acompanhe pela URL em limpeza.url (limpar_historico/{id}/)."
+    ),
     responses={
+        202: openapi.Response(
+            description="Histórico limpo; operações sendo apagadas em segundo plano",
+            examples={
+                "application/json": {
+                    "message": "Histórico limpo; as operações estão sendo apagadas em segundo plano",
+                    "count": 5,
+                    "limpeza": {
+                        "id": 1, "estado": "pendente", "total": 5, "removidas": 0, "progresso": 0.0,
+                        "url": "http://localhost:8000/api/calc/limpar_historico/1/"
+                    }
+                }
+            }
+        ),
         200: openapi.Response(
-            description="Todas as operações foram deletadas com sucesso",
-            examples={"application/json": {"message": "Todas as operações foram deletadas com sucesso", "count": 5}}
+            description="O histórico já estava vazio",
+            examples={"application/json": {"message": "O histórico já está vazio", "count": 0, "limpeza": None}}
         ),
         401: openapi.Response(description="Não autenticado")
     },
@@ -244,19 +855,170 @@ def deletar_operacao_api(request, pk):
 @permission_classes([IsAuthenticated])
 def limpar_historico_api(request):
     try:
-        count = Operacao.objects.filter(usuario=request.user).count()
-        
-        Operacao.objects.filter(usuario=request.user).delete()
-        
-        return Response(
-            {
-                'message': 'Todas as operações foram deletadas com sucesso',
-                'count': count
-            },
-            status=status.HTTP_200_OK
-        )
+        limpeza = expurgo.limpar_historico(request.user)
     except Exception as e:
         return Response(
             {'error': f'Erro ao limpar o histórico: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+    dados, codigo = _resposta_limpeza(request, limpeza)
+    return Response(dados, status=codigo)
+
+
+@swagger_auto_schema(
+    method='get',
+    responses={
+        200: openapi.Response(
+            description="Andamento de uma limpeza do histórico (pendente, executando, concluida ou erro)",
+            examples={
+                "application/json": {
+                    "id": 1, "estado": "executando", "total": 250000, "removidas": 120000, "progresso": 0.48,
+                    "excluir_usuario": False, "data_criacao": "2025-01-01T12:00:00Z",
+                    "data_conclusao": None, "erro": None
+                }
+            }
+        ),
+        404: openapi.Response(
+            description="Limpeza não encontrada",
+            examples={"application/json": {"error": "Limpeza não encontrada"}}
+        ),
+        401: openapi.Response(description="Não autenticado")
+    },
+    tags=['Calculadora']
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def limpeza_historico_api(request, pk):
+    try:
+        limpeza = LimpezaHistorico.objects.get(pk=pk, usuario=request.user)
+    except LimpezaHistorico.DoesNotExist:
+        return Response(
+            {'error': 'Limpeza não encontrada'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(limpeza.dados())
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description=(
+        "Resumo do histórico do usuário: total de operações, quantidade e soma dos resultados "
+        "por tipo e data da última operação. Lido de uma única linha mantida a cada cálculo, "
+        "remoção e limpeza, sem percorrer as operações."
+    ),
+    responses={
+        200: openapi.Response(
+            description="Estatísticas do histórico",
+            examples={
+                "application/json": {
+                    "total": 3,
+                    "soma_resultados": 42.5,
+                    "ultima_operacao": "2025-01-01T12:00:00Z",
+                    "por_tipo": {
+                        "soma": {"quantidade": 2, "soma_resultados": 40.0},
+                        "subtracao": {"quantidade": 0, "soma_resultados": 0.0},
+                        "multiplicacao": {"quantidade": 0, "soma_resultados": 0.0},
+                        "divisao": {"quantidade": 1, "soma_resultados": 2.5}
+                    }
+                }
+            }
+        ),
+        401: openapi.Response(description="Não autenticado")
+    },
+    tags=['Calculadora']
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def estatisticas_api(request):
+    return Response(EstatisticaUsuario.obter(request.user.pk).dados())
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description=(
+        "Operações por minuto, hora ou dia, por tipo, e distribuição dos resultados por ordem de "
+        "grandeza. Lê apenas os agregados gravados por `manage.py agregar_operacoes` "
+        "(`agregado_ate_id` e `agregado_em` dizem até onde eles vão), nunca a tabela de operações. "
+        "Intervalos sem operações não aparecem."
+    ),
+    manual_parameters=[
+        openapi.Parameter('granularidade', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          enum=list(agregados.DURACOES), default=agregados.HORA),
+        openapi.Parameter('desde', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME,
+                          description="Início do período (padrão: 1 hora, 2 dias ou 30 dias antes de ate)"),
+        openapi.Parameter('ate', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME,
+                          description="Fim do período, exclusive (padrão: agora)"),
+        openapi.Parameter('tipo_operacao', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          enum=[tipo for tipo, _ in Operacao.TIPOS_OPERACAO]),
+    ],
+    responses={
+        200: openapi.Response(
+            description="Operações agregadas no período",
+            examples={
+                "application/json": {
+                    "granularidade": "hora",
+                    "desde": "2025-01-01T00:00:00-03:00",
+                    "ate": "2025-01-03T00:00:00-03:00",
+                    "tipo_operacao": None,
+                    "agregado_ate_id": 1520,
+                    "agregado_em": "2025-01-02T23:59:00Z",
+                    "total": 3,
+                    "por_tipo": {"soma": 2, "divisao": 1},
+                    "intervalos": [
+                        {
+                            "inicio": "2025-01-02T14:00:00-03:00",
+                            "quantidade": 3,
+                            "soma_resultados": 42.5,
+                            "minimo": 2.5,
+                            "maximo": 30.0,
+                            "por_tipo": {"soma": 2, "divisao": 1}
+                        }
+                    ],
+                    "distribuicao": [
+                        {"faixa": 3, "de": 1.0, "ate": 10.0, "quantidade": 1},
+                        {"faixa": 4, "de": 10.0, "ate": 100.0, "quantidade": 2}
+                    ]
+                }
+            }
+        ),
+        400: openapi.Response(description="Parâmetros inválidos ou período longo demais"),
+        403: openapi.Response(description="Apenas administradores")
+    },
+    tags=['Calculadora']
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def analise_api(request):
+    try:
+        periodo = agregados.periodo(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(agregados.consultar(*periodo))
+
+
+@swagger_auto_schema(
+    method='get',
+    responses={
+        200: openapi.Response(
+            description="Métricas internas da calculadora (por processo)",
+            examples={
+                "application/json": {
+                    "cache_resultados": {"acertos": 120, "falhas": 30, "taxa_acerto": 0.8}
+                }
+            }
+        ),
+        403: openapi.Response(description="Apenas administradores")
+    },
+    tags=['Calculadora']
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metricas_api(request):
+    return Response({
+        'cache_resultados': memoizacao.estatisticas(),
+        'cache_planos_expressao': expressao.estatisticas(),
+        'fila_escrita': persistencia.estatisticas(),
+        'cache_historico': cache_historico.estatisticas(),
+        'eventos': eventos.estatisticas(),
+        'expurgo': expurgo.estatisticas(),
+    })
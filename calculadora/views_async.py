@@ -0,0 +1,253 @@
+"""
+Versões ``async def`` dos endpoints principais da calculadora.
+
+Sob um servidor ASGI (``uvicorn``, ``daphne``...) estas views rodam direto no
+event loop: a autenticação JWT e as consultas usam o ORM assíncrono
+(``acreate``, ``aget``, ``async for``), então uma requisição esperando o banco
+não prende uma thread do servidor. O que só existe em versão síncrona (o
+cálculo, o journal do write-behind, o paginador do DRF) roda com
+``sync_to_async`` para não travar o loop. As respostas têm o mesmo formato das
+views síncronas em ``views.py``; as rotas ficam em ``api/calc/async/``.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_http_methods
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.request import Request
+
+from autenticacao.jwt_async import jwt_async
+from kogui_portal.etag import calcular_etag, marcar, nao_modificado
+from kogui_portal.parsers import loads
+from kogui_portal.renderers import dumps
+
+from . import cache_historico, eventos, expurgo, memoizacao, persistencia
+from .delta import MENSAGEM_CURSOR_EXPIRADO, CursorExpirado, DeltaHistorico, usar_delta
+from .engine import ErroCalculo
+from .models import EstatisticaUsuario, LimpezaHistorico, Operacao, VersaoHistorico, verificar_resultado
+from .parsers import Float64Parser, decodificar_operacoes
+from .serializers import OperacaoListaSerializer, OperacaoSerializer
+from .paginacao import ORDENACAO_HISTORICO, OperacaoCursorPagination, OperacaoPagination, usar_cursor
+from .views import (
+    _filtrar_historico, _ids_para_remover, _nova_operacao, _preparar_calculo, _resposta_limpeza,
+    _resposta_remocao,
+)
+
+
+TIPO_CONTEUDO = 'application/json'
+
+
+def _resposta(dados, codigo=status.HTTP_200_OK):
+    return HttpResponse(dumps(dados), status=codigo, content_type=TIPO_CONTEUDO)
+
+
+def _dados_da_requisicao(request):
+    if request.content_type == Float64Parser.media_type:
+        try:
+            operacoes = decodificar_operacoes(request.body)
+        except ParseError as e:
+            raise ValueError(e.detail)
+        return operacoes[0] if len(operacoes) == 1 else {'operacoes': operacoes}
+    return loads(request.body or b'{}')
+
+
+def _operacoes_do_usuario(usuario):
+    return Operacao.objects.do_usuario(usuario).order_by(*ORDENACAO_HISTORICO)
+
+
+def _com_usuario(operacao, usuario):
+    # O usuário já está em memória; evita a consulta extra de ``usuario_nome``.
+    operacao.usuario = usuario
+    return operacao
+
+
+@require_http_methods(['POST'])
+@jwt_async
+async def calcular_api(request):
+    try:
+        data = _dados_da_requisicao(request)
+    except ValueError as e:
+        return _resposta({'detail': f'Corpo da requisição inválido: {e}'}, status.HTTP_400_BAD_REQUEST)
+    if not isinstance(data, dict):
+        return _resposta({'error': 'Envie uma lista de números válida com pelo menos 2 valores.'}, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        numeros, tipo_operacao = _preparar_calculo(data)
+        # O cálculo (e o cache, que pode ser remoto) é síncrono e pode ser longo
+        resultado = await sync_to_async(memoizacao.calcular)(tipo_operacao, numeros)
+        verificar_resultado(resultado)
+    except (ErroCalculo, ValueError) as e:
+        return _resposta({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+    operacao = _nova_operacao(request.user, tipo_operacao, numeros, resultado)
+    if persistencia.write_behind_ativo():
+        operacao.data_criacao = timezone.now()
+        await sync_to_async(persistencia.obter_fila().enfileirar)(operacao)
+        status_resposta = status.HTTP_202_ACCEPTED
+    else:
+        await operacao.asave()
+        status_resposta = status.HTTP_201_CREATED
+
+    return _resposta({
+        'message': 'Cálculo realizado com sucesso',
+        'operacao': OperacaoSerializer(operacao).data
+    }, status_resposta)
+
+
+async def _paginar(request, queryset):
+    """
+    Página de ``OperacaoPagination``. O paginador do DRF lê o banco de forma
+    síncrona, então roda fora do loop; levanta ``NotFound`` como na view síncrona.
+    """
+    paginacao = OperacaoPagination()
+    linhas = await sync_to_async(paginacao.paginate_queryset)(
+        OperacaoListaSerializer.consulta(queryset), Request(request)
+    )
+    return paginacao.get_paginated_response(OperacaoListaSerializer(linhas, request.user).data).data
+
+
+async def _paginar_cursor(request, queryset):
+    paginacao = OperacaoCursorPagination()
+    if paginacao.contar_total(request):
+        paginacao.total = await queryset.acount()
+    linhas = [
+        linha async for linha in paginacao.preparar(OperacaoListaSerializer.consulta(queryset), request)
+    ]
+    paginacao.paginar_linhas(linhas)
+    return paginacao.get_paginated_data(OperacaoListaSerializer(paginacao.linhas, request.user).data)
+
+
+async def _historico_delta(request):
+    try:
+        operacoes = _filtrar_historico(Operacao.objects.do_usuario(request.user), request.GET)
+        delta = DeltaHistorico(request)
+    except ValueError as e:
+        return _resposta({'error': f'Filtro inválido: {e}'}, status.HTTP_400_BAD_REQUEST)
+    except NotFound as e:
+        return _resposta({'detail': e.detail}, status.HTTP_404_NOT_FOUND)
+    except CursorExpirado:
+        return _resposta({'detail': MENSAGEM_CURSOR_EXPIRADO}, status.HTTP_410_GONE)
+    novas, removidas = delta.consultas(OperacaoListaSerializer.consulta(operacoes), request.user)
+    return _resposta(delta.montar(
+        [linha async for linha in novas],
+        [linha async for linha in removidas],
+        lambda linhas: OperacaoListaSerializer(linhas, request.user).data
+    ))
+
+
+@require_http_methods(['GET'])
+@jwt_async
+async def historico_api(request):
+    if usar_delta(request.GET):
+        return await _historico_delta(request)
+
+    versao = await VersaoHistorico.aatual(request.user.pk)
+    etag = calcular_etag('historico', request.user.pk, versao, request.build_absolute_uri(), TIPO_CONTEUDO)
+    resposta = nao_modificado(request, etag)
+    if resposta is not None:
+        return resposta
+
+    chave = cache_historico.chave_pagina(request, versao)
+    dados = await cache_historico.aobter(chave)
+    if dados is not None:
+        return marcar(_resposta(dados), etag)
+
+    try:
+        operacoes = _filtrar_historico(_operacoes_do_usuario(request.user), request.GET)
+    except ValueError as e:
+        return _resposta({'error': f'Filtro inválido: {e}'}, status.HTTP_400_BAD_REQUEST)
+    paginar = _paginar_cursor if usar_cursor(request.GET) else _paginar
+    try:
+        dados = await paginar(request, operacoes)
+    except NotFound as e:
+        return _resposta({'detail': e.detail}, status.HTTP_404_NOT_FOUND)
+    await cache_historico.aguardar(chave, dados)
+    return marcar(_resposta(dados), etag)
+
+
+@require_http_methods(['GET'])
+@jwt_async
+async def operacao_detail_api(request, pk):
+    versao = await VersaoHistorico.aatual(request.user.pk)
+    etag = calcular_etag('operacao', request.user.pk, versao, pk, TIPO_CONTEUDO)
+    resposta = nao_modificado(request, etag)
+    if resposta is not None:
+        return resposta
+    try:
+        operacao = await _operacoes_do_usuario(request.user).aget(pk=pk)
+    except Operacao.DoesNotExist:
+        return _resposta({'error': 'Operação não encontrada'}, status.HTTP_404_NOT_FOUND)
+    return marcar(_resposta(OperacaoSerializer(_com_usuario(operacao, request.user)).data), etag)
+
+
+@require_http_methods(['DELETE'])
+@jwt_async
+async def deletar_operacao_api(request, pk):
+    removidas, _ = await _operacoes_do_usuario(request.user).filter(pk=pk).adelete()
+    if not removidas:
+        return _resposta({'error': 'Operação não encontrada'}, status.HTTP_404_NOT_FOUND)
+    return _resposta({'message': 'Operação deletada com sucesso'})
+
+
+@require_http_methods(['DELETE'])
+@jwt_async
+async def deletar_operacoes_api(request):
+    try:
+        ids = _ids_para_remover(loads(request.body or b'{}'))
+    except ValueError as e:
+        return _resposta({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+    removidas = await Operacao.objects.aremover_ids(request.user, ids)
+    return _resposta(_resposta_remocao(ids, removidas))
+
+
+@require_http_methods(['DELETE'])
+@jwt_async
+async def limpar_historico_api(request):
+    try:
+        limpeza = await sync_to_async(expurgo.limpar_historico)(request.user)
+    except Exception as e:
+        return _resposta(
+            {'error': f'Erro ao limpar o histórico: {str(e)}'},
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    return _resposta(*_resposta_limpeza(request, limpeza))
+
+
+@require_http_methods(['GET'])
+@jwt_async
+async def limpeza_historico_api(request, pk):
+    try:
+        limpeza = await LimpezaHistorico.objects.aget(pk=pk, usuario=request.user)
+    except LimpezaHistorico.DoesNotExist:
+        return _resposta({'error': 'Limpeza não encontrada'}, status.HTTP_404_NOT_FOUND)
+    return _resposta(limpeza.dados())
+
+
+@require_http_methods(['GET'])
+@jwt_async
+async def estatisticas_api(request):
+    return _resposta((await EstatisticaUsuario.aobter(request.user.pk)).dados())
+
+
+@require_http_methods(['GET'])
+@jwt_async
+async def eventos_api(request):
+    """
+    Server-sent events com as mudanças do histórico do usuário: ``criadas`` e
+    ``removidas`` (com os ids), ``limpo`` e ``recarregar`` (o cliente ficou
+    para trás; atualize com ``historico/?since=``).
+    """
+    if not isinstance(request, ASGIRequest):
+        # Sob WSGI a resposta seria consumida inteira antes de ser enviada.
+        return _resposta(
+            {'error': 'Os eventos exigem um servidor ASGI (ex.: uvicorn).'},
+            status.HTTP_501_NOT_IMPLEMENTED
+        )
+    resposta = StreamingHttpResponse(
+        eventos.fluxo(eventos.assinar(request.user.pk)), content_type='text/event-stream'
+    )
+    resposta['Cache-Control'] = 'no-cache'
+    resposta['X-Accel-Buffering'] = 'no'  # sem buffer em proxies nginx
+    return resposta
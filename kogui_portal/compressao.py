@@ -0,0 +1,34 @@
+"""
+Negociação de gzip para as respostas que a própria view comprime.
+
+O ``Accept-Encoding`` é lido com os ``q`` (RFC 9110, seção 12.5.3): ``gzip;q=0``
+recusa o gzip, e ``*`` vale para ele quando o gzip não é citado.
+"""
+
+
+def _qualidades(cabecalho):
+    qualidades = {}
+    for item in cabecalho.split(','):
+        codificacao, *parametros = item.split(';')
+        codificacao = codificacao.strip().lower()
+        if not codificacao:
+            continue
+        q = 1.0
+        for parametro in parametros:
+            nome, _, valor = parametro.partition('=')
+            if nome.strip().lower() == 'q':
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0  # q inválido: melhor não comprimir
+        qualidades[codificacao] = q
+    return qualidades
+
+
+def aceita_gzip(request):
+    """Se o cliente de ``request`` aceita respostas com ``Content-Encoding: gzip``."""
+    qualidades = _qualidades(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for codificacao in ('gzip', 'x-gzip', '*'):
+        if codificacao in qualidades:
+            return qualidades[codificacao] > 0
+    return False
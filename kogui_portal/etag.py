@@ -0,0 +1,35 @@
+"""
+ETags e GET condicional das respostas da API.
+
+A ETag é o hash de metadados que já estão em memória ou custam uma busca por
+chave primária (a versão do histórico do usuário, a URL, o formato negociado),
+calculado antes de qualquer consulta às operações. Se o ``If-None-Match`` do
+cliente tem a mesma ETag, a view responde 304 sem consultar nem serializar
+nada.
+
+As respostas variam por usuário, então vão com ``Cache-Control: private,
+no-cache``: o navegador guarda a resposta e revalida a cada uso.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+
+def calcular_etag(*partes):
+    """ETag forte a partir de ``partes`` (qualquer valor com ``str``)."""
+    return '"%s"' % hashlib.sha256('|'.join(map(str, partes)).encode()).hexdigest()[:32]
+
+
+def marcar(resposta, etag):
+    resposta['ETag'] = etag
+    patch_cache_control(resposta, private=True, no_cache=True)
+    patch_vary_headers(resposta, ('Accept', 'Authorization'))
+    return resposta
+
+
+def nao_modificado(request, etag):
+    """Resposta 304 se o cliente já tem ``etag``; ``None`` caso contrário."""
+    resposta = get_conditional_response(request, etag=etag)
+    if resposta is not None:
+        marcar(resposta, etag)
+    return resposta
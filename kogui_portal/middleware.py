@@ -0,0 +1,17 @@
+"""
+Middlewares do projeto.
+"""
+from django.middleware import gzip
+
+
+class GZipMiddleware(gzip.GZipMiddleware):
+    """
+    ``GZipMiddleware`` que não comprime server-sent events
+    (``text/event-stream``): cada evento viraria um membro gzip separado, e
+    alguns clientes e proxies seguram a resposta até juntar um bloco.
+    """
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith('text/event-stream'):
+            return response
+        return super().process_response(request, response)
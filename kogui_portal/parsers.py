@@ -0,0 +1,45 @@
+"""
+Parsers da API.
+
+``JSONRapidoParser`` lê JSON com o ``orjson`` quando ele está instalado e cai
+no ``JSONParser`` do DRF caso contrário. ``MessagePackParser`` aceita corpos
+``application/msgpack`` e só entra na lista com ``API_MSGPACK=True``.
+"""
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+from .renderers import msgpack, orjson
+
+
+def loads(corpo):
+    """Lê JSON de ``bytes``/``str``; erros de sintaxe viram ``ValueError``."""
+    if orjson is not None:
+        return orjson.loads(corpo)
+    return json.loads(corpo)
+
+
+class JSONRapidoParser(JSONParser):
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            # O orjson só aceita UTF-8, que é o que o JSON exige (RFC 8259).
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if msgpack is None:
+            raise ImproperlyConfigured('API_MSGPACK=True requer o pacote msgpack instalado.')
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
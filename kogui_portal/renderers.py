@@ -0,0 +1,97 @@
+"""
+Renderers da API.
+
+``JSONRapidoRenderer`` gera o mesmo JSON do ``JSONRenderer`` do DRF, mas com
+o ``orjson`` quando ele está instalado: ``datetime``, ``date``, ``time``,
+``UUID`` e arrays do NumPy são codificados pelo próprio ``orjson`` e só os
+tipos restantes (``Decimal``, textos traduzíveis, querysets...) passam pela
+função ``default``. Sem o ``orjson`` o renderer é o do DRF.
+
+``MessagePackRenderer`` é opcional (``API_MSGPACK=True`` e o pacote
+``msgpack`` instalado) e responde ``application/msgpack`` para os clientes
+internos que pedirem esse formato no ``Accept``.
+"""
+import datetime
+import decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack é opcional
+    msgpack = None
+
+_encoder = JSONEncoder()
+
+
+def _padrao(obj):
+    """Tipos que o ``orjson`` não conhece, convertidos como no encoder do DRF."""
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    return _encoder.default(obj)
+
+
+if orjson is not None:
+    OPCOES_ORJSON = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(dados):
+        """Serializa ``dados`` em JSON (bytes UTF-8, sem espaços)."""
+        return orjson.dumps(dados, default=_padrao, option=OPCOES_ORJSON)
+else:
+    def dumps(dados):
+        """Serializa ``dados`` em JSON (bytes UTF-8, sem espaços)."""
+        return JSONRenderer().render(dados)
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` com ``orjson``.
+
+    Pedidos com indentação (``Accept: application/json; indent=4``) continuam
+    no renderer do DRF, que é quem sabe indentar com qualquer largura.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        return dumps(data)
+
+
+def _padrao_msgpack(obj):
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, datetime.datetime):
+        representacao = obj.isoformat()
+        if representacao.endswith('+00:00'):
+            representacao = representacao[:-6] + 'Z'
+        return representacao
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    return _encoder.default(obj)
+
+
+def msgpack_dumps(dados):
+    if msgpack is None:
+        raise ImproperlyConfigured('API_MSGPACK=True requer o pacote msgpack instalado.')
+    return msgpack.packb(dados, default=_padrao_msgpack, use_bin_type=True, datetime=False)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack_dumps(data)
@@ -52,9 +52,14 @@ INSTALLED_APPS = [
     'autenticacao',
 ]
 
+# Comprime as respostas para clientes que enviam Accept-Encoding: gzip (as ETags das
+# respostas comprimidas passam a ser fracas, W/"...")
+API_GZIP = os.getenv('API_GZIP', 'False') == 'True'
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    *(['kogui_portal.middleware.GZipMiddleware'] if API_GZIP else []),
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -144,6 +149,12 @@ LOGIN_REDIRECT_URL = os.getenv('LOGIN_REDIRECT_URL', '/calc/')
 LOGOUT_REDIRECT_URL = os.getenv('LOGOUT_REDIRECT_URL', '/auth/login/')
 
 # Django REST Framework settings
+# JSON da API: os padrões usam orjson quando instalado (e o JSON do DRF caso contrário).
+# API_MSGPACK=True oferece também application/msgpack (requer o pacote msgpack).
+API_JSON_RENDERER = os.getenv('API_JSON_RENDERER', 'kogui_portal.renderers.JSONRapidoRenderer')
+API_JSON_PARSER = os.getenv('API_JSON_PARSER', 'kogui_portal.parsers.JSONRapidoParser')
+API_MSGPACK = os.getenv('API_MSGPACK', 'False') == 'True'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -152,12 +163,94 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        API_JSON_RENDERER,
+        *(['kogui_portal.renderers.MessagePackRenderer'] if API_MSGPACK else []),
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        API_JSON_PARSER,
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        *(['kogui_portal.parsers.MessagePackParser'] if API_MSGPACK else []),
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    },
+    # Resultados de cálculos memoizados; use um backend compartilhado entre workers se quiser
+    'resultados': {
+        'BACKEND': os.getenv('CACHE_RESULTADOS_BACKEND', 'calculadora.cache_backends.LRUBytesCache'),
+        'LOCATION': os.getenv('CACHE_RESULTADOS_LOCATION', ''),
+        'TIMEOUT': None,
+    },
+    # Páginas do histórico por usuário; a versão que as invalida fica no banco
+    'historico': {
+        'BACKEND': os.getenv('CACHE_HISTORICO_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_HISTORICO_LOCATION', 'historico'),
+        'TIMEOUT': int(os.getenv('CACHE_HISTORICO_TIMEOUT', '300')),
+    },
+}
+if CACHES['resultados']['BACKEND'] == 'calculadora.cache_backends.LRUBytesCache':
+    CACHES['resultados']['OPTIONS'] = {
+        'MAX_BYTES': int(os.getenv('CACHE_RESULTADOS_MAX_BYTES', str(4 * 1024 * 1024))),
+    }
+
+# Calculadora settings
+# Alias de CACHES usado para memoizar resultados (vazio desativa)
+CALCULADORA_CACHE_RESULTADOS = os.getenv('CALCULADORA_CACHE_RESULTADOS', 'resultados')
+# Alias de CACHES usado para as páginas do histórico (vazio desativa)
+CALCULADORA_CACHE_HISTORICO = os.getenv('CALCULADORA_CACHE_HISTORICO', 'historico')
+CALCULADORA_LOTE_MAXIMO = int(os.getenv('CALCULADORA_LOTE_MAXIMO', '10000'))
+# A partir desta quantidade de números o cálculo usa NumPy (se instalado)
+CALCULADORA_NUMPY_LIMIAR = int(os.getenv('CALCULADORA_NUMPY_LIMIAR', '1000'))
+# Redução em vários processos (desativada com menos de 2 processos)
+CALCULADORA_PARALELO_PROCESSOS = int(os.getenv('CALCULADORA_PARALELO_PROCESSOS', '0'))
+CALCULADORA_PARALELO_LIMIAR = int(os.getenv('CALCULADORA_PARALELO_LIMIAR', '2000000'))
+# Parâmetros maiores que isto (em bytes) são gravados comprimidos com zlib; 0 desativa
+CALCULADORA_PARAMETROS_COMPRIMIR_ACIMA = int(os.getenv('CALCULADORA_PARAMETROS_COMPRIMIR_ACIMA', '1024'))
+# Tabela de operandos (filtro por valor no histórico); operações maiores não são indexadas
+CALCULADORA_INDICE_OPERANDOS = os.getenv('CALCULADORA_INDICE_OPERANDOS', 'True') == 'True'
+CALCULADORA_INDICE_OPERANDOS_MAXIMO = int(os.getenv('CALCULADORA_INDICE_OPERANDOS_MAXIMO', '1000'))
+# Por quantos dias historico/?since= informa remoções (podar_remocoes apaga as mais antigas)
+CALCULADORA_REMOCOES_RETENCAO_DIAS = int(os.getenv('CALCULADORA_REMOCOES_RETENCAO_DIAS', '30'))
+# Linhas lidas e serializadas por vez em historico/exportar/
+CALCULADORA_EXPORTACAO_LOTE = int(os.getenv('CALCULADORA_EXPORTACAO_LOTE', '2000'))
+# Registros validados e gravados por transação em importar/ e importar_operacoes
+CALCULADORA_IMPORTACAO_LOTE = int(os.getenv('CALCULADORA_IMPORTACAO_LOTE', '5000'))
+# Limpeza do histórico: operações apagadas por lote, pausa entre lotes (segundos),
+# segundos sem progresso até outro processo retomar a limpeza e se ela roda em uma
+# thread (False: na própria requisição)
+CALCULADORA_EXPURGO_LOTE = int(os.getenv('CALCULADORA_EXPURGO_LOTE', '1000'))
+CALCULADORA_EXPURGO_PAUSA = float(os.getenv('CALCULADORA_EXPURGO_PAUSA', '0.05'))
+CALCULADORA_EXPURGO_PARADA = int(os.getenv('CALCULADORA_EXPURGO_PARADA', '300'))
+CALCULADORA_EXPURGO_SEGUNDO_PLANO = os.getenv('CALCULADORA_EXPURGO_SEGUNDO_PLANO', 'True') == 'True'
+# Agregados de analise/: operações lidas por transação, pausa entre lotes (segundos)
+# e por quantos dias os intervalos de 1 minuto são mantidos
+CALCULADORA_AGREGADOS_LOTE = int(os.getenv('CALCULADORA_AGREGADOS_LOTE', '2000'))
+CALCULADORA_AGREGADOS_PAUSA = float(os.getenv('CALCULADORA_AGREGADOS_PAUSA', '0.05'))
+CALCULADORA_AGREGADOS_MINUTOS_DIAS = int(os.getenv('CALCULADORA_AGREGADOS_MINUTOS_DIAS', '7'))
+# Eventos SSE do histórico: broker entre processos (BrokerRedis para vários workers),
+# eventos guardados por conexão lenta e intervalo do keepalive em segundos
+CALCULADORA_EVENTOS_BROKER = os.getenv('CALCULADORA_EVENTOS_BROKER', 'calculadora.eventos.BrokerLocal')
+CALCULADORA_EVENTOS_REDIS_URL = os.getenv('CALCULADORA_EVENTOS_REDIS_URL', 'redis://localhost:6379/0')
+CALCULADORA_EVENTOS_BUFFER = int(os.getenv('CALCULADORA_EVENTOS_BUFFER', '100'))
+CALCULADORA_EVENTOS_HEARTBEAT = float(os.getenv('CALCULADORA_EVENTOS_HEARTBEAT', '15'))
+# Gravação das operações em segundo plano, com commits agrupados e journal em disco
+CALCULADORA_WRITE_BEHIND = os.getenv('CALCULADORA_WRITE_BEHIND', 'False') == 'True'
+CALCULADORA_WRITE_BEHIND_LOTE = int(os.getenv('CALCULADORA_WRITE_BEHIND_LOTE', '500'))
+CALCULADORA_WRITE_BEHIND_INTERVALO = float(os.getenv('CALCULADORA_WRITE_BEHIND_INTERVALO', '0.5'))
+CALCULADORA_WRITE_BEHIND_JOURNAL = os.getenv(
+    'CALCULADORA_WRITE_BEHIND_JOURNAL', os.path.join(BASE_DIR, 'journal')
+)
+# fsync do journal a cada operação; False só protege contra a queda do processo, não do sistema
+CALCULADORA_WRITE_BEHIND_FSYNC = os.getenv('CALCULADORA_WRITE_BEHIND_FSYNC', 'True') == 'True'
+
 # JWT Settings
 from datetime import timedelta
 
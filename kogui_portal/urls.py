@@ -41,9 +41,29 @@ def api_root(request):
             },
             'calculadora': {
                 'calcular': '/api/calc/calcular/',
+                'calcular_lote': '/api/calc/calcular/lote/',
+                'calcular_stream': '/api/calc/calcular/stream/?tipo_operacao=soma',
+                'calcular_expressao': '/api/calc/calcular/expressao/',
+                'importar_operacoes': '/api/calc/importar/?formato=csv',
                 'historico': '/api/calc/historico/',
+                'exportar_historico': '/api/calc/historico/exportar/?formato=csv',
+                'estatisticas': '/api/calc/estatisticas/',
                 'operacao_detail': '/api/calc/operacao/{id}/',
-                'deletar_operacao': '/api/calc/operacao/{id}/deletar/'
+                'deletar_operacao': '/api/calc/operacao/{id}/deletar/',
+                'deletar_operacoes': '/api/calc/operacao/lote/',
+                'limpar_historico': '/api/calc/limpar_historico/',
+                'limpeza_historico': '/api/calc/limpar_historico/{id}/'
+            },
+            'calculadora_async': {
+                'calcular': '/api/calc/async/calcular/',
+                'historico': '/api/calc/async/historico/',
+                'estatisticas': '/api/calc/async/estatisticas/',
+                'operacao_detail': '/api/calc/async/operacao/{id}/',
+                'deletar_operacao': '/api/calc/async/operacao/{id}/deletar/',
+                'deletar_operacoes': '/api/calc/async/operacao/lote/',
+                'limpar_historico': '/api/calc/async/limpar_historico/',
+                'limpeza_historico': '/api/calc/async/limpar_historico/{id}/',
+                'eventos': '/api/calc/async/eventos/'
             },
             'admin': '/admin/'
         },
@@ -52,6 +72,7 @@ def api_root(request):
 
 api_urlpatterns = [
     path('auth/', include('autenticacao.urls')),
+    path('calc/async/', include('calculadora.urls_async')),
     path('calc/', include('calculadora.urls')),
 ]
 
@@ -293,8 +293,8 @@ async function sendToBackend(expression, result) {
         
         console.log('Cálculo salvo com sucesso no backend');
         
-        // Atualiza o histórico após salvar no backend
-        await fetchHistory();
+        // Busca só as mudanças do histórico desde a última sincronização
+        await syncHistory();
         
     } catch (error) {
         console.error('Erro ao enviar cálculo para o backend:', error);
@@ -687,6 +687,22 @@ logoutBtn.onclick = async () => {
     }
 };
 
+// Cursor do modo incremental do histórico (historico/?since=)
+let historySince = null;
+
+// Converte o formato do histórico do backend para o formato esperado
+function toHistoryItem(item) {
+    return {
+        id: item.id,  // Inclui o ID da operação
+        expression: item.parametros_display,
+        result: item.resultado_serializado,
+        timestamp: item.data_criacao,
+        // Mantém compatibilidade com formato antigo
+        expr: item.parametros_display,
+        pk: item.id
+    };
+}
+
 async function fetchHistory() {
     try {
         // Se não estiver autenticado, usa o histórico local
@@ -695,19 +711,15 @@ async function fetchHistory() {
             return;
         }
         
+        // O cursor é pedido antes da página: o que for gravado entre as duas
+        // chamadas volta no próximo delta e é deduplicado pelo id
+        const cursorResp = await apiRequest(`${API_BASE}/calc/historico/?since=`);
+        historySince = cursorResp.ok ? (await cursorResp.json()).since : null;
+        
         const resp = await apiRequest(`${API_BASE}/calc/historico/`);
         if (resp.ok) {
             const data = await resp.json();
-            // Converte o formato do histórico do backend para o formato esperado
-            history = (data.results || data).map(item => ({
-                id: item.id,  // Inclui o ID da operação
-                expression: item.parametros_display,
-                result: item.resultado_serializado,
-                timestamp: item.data_criacao,
-                // Mantém compatibilidade com formato antigo
-                expr: item.parametros_display,
-                pk: item.id
-            }));
+            history = (data.results || data).map(toHistoryItem);
             
             // Ordena por data (mais recente primeiro)
             history.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
@@ -724,3 +736,36 @@ async function fetchHistory() {
         renderHistory();
     }
 }
+
+// Aplica ao histórico local só o que mudou desde historySince
+async function syncHistory() {
+    if (!accessToken || !historySince) {
+        await fetchHistory();
+        return;
+    }
+    try {
+        let data;
+        do {
+            const resp = await apiRequest(`${API_BASE}/calc/historico/?since=${encodeURIComponent(historySince)}`);
+            if (!resp.ok) {
+                // Cursor expirado (410) ou inválido: recarrega tudo
+                await fetchHistory();
+                return;
+            }
+            data = await resp.json();
+            if (data.limpo) {
+                history = [];
+            }
+            const novas = data.novas.map(toHistoryItem);
+            const ignorar = new Set([...data.removidas, ...novas.map(item => item.id)]);
+            history = novas.concat(history.filter(item => !ignorar.has(item.id)));
+            historySince = data.since;
+        } while (data.mais);
+        
+        history.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
+        renderHistory();
+    } catch (error) {
+        console.error('Erro ao sincronizar histórico:', error);
+        await fetchHistory();
+    }
+}